@@ -26,6 +26,10 @@ page_2 = st.Page(
     "components/page_two.py", title="Gráfico", icon=":material/equalizer:"
 )
 
-pages = [page_1, page_2]
+page_3 = st.Page(
+    "components/page_three.py", title="Cache", icon=":material/monitoring:"
+)
+
+pages = [page_1, page_2, page_3]
 pg = st.navigation(pages)
 pg.run()
\ No newline at end of file
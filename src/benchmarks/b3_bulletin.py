@@ -0,0 +1,121 @@
+"""
+Ingestion of a multi-day B3 bulletin file: pandas' plain read_csv against the
+streaming parser writing the typed store partitioned by RptDt.
+
+Each method runs in a fresh process and reports its time and peak resident
+memory above the process' baseline. The plain read keeps the whole file in
+memory and leaves the comma-decimal fields as strings; the streaming ingest
+stays bounded by the block size. The stored values are checked against the
+generated ones.
+
+    cd src
+    python -m benchmarks.b3_bulletin
+"""
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from utils.b3_bulletin import BLOCK_SIZE, BULLETIN_SCHEMA, BulletinStore
+
+# Report dates and instruments per date of the generated file, about 190 MB
+DAYS = 40
+ROWS_PER_DAY = 50_000
+
+HEADER = 'Status do Arquivo: Final'
+
+
+def write_bulletin(path, days=DAYS, rows_per_day=ROWS_PER_DAY):
+    """
+    Synthetic bulletin in B3's layout, with comma decimals for prices and
+    volumes and point decimals for quantities, like df_top_15_com_industry.csv.
+
+    Returns:
+        tuple: (rows written, total NtlFinVol in cents)
+    """
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range('2025-01-02', periods=days).strftime('%Y-%m-%d')
+    tickers = np.array([f'T{i:05d}' for i in range(rows_per_day)])
+    total_cents = 0
+    with open(path, 'w') as file:
+        file.write(HEADER + '\n')
+        file.write(';'.join(BULLETIN_SCHEMA) + '\n')
+        for date in dates:
+            price_cents = rng.integers(100, 100_000, rows_per_day)
+            trades = rng.integers(0, 200_000, rows_per_day)
+            volume_cents = price_cents * rng.integers(1, 1_000, rows_per_day)
+            total_cents += int(volume_cents.sum())
+            prices = [f'{cents // 100},{cents % 100:02d}' for cents in price_cents]
+            volumes = [f'{cents // 100},{cents % 100:02d}' for cents in volume_cents]
+            lines = [
+                f'{date};{ticker};BR{ticker}000;CASH;{price};{price};{price};{price};-1,5;;;;{trade}.0;{trade * 10}.0;{volume}'
+                for ticker, price, trade, volume in zip(tickers, prices, trades, volumes)
+            ]
+            file.write('\n'.join(lines) + '\n')
+    return days * rows_per_day, total_cents
+
+
+def measure(function, *args):
+    """
+    Run `function` in this (fresh) process, returning its result, seconds and peak RSS increase in MB.
+    """
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    result = function(*args)
+    elapsed = time.perf_counter() - started
+    peak = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before) / 1024
+    return result, elapsed, peak
+
+
+def plain_read(path):
+    data = pd.read_csv(path, sep=';', skiprows=1)
+    numeric = [name for name, dtype in BULLETIN_SCHEMA.items()
+               if name in data and (pa.types.is_integer(dtype) or pa.types.is_floating(dtype))]
+    mistyped = [name for name in numeric if not pd.api.types.is_numeric_dtype(data[name])]
+    return len(data), mistyped
+
+
+def streaming_ingest(path, store_dir):
+    stats = BulletinStore(store_dir).ingest([path])
+    return stats['rows'], stats['dates']
+
+
+def stored_total_cents(store_dir):
+    volume = BulletinStore(store_dir).read(columns=['NtlFinVol'])['NtlFinVol'].to_numpy()
+    return int(np.round(volume * 100).sum())
+
+
+def run_isolated(function, *args):
+    with multiprocessing.get_context('spawn').Pool(1) as pool:
+        return pool.apply(measure, (function, *args))
+
+
+def run():
+    with tempfile.TemporaryDirectory() as work_dir:
+        path = os.path.join(work_dir, 'bulletin.csv')
+        rows, total_cents = write_bulletin(path)
+        store_dir = os.path.join(work_dir, 'store')
+        print(f"bulletin: {rows} rows, {DAYS} dates, {os.path.getsize(path) / 2**20:.0f} MB; "
+              f"block size {BLOCK_SIZE / 2**20:.0f} MB")
+        print(f"{'method':<18} {'rows':>9} {'s':>7} {'peak MB':>8}  notes")
+
+        (read_rows, mistyped), elapsed, peak = run_isolated(plain_read, path)
+        print(f"{'pandas read_csv':<18} {read_rows:>9} {elapsed:>7.2f} {peak:>8.0f}  "
+              f"{len(mistyped)} numeric fields left as text: {', '.join(mistyped)}")
+
+        (ingested, dates), elapsed, peak = run_isolated(streaming_ingest, path, store_dir)
+        store_mb = sum(entry.stat().st_size for entry in os.scandir(store_dir) for entry in os.scandir(entry.path)
+                       if entry.is_file()) / 2**20
+        print(f"{'streaming ingest':<18} {ingested:>9} {elapsed:>7.2f} {peak:>8.0f}  "
+              f"{dates} partitions, {store_mb:.0f} MB of Parquet")
+
+        print(f"NtlFinVol total: generated {total_cents}, stored {stored_total_cents(store_dir)}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,94 @@
+"""
+Latency of comparing a whole sector on page_two against a fixed budget: reading
+daily bars from a warm OHLCV cache, aligning them on the session index,
+compounding the normalized performance and downsampling the chart.
+
+Exits with status 1 when a case goes over LATENCY_BUDGET, so it can gate changes:
+
+    cd src
+    python -m benchmarks.comparison
+"""
+import logging
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from utils.comparison import align_to_sessions
+from utils.dataset import PriceDataset
+from utils.downsample import CHART_WIDTH, downsample
+from utils.ohlcv_cache import OHLCVCache, to_multi_level
+from utils.providers import LocalProvider
+
+# Seconds an interactive comparison may take, from the cache read to the chart points
+LATENCY_BUDGET = 1.0
+
+# (number of tickers, years of daily bars) compared
+CASES = [(4, 5), (100, 5), (100, 20), (250, 5)]
+
+MAX_LOAD_WORKERS = 8
+
+REPEAT = 3
+
+END = pd.Timestamp('2025-01-01', tz='UTC')
+
+
+def compare(cache, provider, tickers, start):
+    """
+    What page_two does for a selection once the result cache misses.
+    """
+    with ThreadPoolExecutor(max_workers=MAX_LOAD_WORKERS) as executor:
+        futures = {t: executor.submit(cache.read, t, '1d', start, END, provider.history) for t in tickers}
+        frames = {t: future.result() for t, future in futures.items()}
+    dataset = PriceDataset(to_multi_level(frames, '1d'), tickers, start, END)
+    return downsample(dataset.normalized('Close'), CHART_WIDTH)
+
+
+def check_compounding(cache, provider, tickers, start):
+    """
+    Largest difference between the normalized series and 100 * price / first price.
+    """
+    frames = {t: cache.read(t, '1d', start, END, provider.history) for t in tickers}
+    dataset = PriceDataset(to_multi_level(frames, '1d'), tickers, start, END)
+    close = align_to_sessions(dataset.field('Close'))
+    expected = 100 * close / close.bfill().iloc[0]
+    return float(np.nanmax(np.abs(dataset.normalized('Close').to_numpy() - expected.to_numpy())))
+
+
+def run():
+    # Cache reads are logged at INFO, keep only the summary lines
+    logging.getLogger().setLevel(logging.WARNING)
+    provider = LocalProvider()
+    universe = provider.universe()['ticker'].tolist()
+
+    over_budget = 0
+    print(f"budget {LATENCY_BUDGET:.2f} s, chart width {CHART_WIDTH} px")
+    print(f"{'tickers':>7} {'years':>5} {'points':>8} {'best s':>7}  status")
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = OHLCVCache(cache_dir)
+        for num_tickers, years in CASES:
+            tickers = universe[:num_tickers]
+            start = END - pd.Timedelta(days=365 * years)
+            # Warm the cache, the budget covers what happens after the data is on disk
+            points = compare(cache, provider, tickers, start)
+
+            times = []
+            for _ in range(REPEAT):
+                started = time.perf_counter()
+                compare(cache, provider, tickers, start)
+                times.append(time.perf_counter() - started)
+            best = min(times)
+            status = 'ok' if best <= LATENCY_BUDGET else 'OVER BUDGET'
+            over_budget += best > LATENCY_BUDGET
+            print(f"{num_tickers:>7} {years:>5} {len(points):>8} {best:>7.3f}  {status}")
+
+        error = check_compounding(cache, provider, universe[:10], END - pd.Timedelta(days=365))
+        print(f"compounding: max difference from 100 * price / first price = {error:.2e}")
+    return over_budget
+
+
+if __name__ == "__main__":
+    sys.exit(1 if run() else 0)
@@ -0,0 +1,104 @@
+"""
+Upstream calls made by 50 concurrent sessions opening the same selections at
+the same moment, with and without request coalescing.
+
+Runs offline against the fake provider of benchmarks.fetch_planner:
+
+    cd src
+    python -m benchmarks.concurrent_sessions
+"""
+import logging
+import tempfile
+import threading
+import time
+
+from benchmarks.fetch_planner import FakeProvider
+from utils.ohlcv_cache import OHLCVCache, period_window, to_multi_level
+from utils.result_cache import ResultCache, result_key
+
+NUM_SESSIONS = 50
+
+# Slow enough that every session arrives while the first downloads are in flight
+LATENCY = 0.2
+
+# (tickers, period) selected by the sessions, in turn; '6mo' overlaps '1y'
+SELECTIONS = [
+    (['PETR4.SA', 'VALE3.SA'], '1y'),
+    (['VALE3.SA', 'PETR4.SA'], '1y'),
+    (['PETR4.SA'], '6mo'),
+    (['ITUB4.SA', 'PETR4.SA'], '1y'),
+]
+
+INTERVAL = '1d'
+
+
+def open_page(tickers, period, download, ohlcv, results):
+    """
+    What page_one does for a selection: a shared result cache over the OHLCV cache.
+    """
+    start, end = period_window(period)
+
+    def compute():
+        frames = {ticker: ohlcv.read(ticker, INTERVAL, start, end, download) for ticker in sorted(tickers)}
+        return to_multi_level(frames, INTERVAL)
+
+    return results.get_or_compute(result_key('page_one', tickers, period, INTERVAL), INTERVAL, compute)
+
+
+def open_page_uncached(tickers, period, download):
+    """
+    The pages before any caching: one download per session and ticker.
+    """
+    start, end = period_window(period)
+    return to_multi_level({ticker: download(ticker, start, end, INTERVAL) for ticker in tickers}, INTERVAL)
+
+
+def run_sessions(open_session):
+    barrier = threading.Barrier(NUM_SESSIONS)
+    errors = []
+
+    def session(i):
+        tickers, period = SELECTIONS[i % len(SELECTIONS)]
+        barrier.wait()
+        try:
+            data = open_session(tickers, period)
+            assert not data.empty
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(NUM_SESSIONS)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return time.perf_counter() - started
+
+
+def run():
+    # Every cache read logs a timing span, keep only the summary lines
+    logging.getLogger().setLevel(logging.WARNING)
+    print(f"{NUM_SESSIONS} sessions, {len(SELECTIONS)} selections, {LATENCY * 1000:.0f} ms per upstream call")
+    print(f"{'case':<12} {'upstream calls':>14} {'wall s':>8}")
+
+    provider = FakeProvider(latency=LATENCY)
+    elapsed = run_sessions(lambda tickers, period: open_page_uncached(tickers, period, provider.download))
+    print(f"{'uncached':<12} {provider.calls:>14} {elapsed:>8.2f}")
+
+    provider = FakeProvider(latency=LATENCY)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        ohlcv = OHLCVCache(cache_dir)
+        results = ResultCache()
+        elapsed = run_sessions(lambda tickers, period: open_page(tickers, period, provider.download, ohlcv, results))
+    print(f"{'coalesced':<12} {provider.calls:>14} {elapsed:>8.2f}")
+
+    stats = results.stats()
+    print(f"result cache: {stats['hits']} hits, {stats['misses']} misses, {stats['coalesced']} coalesced")
+    disk = ohlcv.stats()
+    print(f"ohlcv cache:  {disk['misses']} misses, {disk['partial_hits']} partial hits, {disk['coalesced']} coalesced")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,54 @@
+"""
+Points and JSON payload of the comparison chart, with every point against the
+LTTB downsampled series, and the time taken to downsample.
+
+The payload is estimated as the JSON of the plotted (date, ticker, value)
+points, which is what the Plotly figure carries to the browser.
+
+    cd src
+    python -m benchmarks.downsample
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.downsample import CHART_WIDTH, downsample, render_mode
+
+# (name, number of tickers, number of rows, frequency) of the charted series
+CASES = [
+    ('1y daily, 4 tickers', 4, 252, 'B'),
+    ('max daily, 4 tickers', 4, 20 * 252, 'B'),
+    ('60d of 5m, 4 tickers', 4, 60 * 84, '5min'),
+    ('max daily, 100 tickers', 100, 20 * 252, 'B'),
+]
+
+
+def make_series(num_tickers, num_rows, freq):
+    rng = np.random.default_rng(0)
+    index = pd.date_range(end='2025-01-01', periods=num_rows, freq=freq, tz='UTC', name='Date')
+    values = 100 + np.cumsum(rng.normal(0, 1, (num_rows, num_tickers)), axis=0)
+    return pd.DataFrame(values, index=index, columns=[f'T{i:03d}.SA' for i in range(num_tickers)])
+
+
+def payload_mb(points):
+    return len(points.to_json(orient='split', date_format='iso')) / 2**20
+
+
+def run():
+    print(f"chart width {CHART_WIDTH} px")
+    print(f"{'case':<24} {'points':>9} {'MB':>7} {'kept':>8} {'MB':>7} {'ms':>7}  render")
+    for name, num_tickers, num_rows, freq in CASES:
+        data = make_series(num_tickers, num_rows, freq)
+        full = data.rename_axis(columns='Ticker').stack().rename('Valor').reset_index()
+
+        started = time.perf_counter()
+        points = downsample(data, CHART_WIDTH)
+        elapsed = (time.perf_counter() - started) * 1000
+
+        print(f"{name:<24} {len(full):>9} {payload_mb(full):>7.2f} {len(points):>8} {payload_mb(points):>7.2f} "
+              f"{elapsed:>7.1f}  {render_mode(len(full))} -> {render_mode(len(points))}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,88 @@
+"""
+Wall-clock comparison of the chunked fetch planner against the old 30-day loop.
+
+Runs offline against a fake provider that sleeps for a fixed latency per request:
+
+    cd src
+    python -m benchmarks.fetch_planner
+"""
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.fetch_planner import fetch_chunks
+from utils.ohlcv_cache import period_window
+
+# Simulated round trip of a single provider request
+LATENCY = 0.05
+
+# (period, interval) pairs of page_one that take the chunked path
+CASES = [('6mo', '1d'), ('1y', '1wk'), ('5y', '1mo'), ('max', '3mo')]
+
+FREQUENCIES = {'1d': 'B', '1wk': 'W-MON', '1mo': 'MS', '3mo': 'QS'}
+
+
+class FakeProvider:
+    """
+    Local stand-in for yfinance that returns synthetic bars after a fixed delay.
+    """
+
+    def __init__(self, latency=LATENCY):
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def download(self, ticker, start, end, interval):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency)
+
+        index = pd.date_range(pd.Timestamp(start).normalize(), end, freq=FREQUENCIES[interval])
+        index = index[(index >= start) & (index < end)]
+        close = 100 + np.arange(len(index), dtype=float)
+        return pd.DataFrame({
+            'Open': close, 'High': close + 1, 'Low': close - 1, 'Close': close, 'Volume': 1000,
+        }, index=index)
+
+
+def legacy_fetch(ticker, start, end, interval, download):
+    """
+    The previous fetch_data_interval loop: sequential 30-day windows.
+    """
+    monthly_data = []
+    current_date = start
+    while current_date < end:
+        next_month = min(current_date + pd.Timedelta(days=30), end)
+        chunk = download(ticker, current_date, next_month, interval)
+        if not chunk.empty:
+            monthly_data.append(chunk)
+        current_date = next_month
+
+    combined_data = pd.concat(monthly_data)
+    return combined_data[~combined_data.index.duplicated(keep='first')]
+
+
+def run():
+    print(f"{'period':<6} {'interval':<8} {'legacy calls':>12} {'legacy s':>9} {'planner calls':>13} {'planner s':>9} {'speedup':>8}")
+    for period, interval in CASES:
+        start, end = period_window(period)
+
+        legacy = FakeProvider()
+        started = time.perf_counter()
+        expected = legacy_fetch('PETR4.SA', start, end, interval, legacy.download)
+        legacy_time = time.perf_counter() - started
+
+        planner = FakeProvider()
+        started = time.perf_counter()
+        result = fetch_chunks('PETR4.SA', start, end, interval, planner.download)
+        planner_time = time.perf_counter() - started
+
+        assert result.index.equals(expected.index), f"{period} {interval}: bars differ"
+        print(f"{period:<6} {interval:<8} {legacy.calls:>12} {legacy_time:>9.2f} "
+              f"{planner.calls:>13} {planner_time:>9.2f} {legacy_time / planner_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    run()
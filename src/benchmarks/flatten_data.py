@@ -0,0 +1,78 @@
+"""
+Latency and peak memory of flatten_data against the previous per-ticker loop.
+
+    cd src
+    python -m benchmarks.flatten_data
+"""
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from utils.price_data import flatten_data
+
+TICKER_COUNTS = [4, 50, 500]
+
+# Roughly two months of 5-minute bars
+NUM_ROWS = 2000
+
+
+def make_processed_data(num_tickers, num_rows=NUM_ROWS):
+    """
+    Synthetic data shaped like the output of process_data: (Price, Ticker)
+    columns plus the shared 'Datetime' column.
+    """
+    rng = np.random.default_rng(0)
+    index = pd.date_range('2024-01-02 10:00', periods=num_rows, freq='5min', tz='America/Sao_Paulo')
+    tickers = [f'T{i:04d}.SA' for i in range(num_tickers)]
+
+    close = 50 * np.exp(np.cumsum(rng.normal(0, 0.001, (num_rows, num_tickers)), axis=0))
+    fields = {
+        'Fechamento': close,
+        'Máxima': close * 1.001,
+        'Mínima': close * 0.999,
+        'Abertura': close,
+        'Volume': rng.integers(0, 10_000, (num_rows, num_tickers)),
+    }
+    data = pd.concat({field: pd.DataFrame(values, columns=tickers) for field, values in fields.items()}, axis=1)
+    data.columns.names = ['Price', 'Ticker']
+    data.insert(0, ('Datetime', ''), index)
+    return data
+
+
+def legacy_flatten_data(data, tickers=None):
+    """
+    The previous implementation: one xs().copy() per ticker and a final concat.
+    """
+    flattened_data = []
+    for ticker in data.columns.levels[1]:
+        ticker_data = data.xs(ticker, axis=1, level=1).copy()
+        if hasattr(ticker_data.index, 'tzinfo') and ticker_data.index.tzinfo is None:
+            ticker_data.index = ticker_data.index.tz_localize('UTC')
+        ticker_data['Ticker'] = ticker
+        flattened_data.append(ticker_data)
+    return pd.concat(flattened_data)
+
+
+def measure(func, data):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = func(data)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, result.memory_usage(deep=True).sum()
+
+
+def run():
+    print(f"{'tickers':>7} {'impl':<8} {'time ms':>9} {'peak MB':>9} {'result MB':>10}")
+    for num_tickers in TICKER_COUNTS:
+        data = make_processed_data(num_tickers)
+        for name, func in (('legacy', legacy_flatten_data), ('reshape', flatten_data)):
+            elapsed, peak, size = measure(func, data)
+            print(f"{num_tickers:>7} {name:<8} {elapsed * 1000:>9.1f} {peak / 2**20:>9.1f} {size / 2**20:>10.1f}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,84 @@
+"""
+Serving ranges of long daily histories from the memory-mapped history store
+against loading a whole Parquet file per read, as the OHLCV cache did before.
+
+Memory is reported as the bytes each approach brings into the process for the
+reads: the decoded Parquet frames, and the mapped bytes of the sliced ranges
+(pages shared with every other process through the OS page cache).
+
+    cd src
+    python -m benchmarks.history_store
+"""
+import tempfile
+import time
+
+import pandas as pd
+
+from utils.history_store import HistoryStore
+from utils.price_data import range_metrics
+from utils.providers import LocalProvider
+
+NUM_TICKERS = 200
+
+# 'max' history of every ticker, and the ranges read from it
+HISTORY_YEARS = 20
+RANGES = {'1mo': 30, '1y': 365, 'max': 365 * HISTORY_YEARS}
+
+END = pd.Timestamp('2025-01-01', tz='UTC')
+
+
+def measure(func):
+    """
+    Wall time of one run and the megabytes it reports reading.
+    """
+    started = time.perf_counter()
+    nbytes = func()
+    return time.perf_counter() - started, nbytes / 2**20
+
+
+def parquet_metrics(paths, start):
+    nbytes = 0
+    for path in paths:
+        data = pd.read_parquet(path)
+        nbytes += int(data.memory_usage(index=True).sum())
+        data = data[data.index >= start]
+        range_metrics(data['Close'].to_numpy(), data['High'].to_numpy(), data['Low'].to_numpy(), data['Volume'].to_numpy())
+    return nbytes
+
+
+def store_metrics(store, tickers, start):
+    nbytes = 0
+    for ticker in tickers:
+        history = store.open(ticker, '1d').slice(start, END)
+        nbytes += history.nbytes
+        history.metrics()
+    return nbytes
+
+
+def run():
+    provider = LocalProvider()
+    tickers = provider.universe()['ticker'].head(NUM_TICKERS).tolist()
+
+    with tempfile.TemporaryDirectory() as store_dir:
+        store = HistoryStore(store_dir)
+        paths = []
+        for ticker in tickers:
+            data = provider.history(ticker, END - pd.Timedelta(days=RANGES['max']), END, '1d')
+            store.write(ticker, '1d', data)
+            paths.append(f'{store_dir}/{ticker}.parquet')
+            data.to_parquet(paths[-1])
+        # Map every file once, like a worker that has served these tickers before
+        for ticker in tickers:
+            store.open(ticker, '1d')
+
+        print(f"{NUM_TICKERS} tickers, {HISTORY_YEARS} years of daily bars, metrics of a range per ticker")
+        print(f"{'range':<6} {'parquet s':>10} {'parquet MB':>11} {'memmap s':>9} {'memmap MB':>10}")
+        for name, days in RANGES.items():
+            start = END - pd.Timedelta(days=days)
+            parquet_seconds, parquet_mb = measure(lambda: parquet_metrics(paths, start))
+            store_seconds, store_mb = measure(lambda: store_metrics(store, tickers, start))
+            print(f"{name:<6} {parquet_seconds:>10.3f} {parquet_mb:>11.1f} {store_seconds:>9.3f} {store_mb:>10.1f}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,163 @@
+"""
+Technical indicators of a wide (date x ticker) price matrix with the NumPy
+IndicatorEngine against the `ta` package run ticker by ticker.
+
+Checks that every indicator matches `ta` (ATR only once its first window is
+complete, `ta` returns 0 before that), that appending bars with incremental
+updates gives the same values as a full recompute, and times the full
+computation per ticker and the update of a single new bar.
+
+Exits with status 1 when an indicator differs from `ta` by more than TOLERANCE:
+
+    cd src
+    python -m benchmarks.indicators
+"""
+import sys
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+import ta
+
+from utils.indicators import IndicatorEngine, technical_indicators
+
+# (number of tickers, number of daily bars) computed
+CASES = [(10, 252), (100, 5 * 252), (100, 20 * 252)]
+
+# Largest difference from `ta` accepted as the same value
+TOLERANCE = 1e-8
+
+# Bars appended one update at a time after the history
+NEW_BARS = 20
+
+REPEAT = 3
+
+
+def make_prices(num_tickers, num_rows):
+    rng = np.random.default_rng(0)
+    index = pd.date_range(end='2025-01-01', periods=num_rows, freq='B', tz='UTC', name='Date')
+    columns = [f'T{i:03d}.SA' for i in range(num_tickers)]
+    close = pd.DataFrame(50 * np.exp(np.cumsum(rng.normal(0, 0.02, (num_rows, num_tickers)), axis=0)),
+                         index=index, columns=columns)
+    # Tickers listed late and sessions without trades
+    close.iloc[:num_rows // 4, ::7] = np.nan
+    close = close.mask(rng.random(close.shape) < 0.01)
+    spread = close * rng.uniform(0, 0.02, close.shape)
+    return close, close + spread, close - spread
+
+
+def ta_indicators(close, high, low):
+    """
+    The engine's indicators with `ta`, on one ticker's own series.
+    """
+    bollinger = ta.volatility.BollingerBands(close, window=20, window_dev=2)
+    macd = ta.trend.MACD(close)
+    return {
+        'SMA_20': ta.trend.sma_indicator(close, window=20),
+        'EMA_20': ta.trend.ema_indicator(close, window=20),
+        'RSI_14': ta.momentum.rsi(close, window=14),
+        'MACD': macd.macd(),
+        'MACD_signal': macd.macd_signal(),
+        'MACD_diff': macd.macd_diff(),
+        'BB_mavg': bollinger.bollinger_mavg(),
+        'BB_high': bollinger.bollinger_hband(),
+        'BB_low': bollinger.bollinger_lband(),
+        'ATR_14': ta.volatility.average_true_range(high, low, close, window=14),
+    }
+
+
+def run_ta(close, high, low):
+    results = {}
+    for ticker in close.columns:
+        valid = close[ticker].notna()
+        results[ticker] = ta_indicators(close[ticker][valid], high[ticker][valid], low[ticker][valid])
+    return results
+
+
+def max_difference(engine_results, ta_results):
+    """
+    Largest difference from `ta` per indicator, inf when the missing values differ.
+    """
+    differences = {}
+    for ticker, indicators in ta_results.items():
+        for name, expected in indicators.items():
+            actual = engine_results[name][ticker].reindex(expected.index).to_numpy()
+            expected = expected.to_numpy()
+            if name.startswith('ATR'):
+                expected = np.where(np.arange(len(expected)) < 13, np.nan, expected)
+            same_missing = (np.isnan(actual) == np.isnan(expected)).all()
+            difference = np.nanmax(np.abs(actual - expected), initial=0.0) if same_missing else np.inf
+            differences[name] = max(differences.get(name, 0.0), difference)
+    return differences
+
+
+def incremental_difference(close, high, low, full):
+    """
+    Largest difference between updates of NEW_BARS single bars and the full computation.
+    """
+    engine = IndicatorEngine()
+    history = len(close) - NEW_BARS
+    parts = [engine.update(close.iloc[:history], high.iloc[:history], low.iloc[:history])]
+    for row in range(history, len(close)):
+        parts.append(engine.update(close.iloc[row:row + 1], high.iloc[row:row + 1], low.iloc[row:row + 1]))
+
+    difference = 0.0
+    for name, expected in full.items():
+        actual = pd.concat([part[name] for part in parts]).to_numpy()
+        if (np.isnan(actual) != np.isnan(expected.to_numpy())).any():
+            return np.inf
+        difference = max(difference, np.nanmax(np.abs(actual - expected.to_numpy()), initial=0.0))
+    return difference
+
+
+def best_time(function, *args):
+    times = []
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        function(*args)
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+
+def update_time(close, high, low):
+    """
+    Best time of one update with a single new bar, after the rest of the history.
+    """
+    times = []
+    for _ in range(REPEAT):
+        engine = IndicatorEngine()
+        engine.update(close.iloc[:-1], high.iloc[:-1], low.iloc[:-1])
+        started = time.perf_counter()
+        engine.update(close.iloc[-1:], high.iloc[-1:], low.iloc[-1:])
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+
+def run():
+    # ta divides by zero on flat windows and warns on chained assignment
+    warnings.simplefilter('ignore')
+    print(f"{'tickers':>7} {'bars':>6} {'ta ms/ticker':>13} {'engine ms/ticker':>17} {'speedup':>8} "
+          f"{'update ms':>10} {'max diff':>9} {'incr diff':>10}")
+    failed = []
+    for num_tickers, num_rows in CASES:
+        close, high, low = make_prices(num_tickers, num_rows)
+        full = technical_indicators(close, high, low)
+
+        differences = max_difference(full, run_ta(close, high, low))
+        incremental = incremental_difference(close, high, low, full)
+        failed += [name for name, difference in differences.items() if difference > TOLERANCE]
+        failed += ['incremental'] if incremental > TOLERANCE else []
+
+        ta_time = best_time(run_ta, close, high, low) / num_tickers * 1000
+        engine_time = best_time(technical_indicators, close, high, low) / num_tickers * 1000
+        print(f"{num_tickers:>7} {num_rows:>6} {ta_time:>13.3f} {engine_time:>17.3f} {ta_time / engine_time:>7.1f}x "
+              f"{update_time(close, high, low) * 1000:>10.2f} {max(differences.values()):>9.1e} {incremental:>10.1e}")
+
+    if failed:
+        print(f"different from ta: {', '.join(sorted(set(failed)))}")
+    return failed
+
+
+if __name__ == "__main__":
+    sys.exit(1 if run() else 0)
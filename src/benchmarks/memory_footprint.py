@@ -0,0 +1,67 @@
+"""
+Per-session memory footprint of page_one's price frames, with and without the
+compact mode (STOCK_ANALYSIS_COMPACT=1).
+
+    cd src
+    python -m benchmarks.memory_footprint
+"""
+import numpy as np
+import pandas as pd
+
+from utils.ohlcv_cache import to_multi_level
+from utils.price_data import compact_price_frame, flatten_data, process_data
+
+# Four tickers, the most page_one lets a session select
+NUM_TICKERS = 4
+
+# (label, interval, pandas frequency, years); B3 trades about 7 hours a day
+CASES = [
+    ('2y of 1h bars', '1h', '1h', 2),
+    ('5y of 15m bars', '15m', '15min', 5),
+    ('5y of 5m bars', '5m', '5min', 5),
+]
+
+
+def make_intraday(interval, freq, years, num_tickers=NUM_TICKERS):
+    """
+    Synthetic intraday OHLCV bars during B3 trading hours, in the layout
+    returned by fetch_data_interval.
+    """
+    rng = np.random.default_rng(0)
+    index = pd.date_range(end='2025-01-01', periods=int(pd.Timedelta(days=365 * years) / pd.Timedelta(freq)), freq=freq, tz='UTC')
+    local = index.tz_convert('America/Sao_Paulo')
+    index = index[(local.dayofweek < 5) & (local.hour >= 10) & (local.hour < 17)]
+
+    frames = {}
+    for i in range(num_tickers):
+        close = 30 * np.exp(np.cumsum(rng.normal(0, 0.002, len(index))))
+        frames[f'T{i}.SA'] = pd.DataFrame({
+            'Close': close,
+            'High': close * 1.002,
+            'Low': close * 0.998,
+            'Open': close,
+            'Volume': rng.integers(0, 500_000, len(index)),
+        }, index=index)
+    return to_multi_level(frames, interval)
+
+
+def megabytes(*frames):
+    return sum(frame.memory_usage(deep=True).sum() for frame in frames) / 2**20
+
+
+def run():
+    print(f"{'case':<16} {'rows':>9} {'default MB':>11} {'compact MB':>11} {'saved':>6}")
+    for label, interval, freq, years in CASES:
+        raw = make_intraday(interval, freq, years)
+
+        # Default mode keeps the processed frame for the table and the flattened frame for the metrics
+        data = process_data(raw)
+        flattened = flatten_data(data.copy(), None)
+        default = megabytes(data, flattened)
+
+        compact = megabytes(compact_price_frame(flattened))
+        print(f"{label:<16} {len(flattened):>9} {default:>11.1f} {compact:>11.1f} {1 - compact / default:>6.0%}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,87 @@
+"""
+Every fetch path run offline against the local provider, with latency and
+injected errors: chunked history downloads through the OHLCV cache, the
+screener pages and the sector enrichment.
+
+    cd src
+    python -m benchmarks.offline_fetch
+"""
+import logging
+import tempfile
+import time
+
+import pandas as pd
+
+from utils.fetch_planner import fetch_chunks
+from utils.fetch_tickers_sectors import EXCHANGE, enrich_sectors
+from utils.ohlcv_cache import OHLCVCache, period_window
+from utils.providers import LocalProvider, set_provider
+from utils.rate_limit import retry_with_backoff
+
+LATENCY = 0.05
+ERROR_RATE = 0.05
+
+NUM_TICKERS = 20
+
+# (period, interval) read through the cache; 5y of 1h bars takes several chunks
+HISTORY_CASES = [('1mo', '5m'), ('5y', '1h'), ('max', '1d')]
+
+SCREENER_PAGE = 250
+
+
+def history_path(provider, tickers):
+    def download(ticker, start, end, interval):
+        # Retried like the screener and get_info calls of the universe scripts
+        return retry_with_backoff(lambda: provider.history(ticker, start, end, interval), base_delay=0.05)
+
+    for period, interval in HISTORY_CASES:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = OHLCVCache(cache_dir)
+            start, end = period_window(period)
+            calls = provider.calls['history']
+            started = time.perf_counter()
+            bars = sum(len(cache.read(ticker, interval, start, end,
+                                      lambda *args: fetch_chunks(*args, download=download)))
+                       for ticker in tickers)
+            cold = time.perf_counter() - started
+
+            started = time.perf_counter()
+            for ticker in tickers:
+                cache.read(ticker, interval, start, end, download)
+            warm = time.perf_counter() - started
+        print(f"history {period:>4} {interval:>3}: {bars:>8} bars, {provider.calls['history'] - calls:>3} calls, "
+              f"cold {cold:.2f}s, warm {warm:.2f}s")
+
+
+def screener_path(provider):
+    started = time.perf_counter()
+    symbols, offset = [], 0
+    while True:
+        response = retry_with_backoff(lambda: provider.screen(EXCHANGE, size=SCREENER_PAGE, offset=offset), base_delay=0.05)
+        quotes = response['quotes']
+        symbols.extend(quote['symbol'] for quote in quotes)
+        if len(quotes) < SCREENER_PAGE:
+            break
+        offset += SCREENER_PAGE
+    print(f"screener: {len(symbols)} tickers in {provider.calls['screen']} pages, {time.perf_counter() - started:.2f}s")
+    return symbols
+
+
+def run():
+    # Chunk plans and retries are logged at INFO/WARNING, keep only the summary lines
+    logging.getLogger().setLevel(logging.ERROR)
+    provider = LocalProvider(latency=LATENCY, error_rate=ERROR_RATE)
+    set_provider(provider)
+    print(f"local provider: {LATENCY * 1000:.0f} ms latency, {ERROR_RATE:.0%} injected errors")
+
+    symbols = screener_path(provider)
+    history_path(provider, symbols[:NUM_TICKERS])
+
+    # enrich_sectors goes through get_provider(), with its own retries and rate limit
+    rows = enrich_sectors(symbols[:200], concurrency=8, rate=100)
+    known = pd.DataFrame(rows)['sector'].ne('Unknown').sum()
+    print(f"enrichment: {known}/{len(rows)} sectors, {provider.calls['get_info']} get_info calls")
+
+
+if __name__ == "__main__":
+    run()
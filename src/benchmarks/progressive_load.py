@@ -0,0 +1,68 @@
+"""
+Time-to-first-card and total load time of page_one, for the previous blocking
+load and the progressive per-ticker load.
+
+Runs offline with a fake provider whose latency differs per ticker:
+
+    cd src
+    python -m benchmarks.progressive_load
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+# Simulated download time of each selected ticker
+LATENCIES = {'PETR4.SA': 0.3, 'VALE3.SA': 0.9, 'ITUB4.SA': 0.5, 'BBDC4.SA': 1.2}
+
+# The previous page slept before every load
+LEGACY_SLEEP = 2.0
+
+
+def fake_load(ticker):
+    time.sleep(LATENCIES[ticker])
+    index = pd.date_range('2024-01-02', periods=250, freq='B', tz='UTC')
+    close = 30 + np.arange(len(index), dtype=float)
+    return pd.DataFrame({'Abertura': close, 'Fechamento': close, 'Ticker': ticker}, index=index)
+
+
+def legacy_load(tickers):
+    """
+    Sleep, download every ticker, then draw all cards at once.
+    """
+    started = time.perf_counter()
+    time.sleep(LEGACY_SLEEP)
+    frames = [fake_load(ticker) for ticker in tickers]
+    elapsed = time.perf_counter() - started
+    return elapsed, elapsed, len(frames)
+
+
+def progressive_load(tickers):
+    """
+    Download tickers concurrently and draw each card as soon as it is ready.
+    """
+    started = time.perf_counter()
+    first_card = None
+    cards = 0
+    with ThreadPoolExecutor(max_workers=len(tickers)) as executor:
+        futures = [executor.submit(fake_load, ticker) for ticker in tickers]
+        for future in as_completed(futures):
+            future.result()
+            cards += 1
+            if first_card is None:
+                first_card = time.perf_counter() - started
+    return first_card, time.perf_counter() - started, cards
+
+
+def run():
+    tickers = list(LATENCIES)
+    print(f"{'case':<12} {'first card s':>12} {'total s':>8}")
+    for label, load in (('legacy', legacy_load), ('progressive', progressive_load)):
+        first_card, total, cards = load(tickers)
+        assert cards == len(tickers)
+        print(f"{label:<12} {first_card:>12.2f} {total:>8.2f}")
+
+
+if __name__ == "__main__":
+    run()
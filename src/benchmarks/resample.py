@@ -0,0 +1,86 @@
+"""
+Upstream calls and bars downloaded while a session steps through every period
+of page_one, shortest first and longest first, with one download per
+(period, interval) against coarse intervals resampled from cached 5m and daily bars.
+
+Runs offline against the local provider:
+
+    cd src
+    python -m benchmarks.resample
+"""
+import logging
+import tempfile
+import time
+
+from utils.fetch_planner import fetch_chunks
+from utils.ohlcv_cache import OHLCVCache, period_window
+from utils.providers import LocalProvider
+from utils.resample import read_bars
+
+LATENCY = 0.05
+
+TICKERS = ['PETR4.SA', 'VALE3.SA', 'ITUB4.SA', 'BBDC4.SA']
+
+# The (period, interval) pairs of page_one, in the order of its selectbox
+PAGE_ONE_PERIODS = [
+    ('1d', '5m'),
+    ('5d', '30m'),
+    ('1mo', '1h'),
+    ('6mo', '1d'),
+    ('1y', '1wk'),
+    ('5y', '1mo'),
+    ('max', '3mo'),
+]
+
+
+class CountingProvider(LocalProvider):
+    """
+    Local provider that also counts the bars it serves.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.bars = 0
+
+    def history(self, ticker, start, end, interval):
+        data = super().history(ticker, start, end, interval)
+        self.bars += len(data)
+        return data
+
+
+def step_through(read, periods):
+    provider = CountingProvider(latency=LATENCY)
+
+    def download(ticker, start, end, interval):
+        return fetch_chunks(ticker, start, end, interval, provider.history)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = OHLCVCache(cache_dir)
+        started = time.perf_counter()
+        for period, interval in periods:
+            start, end = period_window(period)
+            for ticker in TICKERS:
+                read(cache, ticker, interval, start, end, download)
+        elapsed = time.perf_counter() - started
+    return provider.calls['history'], provider.bars, elapsed
+
+
+def run():
+    # Cache reads and chunk plans are logged at INFO, keep only the summary lines
+    logging.getLogger().setLevel(logging.WARNING)
+    print(f"{len(TICKERS)} tickers through {len(PAGE_ONE_PERIODS)} periods, {LATENCY * 1000:.0f} ms per upstream call")
+    print(f"{'case':<30} {'upstream calls':>14} {'bars downloaded':>16} {'wall s':>8}")
+
+    orders = [('shortest first', PAGE_ONE_PERIODS), ('longest first', PAGE_ONE_PERIODS[::-1])]
+    cases = [
+        ('per interval', lambda cache, *args: cache.read(*args)),
+        ('resampled', lambda cache, *args: read_bars(*args, cache=cache)),
+    ]
+    for order, periods in orders:
+        for name, read in cases:
+            calls, bars, elapsed = step_through(read, periods)
+            print(f"{f'{order}, {name}':<30} {calls:>14} {bars:>16} {elapsed:>8.2f}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,244 @@
+"""
+Benchmark suite of the data pipeline hot paths on synthetic data at production
+scale (1,600 tickers, 20 years of daily bars, 60 days of 5-minute bars).
+
+Every case records its best time over a few runs and the peak memory of one
+traced run, and is compared with the stored baseline to catch regressions. A
+case that looks slower is timed again over more runs before it is reported, so
+a busy moment of the machine doesn't fail the check:
+
+    cd src
+    python -m benchmarks.suite                     # compare with baseline.json
+    python -m benchmarks.suite --scale quick       # smaller data for a fast check
+    python -m benchmarks.suite --update-baseline   # record the current numbers
+
+Baselines depend on the machine; record them again when it changes.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from utils.correlation import correlate
+from utils.dataset import PriceDataset
+from utils.fetch_planner import merge_chunks
+from utils.helpers import get_all_tickers_with_sectors, get_performance_summary
+from utils.price_data import calculate_metrics, flatten_data, process_data
+from utils.universe import FILTERED_TICKERS_PATH, UniverseIndex
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# Number of tickers, daily sessions and intraday sessions of each scale
+SCALES = {
+    'full': {'tickers': 1600, 'daily_sessions': 20 * 252, 'intraday_sessions': 60},
+    'quick': {'tickers': 100, 'daily_sessions': 5 * 252, 'intraday_sessions': 10},
+}
+
+# 5-minute bars from 10:00 to 17:00
+BARS_PER_SESSION = 84
+
+# Tickers a page_one session can select, used by calculate_metrics
+SELECTED_TICKERS = 4
+
+# Daily history is downloaded and merged in yearly chunks sharing a boundary bar
+CHUNK_SESSIONS = 252
+
+# A case regresses when it is this much slower or uses this much more memory than the baseline
+TIME_TOLERANCE = 1.5
+MEMORY_TOLERANCE = 1.25
+
+# Differences below this many seconds or megabytes are noise, whatever the ratio.
+# Cases of the quick scale take milliseconds, where scheduling alone can double a time.
+TIME_FLOOR = 0.05
+MEMORY_FLOOR = 1.0
+
+REPEAT = 3
+
+# Runs of the second timing of a case that looked slower than its baseline
+RECHECK_REPEAT = 10
+
+
+def make_ohlcv(rng, num_rows, num_tickers, missing=0.0):
+    """
+    Random-walk OHLCV fields as (rows x tickers) arrays.
+    """
+    close = 30 * np.exp(np.cumsum(rng.normal(0, 0.01, (num_rows, num_tickers)), axis=0))
+    if missing:
+        close[rng.random(close.shape) < missing] = np.nan
+    return {
+        'Close': close,
+        'High': close * 1.01,
+        'Low': close * 0.99,
+        'Open': close,
+        'Volume': rng.integers(0, 1_000_000, (num_rows, num_tickers)).astype(float),
+    }
+
+
+def make_data(scale):
+    """
+    Synthetic data of a scale: daily and intraday (Price, Ticker) frames like
+    fetch_data_timeframe/fetch_data_interval return, and the per-ticker chunks
+    the daily history is downloaded in.
+    """
+    sizes = SCALES[scale]
+    rng = np.random.default_rng(0)
+    tickers = [f'T{i:04d}.SA' for i in range(sizes['tickers'])]
+
+    daily_index = pd.bdate_range(end='2025-01-01', periods=sizes['daily_sessions'], tz='UTC', name='Date')
+    daily = make_ohlcv(rng, len(daily_index), len(tickers), missing=0.02)
+
+    sessions = pd.bdate_range(end='2025-01-01', periods=sizes['intraday_sessions'], tz='UTC')
+    bar_offsets = pd.to_timedelta(np.arange(BARS_PER_SESSION) * 5, unit='min') + pd.Timedelta(hours=13)
+    intraday_index = pd.DatetimeIndex((sessions.values[:, None] + bar_offsets.values[None, :]).ravel(), tz='UTC', name='Datetime')
+    intraday = make_ohlcv(rng, len(intraday_index), len(tickers))
+
+    def to_frame(fields, index):
+        data = pd.concat({field: pd.DataFrame(values, index=index, columns=tickers) for field, values in fields.items()}, axis=1)
+        data.columns.names = ['Price', 'Ticker']
+        return data
+
+    chunks = []
+    for i in range(len(tickers)):
+        ticker_daily = pd.DataFrame({field: values[:, i] for field, values in daily.items()}, index=daily_index)
+        chunks.append([ticker_daily.iloc[max(start - 1, 0):start + CHUNK_SESSIONS]
+                       for start in range(0, len(ticker_daily), CHUNK_SESSIONS)])
+
+    return {
+        'tickers': tickers,
+        'daily': to_frame(daily, daily_index),
+        'intraday': to_frame(intraday, intraday_index),
+        'chunks': chunks,
+    }
+
+
+def make_cases(data):
+    """
+    Cases as (name, function) pairs; inputs are prepared here, outside the timings.
+    """
+    tickers = data['tickers']
+    processed = process_data(data['intraday'])
+    flattened = flatten_data(processed, tickers)
+    selected = tickers[:SELECTED_TICKERS]
+
+    close = data['daily']['Close']
+    long_close = close.stack().rename('close').reset_index()
+    long_close.columns = ['datetime', 'symbol', 'close']
+    # Without the missing prices, the frame is no longer a complete grid to reshape
+    sparse_close = long_close.dropna()
+    dataset = PriceDataset(data['daily'], tickers, close.index[0], close.index[-1])
+
+    sectors = list(UniverseIndex(FILTERED_TICKERS_PATH).sectors)
+
+    return [
+        # Results are counted rather than kept, so peaks reflect one call at a time
+        ('merge_chunks', lambda: [len(merge_chunks(ticker_chunks)) for ticker_chunks in data['chunks']]),
+        ('process_data', lambda: process_data(data['intraday'])),
+        ('flatten_data', lambda: flatten_data(processed, tickers)),
+        ('calculate_metrics', lambda: [calculate_metrics(flattened, ticker) for ticker in selected]),
+        ('get_performance_summary', lambda: get_performance_summary(long_close, tickers)),
+        ('get_performance_summary_sparse', lambda: get_performance_summary(sparse_close, tickers)),
+        ('universe_index_build', lambda: UniverseIndex(FILTERED_TICKERS_PATH)),
+        ('get_all_tickers_with_sectors', lambda: [len(get_all_tickers_with_sectors([sector])) for sector in sectors * 100]),
+        ('normalization', lambda: dataset.normalized('Close')),
+        ('correlation', lambda: correlate(dataset.returns('Close'), method='spearman')),
+    ]
+
+
+def measure(func, repeat=REPEAT):
+    """
+    Best wall time over `repeat` runs, and the peak traced memory of one more run.
+    """
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(times), peak / 2**20
+
+
+def load_baseline(path=BASELINE_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(baseline, path=BASELINE_PATH):
+    with open(path + '.tmp', 'w') as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write('\n')
+    os.replace(path + '.tmp', path)
+
+
+def compare(result, reference):
+    """
+    Status of a case against its baseline entry.
+    """
+    if reference is None:
+        return 'new'
+    problems = []
+    if result['seconds'] > max(reference['seconds'] * TIME_TOLERANCE, reference['seconds'] + TIME_FLOOR):
+        problems.append('SLOWER')
+    if result['peak_mb'] > max(reference['peak_mb'] * MEMORY_TOLERANCE, reference['peak_mb'] + MEMORY_FLOOR):
+        problems.append('MORE MEMORY')
+    return ' '.join(problems) or 'ok'
+
+
+def run(scale='full', update_baseline=False, repeat=REPEAT):
+    sizes = SCALES[scale]
+    print(f"scale '{scale}': {sizes['tickers']} tickers, {sizes['daily_sessions']} daily sessions, "
+          f"{sizes['intraday_sessions']} sessions of 5m bars")
+    data = make_data(scale)
+    cases = make_cases(data)
+
+    baseline = load_baseline()
+    references = baseline.get(scale, {})
+    results = {}
+    regressions = 0
+
+    print(f"{'case':<30} {'time s':>8} {'base s':>8} {'peak MB':>8} {'base MB':>8}  status")
+    for name, func in cases:
+        seconds, peak_mb = measure(func, repeat)
+        results[name] = {'seconds': round(seconds, 4), 'peak_mb': round(peak_mb, 1)}
+        reference = references.get(name)
+        status = compare(results[name], reference)
+        if 'SLOWER' in status and not update_baseline:
+            # Confirm with the best of more runs before calling it a regression
+            seconds = min(seconds, measure(func, RECHECK_REPEAT)[0])
+            results[name]['seconds'] = round(seconds, 4)
+            status = compare(results[name], reference)
+        if status not in ('ok', 'new'):
+            regressions += 1
+        base_seconds = f"{reference['seconds']:>8.3f}" if reference else f"{'-':>8}"
+        base_mb = f"{reference['peak_mb']:>8.1f}" if reference else f"{'-':>8}"
+        print(f"{name:<30} {seconds:>8.3f} {base_seconds} {peak_mb:>8.1f} {base_mb}  {status}")
+
+    if update_baseline:
+        baseline[scale] = results
+        save_baseline(baseline)
+        print(f"Baseline for '{scale}' saved to {BASELINE_PATH}")
+    elif regressions:
+        print(f"{regressions} case(s) regressed against the baseline")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the data pipeline hot paths against a stored baseline.")
+    parser.add_argument('--scale', choices=list(SCALES), default='full')
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    parser.add_argument('--update-baseline', action='store_true',
+                        help="record the current numbers as the baseline of the scale")
+    args = parser.parse_args()
+
+    regressions = run(args.scale, args.update_baseline, args.repeat)
+    sys.exit(1 if regressions and not args.update_baseline else 0)
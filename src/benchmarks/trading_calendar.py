@@ -0,0 +1,65 @@
+"""
+Trading day lookups with the B3 session calendar against the weekday loop it
+replaced, plus the days each approach gets wrong.
+
+    cd src
+    python -m benchmarks.trading_calendar
+"""
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from utils.b3_calendar import b3_calendar
+from utils.helpers import get_trading_days
+
+START = date(2005, 1, 1)
+END = date(2024, 12, 31)
+
+# Random (start, end) windows queried by the session counts
+NUM_QUERIES = 10_000
+
+REPEAT = 5
+
+
+def weekday_trading_days(start_date, end_date):
+    """
+    get_trading_days before the calendar: weekdays only, built as a list.
+    """
+    all_dates = pd.date_range(start=start_date, end=end_date)
+    weekdays = all_dates[all_dates.dayofweek < 5]
+    return [date.fromordinal(d.toordinal()) for d in weekdays]
+
+
+def best_of(func, repeat=REPEAT):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+
+def run():
+    print(f"{'case':<28} {'before s':>9} {'after s':>9}")
+
+    before = best_of(lambda: weekday_trading_days(START, END))
+    after = best_of(lambda: get_trading_days(START, END))
+    print(f"{'20y trading days list':<28} {before:>9.4f} {after:>9.4f}")
+
+    rng = np.random.default_rng(0)
+    offsets = np.sort(rng.integers(0, (END - START).days, (NUM_QUERIES, 2)), axis=1)
+    windows = [(np.datetime64(START) + int(a), np.datetime64(START) + int(b)) for a, b in offsets]
+    before = best_of(lambda: [len(weekday_trading_days(a, b)) for a, b in windows[:200]], repeat=1) * NUM_QUERIES / 200
+    after = best_of(lambda: [b3_calendar.session_count(a, b) for a, b in windows], repeat=1)
+    print(f"{f'{NUM_QUERIES} session counts':<28} {before:>9.4f} {after:>9.4f}  (before extrapolated from 200)")
+
+    weekdays = set(weekday_trading_days(START, END))
+    sessions = set(get_trading_days(START, END))
+    print(f"weekdays without a B3 session in {START.year}-{END.year}: {len(weekdays - sessions)} "
+          f"of {len(weekdays)} days the weekday loop counted")
+
+
+if __name__ == "__main__":
+    run()
@@ -1,158 +1,126 @@
 import streamlit as st
 import pandas as pd
-import yfinance as yf
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 #from yahooquery import get_symbols_by_exchange
-from datetime import datetime, timedelta
 #import pytz
-#import ta
 #import os
 from utils.helpers import format_currency, format_percentage, get_top_15_tickers, get_all_tickers_with_sectors
+from utils.ohlcv_cache import period_window, to_multi_level, trim_to_period
+from utils.fetch_planner import fetch_chunks
+from utils.indicators import technical_indicators
+from utils.providers import get_provider
+from utils.resample import read_bars
+from utils.price_data import COMPACT_MODE, compact_price_frame, concat_flattened, flatten_data, history_page, history_page_count, process_data
+from utils.result_cache import result_cache, result_key
+from utils.timing import frame_fields, span, start_timeline, submit, timeline_figure
+
+# Spans of this rerun, shown in the optional performance panel
+timeline = start_timeline('page_one')
+
+# Ticker cards per row, and tickers loaded at the same time
+CARDS_PER_ROW = 4
+MAX_LOAD_WORKERS = 8
+
+# Download a single request for one ticker and an explicit date range
+def download_chunk(ticker, start_date, end_date, interval):
+    with span('download_chunk', ticker=ticker, start=f'{start_date:%Y-%m-%d}', end=f'{end_date:%Y-%m-%d}') as download_span:
+        data = get_provider().history(ticker, start_date, end_date, interval)
+        download_span.set(**frame_fields(data))
+    return data
+
+# Download a single ticker for an explicit date range, in as few requests as the interval allows
+def download_range(ticker, start_date, end_date, interval):
+    return fetch_chunks(ticker, start_date, end_date, interval, download_chunk)
 
 # Fetch stock data based on the ticker, period, and interval
 def fetch_data_interval(ticker, period, interval):
-    # For shorter periods, use the standard download method
-    if period not in ['6mo', '1y', '5y', 'max']:
-        return yf.download(ticker, period=period, interval=interval, multi_level_index=True)
-    
-    # For longer periods, break it into monthly chunks
-    end_date = datetime.now()
-    
-    # Calculate start date based on period
-    if period == '6mo':
-        start_date = end_date - timedelta(days=180)
-    elif period == '1y':
-        start_date = end_date - timedelta(days=365)
-    elif period == '5y':
-        start_date = end_date - timedelta(days=365*5)
-    elif period == 'max':
-        # Using a reasonably long period - adjust if needed
-        start_date = end_date - timedelta(days=365*20)
-    
-    # Convert to string format for yfinance
-    end_date_str = end_date.strftime('%Y-%m-%d')
-    
-    # Initialize an empty list to store monthly dataframes
-    monthly_data = []
-    current_date = start_date
-    
-    # Fetch data month by month
-    while current_date < end_date:
-        # Calculate next month date
-        next_month = current_date + timedelta(days=30)  # Approximation of one month
-        if next_month > end_date:
-            next_month = end_date
-        
-        # Format dates for yfinance
-        current_date_str = current_date.strftime('%Y-%m-%d')
-        next_month_str = next_month.strftime('%Y-%m-%d')
-        
-        # Download data for this month
-        print(f"Downloading data for {ticker} from {current_date_str} to {next_month_str}")
-        monthly_chunk = yf.download(
-            ticker, 
-            start=current_date_str, 
-            end=next_month_str, 
-            interval=interval, 
-            multi_level_index=True
-        )
-        
-        # Add to our list if data is not empty
-        if not monthly_chunk.empty:
-            monthly_data.append(monthly_chunk)
-        
-        # Move to next month
-        current_date = next_month
-    
-    # Combine all monthly chunks
-    if monthly_data:
-        combined_data = pd.concat(monthly_data)
-        # Remove duplicate entries that might exist at month boundaries
-        combined_data = combined_data[~combined_data.index.duplicated(keep='first')]
-        return combined_data
-    else:
-        # Return empty DataFrame if no data was found
-        return pd.DataFrame()
-
-# Flatten the data to a single DataFrame
-def flatten_data(data, tickers=None):
-    # Check if we have a multi-index DataFrame
-    if isinstance(data.columns, pd.MultiIndex):
-        # Convert multi-level columns to a flat DataFrame
-        # Create a new DataFrame to store the flattened data
-        flattened_data = []
-        
-        # For each ticker in the second level of the multi-index
-        for ticker in data.columns.levels[1]:
-            # Get data for this ticker
-            ticker_data = data.xs(ticker, axis=1, level=1).copy()
-            
-            # Ensure the index is timezone-aware
-            if hasattr(ticker_data.index, 'tzinfo') and ticker_data.index.tzinfo is None:
-                ticker_data.index = ticker_data.index.tz_localize('UTC')
-                
-            # Add a Ticker column
-            ticker_data['Ticker'] = ticker
-            # Add to the list
-            flattened_data.append(ticker_data)
-        
-        # Concatenate all the ticker dataframes
-        if flattened_data:
-            data = pd.concat(flattened_data)
-        else:
-            # If there's only one ticker, it might not have a multi-level structure
-            if tickers and len(tickers) > 0:
-                data['Ticker'] = tickers[0]
-    else:
-        # If not a multi-index, assume it's a single ticker
-        if 'Ticker' not in data.columns and tickers and len(tickers) > 0:
-            data['Ticker'] = tickers[0]
+    tickers = [ticker] if isinstance(ticker, str) else list(ticker)
+
+    # Read through the local OHLCV cache, coarse intervals are resampled from finer cached bars
+    # and only missing ranges hit the network
+    start_date, end_date = period_window(period)
+    frames = {t: read_bars(t, interval, start_date, end_date, download_range) for t in tickers}
+
+    data = to_multi_level(frames, interval)
+    return trim_to_period(data, period)
+
+# Fetch, process and flatten the data of a selection, once for all sessions
+def load_interval_data(tickers, period, interval):
+    key = result_key('page_one', tickers, period, interval)
+    selected = list(key[1])
+
+    # Runs on a cache miss, inside the load_interval_data span
+    def compute(load_span):
+        load_span.set(cache='miss')
+        with span('fetch_data_interval') as stage:
+            data = fetch_data_interval(selected, period, interval)
+            stage.set(**frame_fields(data))
+        if data.empty:
+            return data
+        with span('process_data') as stage:
+            data = process_data(data)
+            stage.set(**frame_fields(data))
+        with span('flatten_data') as stage:
+            flattened_data = flatten_data(data, selected)
+            stage.set(**frame_fields(flattened_data))
+        if COMPACT_MODE:
+            # Only the compact long frame is kept in the cache
+            with span('compact_price_frame') as stage:
+                flattened_data = compact_price_frame(flattened_data)
+                stage.set(**frame_fields(flattened_data))
+        return flattened_data
+
+    with span('load_interval_data', ticker=', '.join(selected), period=period, interval=interval) as load_span:
+        load_span.set(cache='hit')
+        data = result_cache.get_or_compute(key, interval, lambda: compute(load_span))
+        load_span.set(**frame_fields(data))
     return data
 
-# Process data to ensure it is timezone-aware and has the correct format
-def process_data(data, period):
-    # Continue with normal processing
-    # Check if the index is timezone-naive and localize if needed
-    if data.index.tzinfo is None:
-        data.index = data.index.tz_localize('UTC')
-    
-    # Now convert to Sao Paulo timezone
-    data.index = data.index.tz_convert('America/Sao_Paulo')
-    data.reset_index(inplace=True)
-    if period not in ['6mo', '1y', '5y', 'max']:
-        data['Data'] = pd.to_datetime(data['Datetime']).dt.strftime('%d/%m/%Y %H:%M')
-    else:
-        data['Data'] = pd.to_datetime(data['Date']).dt.strftime('%d/%m/%Y %H:%M')
-
-    data.rename(columns={
-            "Open": "Abertura",
-            "High": "Máxima",
-            "Low": "Mínima",
-            "Close": "Fechamento",
-            "Volume": "Volume"
-        }, inplace=True)
-    return data
+# Display the metric card of a single ticker
+def show_ticker_card(ticker, data_ticker):
+    # Calculate metrics for this ticker
+    metrics = {
+        'last_close': data_ticker['Fechamento'].iloc[-1],
+        'last_open': data_ticker['Abertura'].iloc[-1],
+        'last_high': data_ticker['Máxima'].iloc[-1],
+        'last_low': data_ticker['Mínima'].iloc[-1],
+        'last_volume': data_ticker['Volume'].iloc[-1],
+        'time_average': data_ticker['Fechamento'].mean()
+    }
 
-# Calculate basic metrics from the stock data
-def calculate_metrics(data, ticker=None):
-    # If a ticker is specified, filter the data for that ticker
-    if ticker and 'Ticker' in data.columns:
-        data = data[data['Ticker'] == ticker]
-    
-    last_close = data['Fechamento'].iloc[-1]
-    prev_close = data['Fechamento'].iloc[0]
-    change = last_close - prev_close
-    pct_change = (change / prev_close) * 100
-    high = data['Máxima'].max()
-    low = data['Mínima'].min()
-    volume = data['Volume'].sum()
-    return last_close, change, pct_change, high, low, volume
+    # Calculate percentage change
+    var_delta = format_percentage(((metrics['last_close'] - metrics['last_open']) / metrics['last_open']))
 
-# Add simple moving average (SMA) and exponential moving average (EMA) indicators
-# def add_technical_indicators(data):
-#     data['SMA_20'] = ta.trend.sma_indicator(data['Close'], window=20)
-#     data['EMA_20'] = ta.trend.ema_indicator(data['Close'], window=20)
-#     return data
+    with st.expander(ticker, expanded=True):
+        #st.metric(label="Ticker", value=ticker, label_visibility="hidden")
+        #st.markdown("<hr style='margin: 10px 0; opacity: 0.8;'>", unsafe_allow_html=True)
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric(label="Última Abertura", value=format_currency(metrics['last_open']))
+        with col2:
+            st.metric(label="Último Fechamento", value=format_currency(metrics['last_close']),
+                    delta=var_delta)
+        st.markdown("<hr style='margin: 10px 0; opacity: 0.8;'>", unsafe_allow_html=True)
+        st.metric(label="Fechamento Médio", value=format_currency(metrics['time_average']))
+
+        # Indicators of the last bar, empty until the ticker has enough bars
+        indicators = add_technical_indicators(data_ticker).iloc[-1]
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric(label="MMS 20", value=format_indicator(indicators['SMA_20'], format_currency))
+        with col2:
+            st.metric(label="MME 20", value=format_indicator(indicators['EMA_20'], format_currency))
+        with col3:
+            st.metric(label="IFR 14", value=format_indicator(indicators['RSI_14'], lambda value: f'{value:.1f}'))
+
+# Add simple moving average (SMA), exponential moving average (EMA) and RSI indicators
+def add_technical_indicators(data):
+    indicators = technical_indicators(data[['Fechamento']])
+    return data.assign(**{name: indicators[name]['Fechamento'] for name in ('SMA_20', 'EMA_20', 'RSI_14')})
+
+def format_indicator(value, formatter):
+    return '-' if pd.isna(value) else formatter(value)
 
 
 
@@ -194,9 +162,11 @@ with st.sidebar:
     tickers_list = get_all_tickers_with_sectors(selected_sector_key)
 
 
-    selected_tickers = st.multiselect("Selecionar os Tickers", tickers_list, key="grafico_tickers", max_selections=4)
+    selected_tickers = st.multiselect("Selecionar os Tickers", tickers_list, key="grafico_tickers")
     time_period_label = st.selectbox('Período de Tempo', ['1 dia', '5 dias', '1 mês', '6 meses', '1 ano', '5 anos', 'máximo'])
 
+    show_timings = st.toggle('Painel de desempenho', value=False, help='Mostra o tempo de cada etapa desta atualização da página.')
+
     # Sidebar information section
     st.subheader('Sobre')
     st.warning('As relações apresentadas não são recomendações de compra ou venda, mas sim uma ferramenta de visualização de dados.', icon=':material/warning:')
@@ -208,69 +178,72 @@ with st.sidebar:
 if len(selected_tickers) > 0:
     st.header(f'Comparação último(s) {time_period_label}')
 
-    with st.spinner('Carregando dados...'):
-        try:
-            time.sleep(2)
-            data = fetch_data_interval(selected_tickers, time_period[time_period_label][0], time_period[time_period_label][1])
-            #st.write(data)
-
-            if data.empty:
-                st.error('Nenhum dado encontrado para o período selecionado.', icon=':material/cancel:')
-            else:
-                data = process_data(data, time_period[time_period_label][0])
-                flattened_data = flatten_data(data, selected_tickers)
-                metrics = {}
-                # Loop through all selected tickers
-                ticker_cols = st.columns(len(selected_tickers))
-                for i, ticker in enumerate(selected_tickers):
-                    
-                    # Filter data for the current ticker
-                    data_ticker = flattened_data[flattened_data['Ticker'] == ticker]
-                    
-                    # Skip if no data for this ticker
-                    if len(data_ticker) == 0:
-                        continue
-                        
-                    # Calculate metrics for this ticker
-                    metrics[ticker] = {
-                        'last_close': data_ticker['Fechamento'].iloc[-1],
-                        'last_open': data_ticker['Abertura'].iloc[-1],
-                        'last_high': data_ticker['Máxima'].iloc[-1],
-                        'last_low': data_ticker['Mínima'].iloc[-1],
-                        'last_volume': data_ticker['Volume'].iloc[-1],
-                        'time_average': data_ticker['Fechamento'].mean()
-                    }
-                    
-                    # Calculate percentage change
-                    var_delta = format_percentage(((metrics[ticker]['last_close'] - metrics[ticker]['last_open']) / metrics[ticker]['last_open']))
-                    
-                    # Display metrics for this ticker
-                    with ticker_cols[i]:
-                        with st.expander(ticker, expanded=True):
-                            #st.metric(label="Ticker", value=ticker, label_visibility="hidden")
-                            #st.markdown("<hr style='margin: 10px 0; opacity: 0.8;'>", unsafe_allow_html=True)
-                            col1, col2 = st.columns(2)
-                            with col1:
-                                st.metric(label="Última Abertura", value=format_currency(metrics[ticker]['last_open']))
-                            with col2:
-                                st.metric(label="Último Fechamento", value=format_currency(metrics[ticker]['last_close']), 
-                                        delta=var_delta)
-                            st.markdown("<hr style='margin: 10px 0; opacity: 0.8;'>", unsafe_allow_html=True)
-                            st.metric(label="Fechamento Médio", value=format_currency(metrics[ticker]['time_average']))
-                    
-                    # Add a small space between tickers for better visual separation
-                    # if i < len(selected_tickers) - 1:
-                    #     st.markdown("<hr style='margin: 10px 0; opacity: 0.3;'>", unsafe_allow_html=True)
-                
-                # st.subheader(f'Gráfico Comparativo - {selected_tickers}')
-                
-                # Display historical data and technical indicators
-                st.subheader('Dados Históricos')
-                st.dataframe(data[['Data', 'Abertura', 'Máxima', 'Mínima', 'Fechamento', 'Volume']], use_container_width=True, hide_index=True)
-                
-                
-        except Exception as e:
-            #st.error(f'API Yahoo Finance: {str(e)}')
-            st.info('Nada encontrado para o período selecionado. Tente selecionar um período de tempo diferente.', icon=':material/info:')
+    period, interval = time_period[time_period_label]
+    started = time.perf_counter()
+    first_card = None
+
+    # One placeholder per ticker, in rows of CARDS_PER_ROW, filled as soon as that ticker's data is ready
+    placeholders = {}
+    for row_start in range(0, len(selected_tickers), CARDS_PER_ROW):
+        ticker_cols = st.columns(CARDS_PER_ROW)
+        for i, ticker in enumerate(selected_tickers[row_start:row_start + CARDS_PER_ROW]):
+            placeholders[ticker] = ticker_cols[i].empty()
+            placeholders[ticker].caption(f'Carregando {ticker}...')
+
+    # Tickers are fetched concurrently, cards are drawn from this thread as they complete
+    ticker_data = {}
+    with ThreadPoolExecutor(max_workers=min(len(selected_tickers), MAX_LOAD_WORKERS)) as executor:
+        futures = {submit(executor, load_interval_data, [ticker], period, interval): ticker for ticker in selected_tickers}
+        for future in as_completed(futures):
+            ticker = futures[future]
+            try:
+                data_ticker = future.result()
+            except Exception as e:
+                #st.error(f'API Yahoo Finance: {str(e)}')
+                placeholders[ticker].info(f'Nada encontrado para {ticker}.', icon=':material/info:')
+                continue
+
+            # Skip if no data for this ticker
+            if data_ticker.empty:
+                placeholders[ticker].info(f'Nada encontrado para {ticker}.', icon=':material/info:')
+                continue
+
+            ticker_data[ticker] = data_ticker
+            with span('metrics', ticker=ticker), placeholders[ticker].container():
+                show_ticker_card(ticker, data_ticker)
+            if first_card is None:
+                first_card = time.perf_counter() - started
+
+    total_load = time.perf_counter() - started
+
+    if not ticker_data:
+        st.error('Nenhum dado encontrado para o período selecionado.', icon=':material/cancel:')
+    else:
+        st.caption(f'Primeiro card em {first_card:.2f} s · carregamento completo em {total_load:.2f} s')
+        flattened_data = concat_flattened(ticker_data, selected_tickers)
+
+        # Display historical data and technical indicators
+        st.subheader('Dados Históricos')
+        # Only the rows of the current page are formatted and sent to the browser
+        num_pages = history_page_count(len(flattened_data))
+        page = 1
+        if num_pages > 1:
+            page = st.number_input('Página', min_value=1, max_value=num_pages, value=1, step=1, key='historico_pagina')
+        with span('render_table', page=page) as table_span:
+            history = history_page(flattened_data, page)
+            st.dataframe(history, use_container_width=True, hide_index=True)
+            table_span.set(**frame_fields(history))
+        st.caption(f'Página {page} de {num_pages} · {len(flattened_data)} registros')
 else:
     st.info('Nenhum dado selecionado, por favor, selecione os tickers e o período de tempo.', icon=':material/info:')
+
+# Per-rerun waterfall of the timed stages
+if show_timings:
+    with st.sidebar:
+        st.subheader('Desempenho')
+        fig = timeline_figure(timeline)
+        if fig is None:
+            st.caption('Nenhuma etapa registrada nesta atualização.')
+        else:
+            st.plotly_chart(fig, use_container_width=True)
+            st.dataframe(timeline.to_frame().drop(columns='thread'), use_container_width=True, hide_index=True)
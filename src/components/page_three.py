@@ -0,0 +1,44 @@
+import streamlit as st
+from utils.ohlcv_cache import ohlcv_cache
+from utils.result_cache import result_cache
+
+# Debug page: hit ratios and memory usage of the caches shared by all sessions
+
+st.header('Cache')
+
+stats = result_cache.stats()
+st.subheader('Resultados processados')
+col1, col2, col3, col4 = st.columns(4)
+with col1:
+    st.metric(label="Taxa de acerto", value=f"{stats['hit_ratio']:.1%}")
+with col2:
+    st.metric(label="Acertos / Falhas", value=f"{stats['hits']} / {stats['misses']}")
+with col3:
+    st.metric(label="Memória", value=f"{stats['bytes'] / 2**20:.1f} / {stats['max_bytes'] / 2**20:.0f} MB")
+with col4:
+    st.metric(label="Entradas", value=stats['entries'])
+st.caption(f"{stats['coalesced']} falhas agrupadas em uma única busca · {stats['expired']} expiradas · {stats['evicted']} removidas por falta de memória")
+
+entries = result_cache.entries()
+if not entries.empty:
+    entries['MB'] = entries.pop('bytes') / 2**20
+    st.dataframe(entries.iloc[::-1], use_container_width=True, hide_index=True)
+
+disk = ohlcv_cache.stats()
+st.subheader('Cache OHLCV em disco')
+col1, col2, col3 = st.columns(3)
+disk_lookups = disk['hits'] + disk['partial_hits'] + disk['misses']
+with col1:
+    st.metric(label="Taxa de acerto", value=f"{disk['hits'] / disk_lookups:.1%}" if disk_lookups else "-")
+with col2:
+    st.metric(label="Acertos parciais / Falhas", value=f"{disk['partial_hits']} / {disk['misses']}")
+with col3:
+    st.metric(label="Lido / Gravado", value=f"{disk['bytes_read'] / 2**20:.1f} / {disk['bytes_written'] / 2**20:.1f} MB")
+st.caption(f"{disk['coalesced']} leituras aguardaram um download em andamento do mesmo ticker · "
+           f"{disk['closed_gaps']} lacunas sem pregão (fim de semana ou feriado) não foram baixadas · "
+           f"{disk['session_gaps']} pregões sem barras foram baixados novamente")
+
+if st.button('Limpar cache de resultados'):
+    result_cache.clear()
+    result_cache.reset_stats()
+    st.rerun()
@@ -1,53 +1,124 @@
 import streamlit as st
 import os
-import yfinance as yf
 import seaborn as sns
-#from yfinance import EquityQuery
 import pandas as pd
 import plotly.express as px
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, date
 from utils.helpers import get_top_15_tickers, get_all_tickers_with_sectors
+from utils.ohlcv_cache import ohlcv_cache, to_multi_level
+from utils.providers import get_provider
+from utils.dataset import load_price_dataset
+from utils.correlation import correlate
+from utils.downsample import CHART_WIDTH, downsample, render_mode
+from utils.timing import frame_fields, span, start_timeline, submit, timeline_figure
 
-# Fetch stock data based on the ticker, period, and interval
+# Spans of this rerun, shown in the optional performance panel
+timeline = start_timeline('page_two')
+
+# Tickers read from the OHLCV cache at the same time
+MAX_LOAD_WORKERS = 8
+
+# Download daily bars for a single ticker
+def download_daily(ticker, start_date, end_date, interval):
+    return get_provider().history(ticker, start_date, end_date, interval)
+
+# Fetch stock data based on the ticker, start and end dates
 def fetch_data_timeframe(ticker, start_date, end_date):
     try:
-        data = yf.download(ticker, start=start_date, end=end_date)
-        return data
+        tickers = [ticker] if isinstance(ticker, str) else list(ticker)
+        start = pd.Timestamp(start_date, tz='UTC')
+        end = pd.Timestamp(end_date, tz='UTC')
+
+        # Daily bars are read through the local OHLCV cache as views of its memory-mapped store,
+        # a few tickers at a time so whole sectors load interactively. Each batch is copied into
+        # the result before the next one is mapped, so at most MAX_OPEN_MAPPINGS files stay open
+        batch_size = ohlcv_cache.store.max_open
+        parts = []
+        with ThreadPoolExecutor(max_workers=min(len(tickers), MAX_LOAD_WORKERS) or 1) as executor:
+            for first in range(0, len(tickers), batch_size):
+                futures = {t: submit(executor, ohlcv_cache.read, t, '1d', start, end, download_daily)
+                           for t in tickers[first:first + batch_size]}
+                parts.append(to_multi_level({t: future.result() for t, future in futures.items()}, '1d'))
+        parts = [part for part in parts if not part.empty]
+        if len(parts) < 2:
+            return parts[0] if parts else pd.DataFrame()
+        return pd.concat(parts, axis=1).sort_index(axis=1, level=0)
     except Exception as e:
         st.error(f"Error fetching data for {ticker}: {e}")
         return pd.DataFrame()
 
-def show_comparative_graph(selected_tickers, start_date, end_date):
-    if not selected_tickers:
+def show_comparative_graph(dataset):
+    if dataset.empty:
         return None
-    # Fetch historical data for each ticker
-    all_data = {}
-    for ticker in selected_tickers:
-        try:
-            data = fetch_data_timeframe(ticker, start_date, end_date)
-            if not data.empty:
-                data['pct_change'] = data['Close'].pct_change() * 100
-                data['normalized'] = (100 + data['pct_change'].cumsum())
-                all_data[ticker] = data['normalized']
-        except Exception as e:
-            st.error(f"Error fetching data for {ticker}: {e}")
+    # Normalized prices of every ticker, from the shared dataset
+    with span('normalization') as stage:
+        comparison_df = dataset.normalized('Close')
+        stage.set(**frame_fields(comparison_df))
 
     #  graph comparativo
-    if all_data:
-        comparison_df = pd.DataFrame(all_data)
-        fig = px.line(comparison_df, title='Comparação de Preços Normalizados')
-        fig.update_layout(xaxis_title="Data", yaxis_title="Preço Normalizado (%)")
-        st.plotly_chart(fig)
-
-def show_correlation_matrix(data, column_name: str):
-    if not data.empty:
-        try:
-            df_corr = data[[column_name]].corr(method='spearman')
+    if not comparison_df.empty:
+        # Zooming in slices the full resolution data again, only the visible range is downsampled
+        dates = comparison_df.index.tz_convert('America/Sao_Paulo').date
+        first, last = dates[0], dates[-1]
+        if first < last:
+            first, last = st.slider('Zoom', min_value=first, max_value=last, value=(first, last),
+                                    format='DD/MM/YYYY', key='grafico_zoom')
+        visible = comparison_df[(dates >= first) & (dates <= last)]
+
+        with span('downsample', rows=len(visible) * len(visible.columns)) as stage:
+            points = downsample(visible, CHART_WIDTH)
+            stage.set(points=len(points))
+
+        with span('render_chart', points=len(points)):
+            mode = render_mode(len(points))
+            fig = px.line(points, x=points.columns[0], y='Valor', color='Ticker', render_mode=mode,
+                          title='Comparação de Preços Normalizados')
+            fig.update_layout(xaxis_title="Data", yaxis_title="Preço Normalizado (%)")
+            st.plotly_chart(fig)
+        st.caption(f"{len(points)} de {visible.count().sum()} pontos exibidos" + (" · WebGL" if mode == 'webgl' else ""))
+
+def show_correlation(kind, result):
+    # Small selections get the styled matrix; above FULL_MATRIX_LIMIT tickers only
+    # the most and least correlated pairs are built and shown
+    with span('render_table', kind=kind):
+        if kind == 'matrix':
             cm = sns.color_palette("Blues", as_cmap=True)
-            st.dataframe(df_corr.style.background_gradient(cmap=cm), use_container_width=True)
+            st.dataframe(result.style.background_gradient(cmap=cm), use_container_width=True)
+            return
+        pairs = result.rename(columns={'ticker_a': 'Ticker A', 'ticker_b': 'Ticker B', 'correlation': 'Correlação'})
+        col1, col2 = st.columns(2)
+        with col1:
+            st.markdown('**Mais correlacionados**')
+            st.dataframe(pairs[pairs['kind'] == 'most'].drop(columns='kind'), use_container_width=True, hide_index=True)
+        with col2:
+            st.markdown('**Menos correlacionados**')
+            st.dataframe(pairs[pairs['kind'] == 'least'].drop(columns='kind'), use_container_width=True, hide_index=True)
+
+def show_correlation_matrix(dataset, column_name: str):
+    if not dataset.empty:
+        try:
+            with span('correlation', field=column_name) as stage:
+                kind, result = correlate(dataset.field(column_name), method='spearman')
+                stage.set(kind=kind, **frame_fields(result))
+            show_correlation(kind, result)
         except Exception as e:
             st.error(f"Error showing correlation matrix: {e}")
 
+def show_sector_correlation(tickers, start_date, end_date):
+    # Correlation of daily returns over a whole sector, computed blockwise
+    try:
+        dataset = load_price_dataset(tickers, start_date, end_date, fetch_data_timeframe)
+        if dataset.empty:
+            st.info('Nenhum dado encontrado para o setor selecionado.', icon=':material/info:')
+            return
+        with span('sector_correlation', tickers=len(tickers)) as stage:
+            kind, result = correlate(dataset.returns('Close'), method='spearman')
+            stage.set(kind=kind, **frame_fields(result))
+        show_correlation(kind, result)
+    except Exception as e:
+        st.error(f"Error showing sector correlation: {e}")
+
 # Sidebar for user input parameters
 with st.sidebar:
     # Mapping of time periods to data intervals
@@ -86,11 +157,18 @@ with st.sidebar:
     tickers_list = get_all_tickers_with_sectors(selected_sector_key)
 
     
-    selected_tickers = st.multiselect("Selecionar os Tickers", tickers_list, key="grafico_tickers", max_selections=4)
+    # A whole sector can be compared at once, the chart is downsampled to the screen width
+    if st.checkbox('Comparar todo o setor', value=False, key='grafico_setor'):
+        selected_tickers = list(tickers_list)
+        st.caption(f'{len(selected_tickers)} tickers selecionados')
+    else:
+        selected_tickers = st.multiselect("Selecionar os Tickers", tickers_list, key="grafico_tickers")
 
     start_date = st.date_input("Data Inicial", date(2023, 1, 1))
     end_date = st.date_input("Data Final", date.today())
 
+    show_timings = st.toggle('Painel de desempenho', value=False, help='Mostra o tempo de cada etapa desta atualização da página.')
+
     # Sidebar information section
     st.subheader('Sobre')
     st.warning('As relações apresentadas não são recomendações de compra ou venda, mas sim uma ferramenta de visualização de dados.', icon=':material/warning:')
@@ -99,10 +177,11 @@ with st.sidebar:
 if len(selected_tickers) > 0:
     st.spinner('Carregando dados...')
     try:
-        data = fetch_data_timeframe(selected_tickers, start_date, end_date)
-        if not data.empty:
+        # Fetched once, shared by the chart and the correlation matrix
+        dataset = load_price_dataset(selected_tickers, start_date, end_date, fetch_data_timeframe)
+        if not dataset.empty:
             st.header(f'Comparação de Preços Normalizados - {selected_sector}', )
-            show_comparative_graph(selected_tickers, start_date, end_date)
+            show_comparative_graph(dataset)
 
             option_map = {
                 "Fechamento": "Close",
@@ -119,10 +198,25 @@ if len(selected_tickers) > 0:
                 default="Fechamento",
                 label_visibility="hidden"
             )
-            show_correlation_matrix(data, option_map[selection])
+            show_correlation_matrix(dataset, option_map[selection])
     except Exception as e:
         st.error(f"Error fetching data: {e}")
     
 else:
     st.info('Nenhum dado selecionado, por favor, selecione os tickers e o período de tempo.', icon=':material/info:')
 
+# Sector wide correlation, opt-in since it loads every ticker of the sector
+st.subheader(f'Correlação de Retornos - {selected_sector}')
+if st.toggle('Calcular para todos os tickers do setor', value=False):
+    show_sector_correlation(tickers_list, start_date, end_date)
+
+# Per-rerun waterfall of the timed stages
+if show_timings:
+    with st.sidebar:
+        st.subheader('Desempenho')
+        fig = timeline_figure(timeline)
+        if fig is None:
+            st.caption('Nenhuma etapa registrada nesta atualização.')
+        else:
+            st.plotly_chart(fig, use_container_width=True)
+            st.dataframe(timeline.to_frame().drop(columns='thread'), use_container_width=True, hide_index=True)
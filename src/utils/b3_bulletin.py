@@ -0,0 +1,280 @@
+import argparse
+import logging
+import os
+import shutil
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+BULLETIN_DIR = os.path.join(CURRENT_DIR, '../../local_storage/b3_bulletins')
+
+# Types of the known fields of B3's daily trading bulletin (negotiated instruments file).
+# Other fields are kept as strings.
+BULLETIN_SCHEMA = {
+    'RptDt': pa.date32(),
+    'TckrSymb': pa.string(),
+    'ISIN': pa.string(),
+    'SgmtNm': pa.string(),
+    'MinPric': pa.float64(),
+    'MaxPric': pa.float64(),
+    'TradAvrgPric': pa.float64(),
+    'LastPric': pa.float64(),
+    'OscnPctg': pa.float64(),
+    'AdjstdQt': pa.float64(),
+    'AdjstdQtTax': pa.float64(),
+    'RefPric': pa.float64(),
+    'TradQty': pa.int64(),
+    'FinInstrmQty': pa.int64(),
+    'NtlFinVol': pa.float64(),
+}
+
+DELIMITER = ';'
+
+# Bytes of the file parsed at a time, which bounds the memory of an ingest
+BLOCK_SIZE = 16 * 2**20
+
+PART_FILE = 'part-{}.parquet'
+
+
+def _read_header(file, encoding):
+    """
+    Skip the lines up to and including the header, returning the field names.
+    B3 files may start with a status line such as 'Status do Arquivo: Final'.
+    """
+    for _ in range(10):
+        line = file.readline().decode(encoding)
+        names = [name.strip().lstrip('\ufeff') for name in line.rstrip('\r\n').split(DELIMITER)]
+        if BULLETIN_SCHEMA.keys() & set(names):
+            return names
+    raise ValueError(f'No bulletin header found in {file.name}')
+
+
+def _blocks(file, block_size):
+    """
+    Read a file in blocks of about `block_size` bytes, each ending at a line break.
+    """
+    rest = b''
+    while True:
+        data = file.read(block_size)
+        if not data:
+            if rest:
+                yield pa.py_buffer(rest)
+            return
+        data = rest + data
+        end = data.rfind(b'\n') + 1
+        rest = data[end:]
+        if end:
+            yield pa.py_buffer(memoryview(data)[:end])
+
+
+def _to_number(values, dtype):
+    """
+    Parse a string column with comma or point decimals ('121,87', '189662.0').
+    """
+    parsed = pc.cast(pc.replace_substring(values, ',', '.'), pa.float64())
+    # Integer fields are checked to be whole numbers, the cast fails otherwise
+    return parsed if dtype == pa.float64() else pc.cast(parsed, dtype)
+
+
+def _typed(table):
+    """
+    Apply BULLETIN_SCHEMA to a block read with its numeric fields as strings.
+    """
+    columns = []
+    for name, values in zip(table.column_names, table.columns):
+        dtype = BULLETIN_SCHEMA.get(name, pa.string())
+        if pa.types.is_integer(dtype) or pa.types.is_floating(dtype):
+            values = _to_number(values, dtype)
+        columns.append(values)
+    return pa.table(columns, names=table.column_names)
+
+
+def iter_bulletin(path, columns=None, block_size=BLOCK_SIZE, encoding='utf8'):
+    """
+    Stream a B3 bulletin file as typed Arrow tables of about `block_size` bytes of CSV.
+
+    Args:
+        path (str): ';' separated bulletin file
+        columns (list): Fields to read, all of them by default
+        block_size (int): Bytes of CSV parsed per table
+        encoding (str): Encoding of the file
+
+    Yields:
+        pyarrow.Table: Rows of the next block, typed by BULLETIN_SCHEMA
+    """
+    with open(path, 'rb') as file:
+        names = _read_header(file, encoding)
+        # Numbers are read as text and parsed here, the file mixes comma and point decimals.
+        # Every field gets a type, so no block is left to type inference.
+        column_types = {name: pa.date32() if BULLETIN_SCHEMA.get(name) == pa.date32() else pa.string()
+                        for name in names}
+        read_options = pv.ReadOptions(column_names=names, encoding=encoding)
+        parse_options = pv.ParseOptions(delimiter=DELIMITER)
+        convert_options = pv.ConvertOptions(column_types=column_types, include_columns=columns,
+                                            strings_can_be_null=True, include_missing_columns=bool(columns))
+        # Blocks are read here one at a time: given the whole file, pyarrow's reader
+        # reads ahead of the parsing and can hold most of the file in memory
+        for block in _blocks(file, block_size):
+            table = pv.read_csv(pa.BufferReader(block), read_options=read_options,
+                                parse_options=parse_options, convert_options=convert_options)
+            if table.num_rows:
+                yield _typed(table)
+
+
+def read_bulletin(path, columns=None):
+    """
+    Read a whole (small) bulletin file into a typed DataFrame, in file order.
+
+    Args:
+        path (str): ';' separated bulletin file
+        columns (list): Fields to read, all of them by default
+
+    Returns:
+        DataFrame: Typed bulletin rows; 'RptDt' as datetime64, quantities as Int64
+    """
+    tables = list(iter_bulletin(path, columns))
+    if not tables:
+        return pd.DataFrame(columns=columns)
+    return _to_pandas(pa.concat_tables(tables))
+
+
+def _to_pandas(table):
+    # Nullable integers, so a missing quantity doesn't turn the column into floats
+    return table.to_pandas(date_as_object=False, types_mapper={pa.int64(): pd.Int64Dtype()}.get)
+
+
+class BulletinStore:
+    """
+    Typed Parquet store of B3 bulletins, one partition per report date
+    (RptDt=YYYY-MM-DD/part-N.parquet, readable as a hive dataset).
+
+    Files are ingested block by block, and only the dates of the current block
+    have an open writer, so memory stays bounded by the block size instead of
+    growing with the size of the files.
+    """
+
+    def __init__(self, store_dir=BULLETIN_DIR):
+        self.store_dir = store_dir
+
+    def _partition_dir(self, date):
+        return os.path.join(self.store_dir, f'RptDt={date}')
+
+    def dates(self):
+        """
+        Report dates in the store, sorted.
+        """
+        if not os.path.isdir(self.store_dir):
+            return []
+        return sorted(name.split('=', 1)[1] for name in os.listdir(self.store_dir)
+                      if name.startswith('RptDt=') and not name.endswith('.tmp'))
+
+    def ingest(self, paths, block_size=BLOCK_SIZE, encoding='utf8'):
+        """
+        Stream bulletin files into the store. Every report date found replaces
+        its partition once the whole ingest is written.
+
+        Args:
+            paths (list): Bulletin files, one or many days each
+            block_size (int): Bytes of CSV parsed at a time
+            encoding (str): Encoding of the files
+
+        Returns:
+            dict: Rows, report dates and blocks ingested
+        """
+        os.makedirs(self.store_dir, exist_ok=True)
+        # Writers of the dates in the current block, and part files written per date
+        writers = {}
+        parts = {}
+        stats = {'rows': 0, 'dates': 0, 'blocks': 0}
+        try:
+            for path in paths:
+                for table in iter_bulletin(path, block_size=block_size, encoding=encoding):
+                    stats['blocks'] += 1
+                    stats['rows'] += table.num_rows
+                    report_dates = table.column('RptDt')
+                    # Rows without a report date have no partition and are dropped
+                    block_dates = list(filter(None, pc.unique(report_dates).to_pylist()))
+                    for date in block_dates:
+                        rows = table.filter(pc.equal(report_dates, pa.scalar(date, pa.date32())))
+                        # The partition column lives in the directory name
+                        rows = rows.drop_columns(['RptDt'])
+                        if date not in writers:
+                            writers[date] = self._open_part(date, parts, rows.schema)
+                        writers[date].write_table(rows.cast(writers[date].schema))
+
+                    # An open writer holds a few MB of encoder state: files are sorted
+                    # by date, so a date missing from the block is usually complete
+                    for date in [date for date in writers if date not in block_dates]:
+                        writers.pop(date).close()
+        except Exception:
+            for writer in writers.values():
+                writer.close()
+            for date in parts:
+                shutil.rmtree(self._partition_dir(date) + '.tmp', ignore_errors=True)
+            raise
+
+        for writer in writers.values():
+            writer.close()
+        for date in parts:
+            partition_dir = self._partition_dir(date)
+            shutil.rmtree(partition_dir, ignore_errors=True)
+            os.replace(partition_dir + '.tmp', partition_dir)
+        stats['dates'] = len(parts)
+        logging.info(f"Ingested {stats['rows']} bulletin rows over {stats['dates']} dates")
+        return stats
+
+    def _open_part(self, date, parts, schema):
+        """
+        Writer of the next part file of a date, in the date's temporary partition.
+        """
+        tmp_dir = self._partition_dir(date) + '.tmp'
+        if date not in parts:
+            # The first rows of a date in this ingest replace whatever a previous one left
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            os.makedirs(tmp_dir)
+            parts[date] = 0
+        path = os.path.join(tmp_dir, PART_FILE.format(parts[date]))
+        parts[date] += 1
+        return pq.ParquetWriter(path, schema)
+
+    def read(self, start=None, end=None, columns=None, tickers=None):
+        """
+        Read the stored bulletins of a date range, only opening the partitions in range.
+
+        Args:
+            start: First report date, inclusive
+            end: Last report date, inclusive
+            columns (list): Fields to read besides 'RptDt', all of them by default
+            tickers (list): Only rows of these TckrSymb values
+
+        Returns:
+            DataFrame: Typed bulletin rows sorted by report date, with an 'RptDt' column
+        """
+        start = pd.Timestamp(start).date().isoformat() if start is not None else None
+        end = pd.Timestamp(end).date().isoformat() if end is not None else None
+        filters = [('TckrSymb', 'in', list(tickers))] if tickers is not None else None
+
+        tables = []
+        for date in self.dates():
+            if (start is not None and date < start) or (end is not None and date > end):
+                continue
+            table = pq.read_table(self._partition_dir(date), columns=columns, filters=filters)
+            date_column = pa.array([pd.Timestamp(date).date()] * table.num_rows, pa.date32())
+            tables.append(table.add_column(0, 'RptDt', date_column))
+        if not tables:
+            return pd.DataFrame(columns=['RptDt'] + [name for name in columns or BULLETIN_SCHEMA if name != 'RptDt'])
+        return _to_pandas(pa.concat_tables(tables, promote_options='default'))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest B3 daily trading bulletins into the typed Parquet store.")
+    parser.add_argument('paths', nargs='+', help="';' separated bulletin files")
+    parser.add_argument('--store-dir', default=BULLETIN_DIR)
+    parser.add_argument('--encoding', default='utf8')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    print(BulletinStore(args.store_dir).ingest(args.paths, encoding=args.encoding))
@@ -0,0 +1,212 @@
+from datetime import date, time, timedelta
+
+import numpy as np
+import pandas as pd
+
+MARKET_TZ = 'America/Sao_Paulo'
+MARKET_OPEN = time(10, 0)
+# Ash Wednesday sessions only start after the Carnival holidays, at 13:00
+HALF_DAY_OPEN = time(13, 0)
+# B3 closing call ends shortly after 17:00; after 18:00 the day's bars are final
+MARKET_CLOSE = time(18, 0)
+
+# Years covered by the precomputed calendar
+FIRST_YEAR = 2000
+LAST_YEAR = 2035
+
+
+def easter(year):
+    """
+    Easter Sunday of a year (anonymous Gregorian algorithm).
+    """
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def b3_holidays(year):
+    """
+    Days of a year without a B3 session: national holidays, Carnival, Good
+    Friday, Corpus Christi, and the exchange's own closures on December 24 and 31.
+
+    Args:
+        year (int): Calendar year
+
+    Returns:
+        set: Holiday dates, including the ones that fall on weekends
+    """
+    easter_sunday = easter(year)
+    holidays = {
+        date(year, 1, 1),    # Confraternização Universal
+        date(year, 4, 21),   # Tiradentes
+        date(year, 5, 1),    # Dia do Trabalho
+        date(year, 9, 7),    # Independência
+        date(year, 10, 12),  # Nossa Senhora Aparecida
+        date(year, 11, 2),   # Finados
+        date(year, 11, 15),  # Proclamação da República
+        date(year, 12, 24),  # Véspera de Natal, no session
+        date(year, 12, 25),  # Natal
+        date(year, 12, 31),  # Último dia do ano, no session
+        easter_sunday - timedelta(days=48),  # Carnaval (Monday)
+        easter_sunday - timedelta(days=47),  # Carnaval (Tuesday)
+        easter_sunday - timedelta(days=2),   # Sexta-feira Santa
+        easter_sunday + timedelta(days=60),  # Corpus Christi
+    }
+    # São Paulo city and state holidays closed the exchange until 2021
+    if year <= 2021:
+        holidays |= {date(year, 1, 25), date(year, 7, 9), date(year, 11, 20)}
+    # Consciência Negra is a national holiday since 2024
+    if year >= 2024:
+        holidays.add(date(year, 11, 20))
+    return holidays
+
+
+def _to_days(values):
+    """
+    Convert dates, strings or Timestamps (tz-aware ones in market time) to datetime64[D].
+    """
+    if isinstance(values, (pd.DatetimeIndex, pd.Series)) or np.ndim(values) > 0:
+        index = pd.DatetimeIndex(values)
+        if index.tz is not None:
+            index = index.tz_convert(MARKET_TZ).tz_localize(None)
+        return index.values.astype('datetime64[D]')
+    value = pd.Timestamp(values)
+    if value.tz is not None:
+        value = value.tz_convert(MARKET_TZ).tz_localize(None)
+    return np.datetime64(value.date(), 'D')
+
+
+class TradingCalendar:
+    """
+    Precomputed B3 session calendar.
+
+    Sessions are kept as a sorted datetime64[D] array, so lookups, counts and
+    offsets are binary searches instead of loops over calendar days.
+    """
+
+    def __init__(self, first_year=FIRST_YEAR, last_year=LAST_YEAR):
+        days = np.arange(np.datetime64(f'{first_year}-01-01'), np.datetime64(f'{last_year + 1}-01-01'), dtype='datetime64[D]')
+        # 1970-01-01 was a Thursday, so (days + 3) % 7 numbers Monday as 0
+        weekdays = (days.astype(np.int64) + 3) % 7 < 5
+
+        holidays = sorted(set().union(*(b3_holidays(year) for year in range(first_year, last_year + 1))))
+        self.holidays = np.array(holidays, dtype='datetime64[D]')
+        self.sessions = days[weekdays & ~np.isin(days, self.holidays)]
+        self.half_days = np.array([easter(year) - timedelta(days=46) for year in range(first_year, last_year + 1)],
+                                  dtype='datetime64[D]')
+
+    def is_session(self, day):
+        """
+        Check whether a day (or each day of an array) has a B3 session.
+        """
+        days = _to_days(day)
+        positions = np.searchsorted(self.sessions, days).clip(max=len(self.sessions) - 1)
+        return self.sessions[positions] == days
+
+    def sessions_between(self, start, end):
+        """
+        Sessions from `start` to `end`, both inclusive.
+
+        Returns:
+            ndarray: datetime64[D] session dates
+        """
+        left = np.searchsorted(self.sessions, _to_days(start), side='left')
+        right = np.searchsorted(self.sessions, _to_days(end), side='right')
+        return self.sessions[left:right]
+
+    def session_count(self, start, end):
+        """
+        Number of sessions from `start` to `end`, both inclusive.
+        """
+        left = np.searchsorted(self.sessions, _to_days(start), side='left')
+        right = np.searchsorted(self.sessions, _to_days(end), side='right')
+        return int(max(right - left, 0))
+
+    def previous_session(self, day, offset=0):
+        """
+        The last session on or before `day`, moved back `offset` more sessions.
+        """
+        position = np.searchsorted(self.sessions, _to_days(day), side='right') - 1 - offset
+        return self.sessions[max(position, 0)]
+
+    def next_session(self, day):
+        """
+        The first session on or after `day`.
+        """
+        position = np.searchsorted(self.sessions, _to_days(day), side='left')
+        return self.sessions[min(position, len(self.sessions) - 1)]
+
+    def session_open(self, day):
+        """
+        Opening time of a session, in market time. Ash Wednesday opens late.
+        """
+        day = _to_days(day)
+        opens = HALF_DAY_OPEN if np.isin(day, self.half_days) else MARKET_OPEN
+        return pd.Timestamp(day).tz_localize(MARKET_TZ) + pd.Timedelta(hours=opens.hour, minutes=opens.minute)
+
+    def session_close(self, day):
+        """
+        Time after which a session's bars are final, in market time.
+        """
+        return pd.Timestamp(_to_days(day)).tz_localize(MARKET_TZ) + pd.Timedelta(hours=MARKET_CLOSE.hour, minutes=MARKET_CLOSE.minute)
+
+    def is_open(self, now):
+        """
+        Check whether a session is running at `now`.
+        """
+        now = now.tz_convert(MARKET_TZ)
+        return bool(self.is_session(now)) and self.session_open(now) <= now < self.session_close(now)
+
+    def last_close(self, now):
+        """
+        The most recent session close at or before `now`.
+        """
+        now = now.tz_convert(MARKET_TZ)
+        day = self.previous_session(now)
+        close = self.session_close(day)
+        if close > now:
+            close = self.session_close(self.previous_session(day - np.timedelta64(1, 'D')))
+        return close
+
+    def recent_sessions(self, now, count):
+        """
+        The last `count` sessions that have opened by `now`, oldest first.
+        """
+        now = now.tz_convert(MARKET_TZ)
+        day = self.previous_session(now)
+        if self.session_open(day) > now:
+            day = self.previous_session(day - np.timedelta64(1, 'D'))
+        end = np.searchsorted(self.sessions, day, side='right')
+        return self.sessions[max(end - count, 0):end]
+
+    def missing_sessions(self, timestamps, start, end):
+        """
+        Sessions between `start` and `end` (inclusive) without any bar, i.e.
+        real gaps in the data rather than days the market was closed.
+
+        Args:
+            timestamps (DatetimeIndex): Bar timestamps
+            start: First day to check
+            end: Last day to check
+
+        Returns:
+            ndarray: datetime64[D] dates of the sessions without bars
+        """
+        expected = self.sessions_between(start, end)
+        if len(timestamps) == 0:
+            return expected
+        bar_days = np.unique(_to_days(timestamps))
+        positions = np.searchsorted(bar_days, expected).clip(max=len(bar_days) - 1)
+        return expected[bar_days[positions] != expected]
+
+
+# Process-wide calendar, built once at import
+b3_calendar = TradingCalendar()
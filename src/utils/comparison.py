@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+
+from utils.b3_calendar import MARKET_TZ, b3_calendar
+
+
+def align_to_sessions(prices):
+    """
+    Put a wide (date x ticker) daily price frame on the shared B3 session index
+    of its date range, so every ticker has one row per session and missing
+    bars show up as NaN instead of shifting the series against each other.
+
+    Args:
+        prices (DataFrame): Daily prices indexed by tz-aware timestamps
+
+    Returns:
+        DataFrame: Prices indexed by the session dates (midnight, market time)
+    """
+    if prices.empty:
+        return prices
+    # Session dates in market time, without tz arithmetic: until 2019 DST started at midnight
+    days = prices.index.tz_convert(MARKET_TZ).tz_localize(None).normalize()
+    if days.has_duplicates:
+        # Intraday data can't be put on a daily index
+        return prices
+
+    sessions = pd.DatetimeIndex(b3_calendar.sessions_between(days[0], days[-1]))
+    # Bars on days the calendar has no session for are kept, so no data is dropped
+    index = sessions.union(days).as_unit(days.unit)
+    aligned = prices.set_axis(days, axis=0).reindex(index)
+    aligned.index = index.tz_localize(MARKET_TZ, nonexistent='shift_forward')
+    aligned.index.name = prices.index.name
+    return aligned
+
+
+def compounded_performance(prices, base=100):
+    """
+    Compounded performance of every ticker, starting at `base` on its first price.
+
+    Returns are taken against each ticker's previous valid price and chained
+    with a single cumulative product over the whole (session x ticker) matrix,
+    so the result equals base * price / first price instead of the sum of
+    percentage changes. Sessions without a price stay NaN.
+
+    Args:
+        prices (DataFrame): Wide (date x ticker) prices
+        base (float): Value of every series at its first price
+
+    Returns:
+        DataFrame: Normalized performance, same shape as `prices`
+    """
+    values = prices.to_numpy(dtype=np.float64)
+    if values.size == 0:
+        return prices.astype(np.float64)
+    missing = np.isnan(values)
+
+    # Previous valid price of every cell, forward filled down each column
+    rows = np.where(missing, 0, np.arange(len(values))[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    filled = values[rows, np.arange(values.shape[1])]
+    del rows
+
+    # Growth of each session against the previous valid price, chained in place
+    performance = np.empty_like(values)
+    performance[0] = 1.0
+    np.divide(values[1:], filled[:-1], out=performance[1:])
+    del filled
+    performance[np.isnan(performance)] = 1.0
+    np.cumprod(performance, axis=0, out=performance)
+    performance *= base
+    performance[missing] = np.nan
+    return pd.DataFrame(performance, index=prices.index, columns=prices.columns)
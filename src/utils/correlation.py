@@ -0,0 +1,269 @@
+import numpy as np
+import pandas as pd
+
+# Columns per block; a block pair holds two (rows x BLOCK_SIZE) inputs and a BLOCK_SIZE^2 result
+BLOCK_SIZE = 256
+
+# Selections up to this many tickers get the full matrix, larger ones get top-k pairs
+FULL_MATRIX_LIMIT = 50
+
+# Minimum overlapping observations for a pair to get a correlation
+MIN_PERIODS = 20
+
+# Rows x pairs re-ranked at a time by the Spearman correction of pairs missing different rows
+PAIR_CHUNK_ELEMENTS = 2**18
+
+
+def _prepare(frame, method):
+    """
+    Turn a wide frame into the zero-filled values and validity mask used by the
+    block kernel. Spearman is Pearson on ranks, so columns are ranked once here
+    and the ranks are reused by every block; they are exact for pairs with the
+    same missing rows, other pairs are re-ranked by `_spearman_pairs`.
+    """
+    if method == 'spearman':
+        frame = frame.rank(axis=0)
+    elif method != 'pearson':
+        raise ValueError(f"Unsupported correlation method: {method}")
+
+    values = frame.to_numpy(dtype=float)
+    mask = ~np.isnan(values)
+
+    # Centering doesn't change the correlation but keeps the sums well conditioned
+    with np.errstate(invalid='ignore'):
+        means = np.nanmean(np.where(mask, values, np.nan), axis=0)
+    values = np.where(mask, values - np.nan_to_num(means), 0.0)
+    return values, mask.astype(float)
+
+
+def _block_correlation(x_i, m_i, x_j, m_j, min_periods):
+    """
+    Pairwise-complete Pearson correlation between two column blocks.
+
+    Sums are restricted to the rows where both columns are valid by multiplying
+    with the other block's mask, so every pair only sees its common observations.
+    """
+    n = m_i.T @ m_j
+    sum_x = x_i.T @ m_j
+    sum_y = m_i.T @ x_j
+    sum_xy = x_i.T @ x_j
+    sum_xx = (x_i * x_i).T @ m_j
+    sum_yy = m_i.T @ (x_j * x_j)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = sum_xy - sum_x * sum_y / n
+        var_x = sum_xx - sum_x * sum_x / n
+        var_y = sum_yy - sum_y * sum_y / n
+        corr = cov / np.sqrt(var_x * var_y)
+
+    corr[(n < min_periods) | (var_x <= 0) | (var_y <= 0)] = np.nan
+    return np.clip(corr, -1.0, 1.0)
+
+
+def _sorted_runs(values):
+    """
+    Sort order of every column of `values` (rows x columns), with the first
+    and one-past-last sorted position of the run of equal values each sorted
+    row belongs to. Returned as (columns x rows) arrays, one column per row.
+    """
+    values = np.ascontiguousarray(values.T)
+    order = np.argsort(values, axis=1, kind='stable').astype(np.int32)
+    sorted_values = np.take_along_axis(values, order, axis=1)
+
+    positions = np.arange(values.shape[1], dtype=np.int32)
+    new_run = np.ones(values.shape, bool)
+    new_run[:, 1:] = sorted_values[:, 1:] != sorted_values[:, :-1]
+    run_start = np.maximum.accumulate(np.where(new_run, positions, 0), axis=1)
+    run_end = np.empty(values.shape, np.int32)
+    run_end[:, :-1] = np.where(new_run[:, 1:], positions[1:], values.shape[1])
+    run_end[:, -1] = values.shape[1]
+    run_end = np.minimum.accumulate(run_end[:, ::-1], axis=1)[:, ::-1]
+    return order, run_start, run_end
+
+
+def _masked_ranks(runs, columns, masks):
+    """
+    Average ranks (ties share their mean rank, like pandas) of `columns`, each
+    counting only the rows of its row of `masks` (columns x rows). Columns may
+    repeat with different masks. Ranks over a subset are running counts of the
+    subset's rows in sorted order, so no sort is needed per mask.
+    """
+    order, run_start, run_end = (array[columns] for array in runs)
+    sorted_mask = np.take_along_axis(masks, order, axis=1)
+    counts = np.zeros((len(columns), masks.shape[1] + 1))
+    np.cumsum(sorted_mask, axis=1, out=counts[:, 1:])
+
+    # Rows of a run share the mean of the first and last rank the subset gives the run
+    first = np.take_along_axis(counts, run_start, axis=1) + 1
+    last = np.take_along_axis(counts, run_end, axis=1)
+    ranks = np.empty(masks.shape)
+    np.put_along_axis(ranks, order, (first + last) / 2, axis=1)
+    return ranks
+
+
+def _spearman_pairs(frame, pairs_a, pairs_b, min_periods):
+    """
+    Spearman correlation of the given column pairs, each re-ranked on the rows
+    both columns have, as pandas does.
+
+    Ranking every column once over its whole history is only exact when the two
+    columns miss the same rows. With staggered spans (a ticker listed in the
+    middle of the range, or a delisted one) the ranks of the longer series no
+    longer match its ranks over the common rows.
+    """
+    # Only the columns of the pairs are sorted
+    columns, positions = np.unique(np.concatenate([pairs_a, pairs_b]), return_inverse=True)
+    pairs_a, pairs_b = positions[:len(pairs_a)], positions[len(pairs_a):]
+    values = frame.iloc[:, columns].to_numpy(dtype=float)
+    valid = np.ascontiguousarray(~np.isnan(values).T)
+    runs = _sorted_runs(values)
+
+    result = np.empty(len(pairs_a))
+    step = max(1, PAIR_CHUNK_ELEMENTS // max(len(values), 1))
+    for start in range(0, len(pairs_a), step):
+        a, b = pairs_a[start:start + step], pairs_b[start:start + step]
+        common = valid[a] & valid[b]
+        x = _masked_ranks(runs, a, common)
+        y = _masked_ranks(runs, b, common)
+
+        n = common.sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x = np.where(common, x - (x * common).sum(axis=1, keepdims=True) / n[:, None], 0.0)
+            y = np.where(common, y - (y * common).sum(axis=1, keepdims=True) / n[:, None], 0.0)
+            var_x, var_y = (x * x).sum(axis=1), (y * y).sum(axis=1)
+            corr = (x * y).sum(axis=1) / np.sqrt(var_x * var_y)
+        corr[(n < min_periods) | (var_x <= 0) | (var_y <= 0)] = np.nan
+        result[start:start + step] = np.clip(corr, -1.0, 1.0)
+    return result
+
+
+def correlation_matrix(frame, method='pearson', block_size=BLOCK_SIZE, min_periods=1):
+    """
+    Full correlation matrix of the columns of a wide frame, computed blockwise.
+
+    Args:
+        frame (DataFrame): Wide (date x ticker) observations, e.g. returns
+        method (str): 'pearson' or 'spearman'
+        block_size (int): Number of columns per block
+        min_periods (int): Minimum overlapping observations per pair
+
+    Returns:
+        DataFrame: (ticker x ticker) correlation matrix
+    """
+    values, mask = _prepare(frame, method)
+    num_columns = values.shape[1]
+    result = np.empty((num_columns, num_columns))
+    counts = mask.sum(axis=0)
+    differing_a, differing_b = [], []
+
+    for i in range(0, num_columns, block_size):
+        block_i = slice(i, i + block_size)
+        for j in range(i, num_columns, block_size):
+            block_j = slice(j, j + block_size)
+            corr = _block_correlation(values[:, block_i], mask[:, block_i], values[:, block_j], mask[:, block_j], min_periods)
+            result[block_i, block_j] = corr
+            result[block_j, block_i] = corr.T
+
+            if method == 'spearman':
+                # Pairs with fewer common rows than one of their columns has miss different rows
+                n = mask[:, block_i].T @ mask[:, block_j]
+                rows, cols = np.nonzero((n < counts[block_i, None]) | (n < counts[None, block_j]))
+                upper = rows + i < cols + j
+                differing_a.append(rows[upper] + i)
+                differing_b.append(cols[upper] + j)
+
+    if method == 'spearman' and differing_a:
+        # Their global ranks are not their ranks on the common rows, re-rank them
+        pairs_a, pairs_b = np.concatenate(differing_a), np.concatenate(differing_b)
+        corr = _spearman_pairs(frame, pairs_a, pairs_b, min_periods)
+        result[pairs_a, pairs_b] = corr
+        result[pairs_b, pairs_a] = corr
+
+    return pd.DataFrame(result, index=frame.columns, columns=frame.columns)
+
+
+def top_correlated_pairs(frame, k=20, method='pearson', block_size=BLOCK_SIZE, min_periods=MIN_PERIODS):
+    """
+    The k most and k least correlated pairs of columns, without building the
+    full matrix. Each block keeps only its own best candidates. With Spearman,
+    candidates are re-ranked on their common rows before the final selection,
+    so reported correlations match pandas; within the blocks they are picked on
+    the ranks over each column's whole history.
+
+    Args:
+        frame (DataFrame): Wide (date x ticker) observations, e.g. returns
+        k (int): Number of pairs on each side
+        method (str): 'pearson' or 'spearman'
+        block_size (int): Number of columns per block
+        min_periods (int): Minimum overlapping observations per pair
+
+    Returns:
+        DataFrame: Columns 'ticker_a', 'ticker_b', 'correlation' and 'kind'
+        ('most' or 'least'), sorted by correlation within each kind
+    """
+    values, mask = _prepare(frame, method)
+    num_columns = values.shape[1]
+
+    candidates_a, candidates_b, candidates_corr = [], [], []
+    for i in range(0, num_columns, block_size):
+        block_i = slice(i, i + block_size)
+        for j in range(i, num_columns, block_size):
+            block_j = slice(j, j + block_size)
+            corr = _block_correlation(values[:, block_i], mask[:, block_i], values[:, block_j], mask[:, block_j], min_periods)
+
+            # Each pair once: strict upper triangle on diagonal blocks
+            rows, cols = np.nonzero(~np.isnan(corr))
+            if i == j:
+                upper = rows < cols
+                rows, cols = rows[upper], cols[upper]
+            block_corr = corr[rows, cols]
+
+            if len(block_corr) > 2 * k:
+                order = np.argsort(block_corr)
+                keep = np.concatenate([order[:k], order[-k:]])
+                rows, cols, block_corr = rows[keep], cols[keep], block_corr[keep]
+
+            candidates_a.append(rows + i)
+            candidates_b.append(cols + j)
+            candidates_corr.append(block_corr)
+
+    if not candidates_corr:
+        return pd.DataFrame(columns=['ticker_a', 'ticker_b', 'correlation', 'kind'])
+
+    pair_a = np.concatenate(candidates_a)
+    pair_b = np.concatenate(candidates_b)
+    pair_corr = np.concatenate(candidates_corr)
+    if method == 'spearman':
+        # Candidates are few, all of them are re-ranked on their common rows.
+        # The block inputs are released first, the re-ranking sorts its own copy.
+        del values, mask
+        pair_corr = _spearman_pairs(frame, pair_a, pair_b, min_periods)
+        valid = ~np.isnan(pair_corr)
+        pair_a, pair_b, pair_corr = pair_a[valid], pair_b[valid], pair_corr[valid]
+    order = np.argsort(pair_corr)
+    least = order[:k]
+    most = order[::-1][:k]
+
+    labels = np.asarray(frame.columns)
+    parts = []
+    for kind, selected in (('most', most), ('least', least)):
+        parts.append(pd.DataFrame({
+            'ticker_a': labels[pair_a[selected]],
+            'ticker_b': labels[pair_b[selected]],
+            'correlation': pair_corr[selected],
+            'kind': kind,
+        }))
+    return pd.concat(parts, ignore_index=True)
+
+
+def correlate(frame, method='spearman', k=20, full_matrix_limit=FULL_MATRIX_LIMIT):
+    """
+    Correlate a selection: the full matrix for small selections, top-k pairs
+    for large ones.
+
+    Returns:
+        tuple: ('matrix', DataFrame) or ('pairs', DataFrame)
+    """
+    if frame.shape[1] <= full_matrix_limit:
+        return 'matrix', correlation_matrix(frame, method=method)
+    return 'pairs', top_correlated_pairs(frame, k=k, method=method)
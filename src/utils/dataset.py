@@ -0,0 +1,73 @@
+import pandas as pd
+
+from utils.comparison import align_to_sessions, compounded_performance
+from utils.price_data import to_returns
+from utils.result_cache import result_cache, result_key
+from utils.timing import frame_fields, span
+
+
+class PriceDataset:
+    """
+    Aligned multi-ticker price data shared by every widget of a page.
+
+    Wraps a (Price, Ticker) frame as returned by fetch_data_timeframe; widgets
+    read wide (date x ticker) views from it instead of downloading again.
+    """
+
+    def __init__(self, data, tickers, start_date, end_date):
+        self.data = data
+        self.tickers = tickers
+        self.start_date = start_date
+        self.end_date = end_date
+
+    @property
+    def empty(self):
+        return self.data.empty
+
+    def field(self, name):
+        """
+        Return one price field as a (date x ticker) frame, in the selected ticker order.
+        """
+        if self.data.empty or name not in self.data.columns.get_level_values(0):
+            return pd.DataFrame()
+        wide = self.data[name]
+        return wide[[ticker for ticker in self.tickers if ticker in wide.columns]]
+
+    def returns(self, name='Close'):
+        """
+        Simple returns of every ticker, as a (date x ticker) frame.
+        """
+        return to_returns(self.field(name))
+
+    def normalized(self, name='Close'):
+        """
+        Compounded performance of every ticker on the shared session index, starting at 100.
+        """
+        return compounded_performance(align_to_sessions(self.field(name)))
+
+
+def load_price_dataset(tickers, start_date, end_date, fetch):
+    """
+    Return the dataset of a (tickers, start, end) selection, fetching it once
+    for every session through the shared result cache.
+
+    Args:
+        tickers (list): Selected tickers
+        start_date (date): First day of the range
+        end_date (date): Last day of the range (exclusive, like yfinance)
+        fetch (callable): fetch(tickers, start_date, end_date) -> (Price, Ticker) DataFrame
+
+    Returns:
+        PriceDataset: The aligned dataset
+    """
+    def compute():
+        load_span.set(cache='miss')
+        return fetch(list(key[1]), start_date, end_date)
+
+    key = result_key('page_two', tickers, start_date, end_date)
+    with span('load_price_dataset', tickers=len(key[1]), start=start_date, end=end_date) as load_span:
+        load_span.set(cache='hit')
+        data = result_cache.get_or_compute(key, '1d', compute)
+        load_span.set(**frame_fields(data))
+    tickers = [tickers] if isinstance(tickers, str) else list(tickers)
+    return PriceDataset(data, tickers, start_date, end_date)
@@ -0,0 +1,110 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Width in pixels the charts are drawn at, one point per pixel and series is kept
+CHART_WIDTH = int(os.environ.get('STOCK_ANALYSIS_CHART_WIDTH', '1000'))
+
+# Charts with more points than this in total are drawn with WebGL (scattergl) instead of SVG
+WEBGL_POINTS = int(os.environ.get('STOCK_ANALYSIS_WEBGL_POINTS', '5000'))
+
+
+def lttb_indices(x, y, threshold):
+    """
+    Largest-triangle-three-buckets selection of every column of `y` at once.
+
+    The first and last rows are kept; the rows in between are split into
+    threshold - 2 buckets, and each bucket keeps the row forming the largest
+    triangle with the row kept in the previous bucket and the mean of the next
+    one. Buckets are walked in order, but each step is vectorized over the rows
+    of the bucket and over all series.
+
+    Args:
+        x (ndarray): Increasing x values, shape (n,)
+        y (ndarray): Values of each series, shape (n, k); NaN for missing points
+        threshold (int): Points to keep per series
+
+    Returns:
+        ndarray: Row positions kept for each series, shape (m, k), increasing per column
+    """
+    num_rows, num_series = y.shape
+    if threshold >= num_rows or threshold < 3:
+        return np.repeat(np.arange(num_rows)[:, None], num_series, axis=1)
+
+    # Bucket i holds rows [starts[i], ends[i]), between the first and the last row
+    edges = np.linspace(1, num_rows - 1, threshold - 1).astype(np.int64)
+    starts, ends = edges[:-1], edges[1:]
+    lengths = (ends - starts)[:, None]
+
+    # Means of every bucket, ignoring missing points
+    valid = ~np.isnan(y)
+    sums = np.add.reduceat(np.where(valid, y, 0.0)[:num_rows - 1], starts, axis=0)
+    counts = np.add.reduceat(valid[:num_rows - 1].astype(np.int64), starts, axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_y = sums / counts
+    mean_x = np.add.reduceat(x[:num_rows - 1], starts) / lengths[:, 0]
+
+    # The third point of bucket i is the mean of bucket i + 1, the last row for the last bucket
+    next_x = np.r_[mean_x[1:], x[-1]]
+    next_y = np.vstack([mean_y[1:], y[-1:]])
+
+    selected = np.empty((threshold, num_series), dtype=np.int64)
+    selected[0], selected[-1] = 0, num_rows - 1
+    series = np.arange(num_series)
+    kept = np.zeros(num_series, dtype=np.int64)
+    for i, (start, end) in enumerate(zip(starts, ends)):
+        kept_x, kept_y = x[kept], y[kept, series]
+        bucket_x, bucket_y = x[start:end, None], y[start:end]
+        area = np.abs((kept_x - next_x[i]) * (bucket_y - kept_y) - (kept_x - bucket_x) * (next_y[i] - kept_y))
+        # Missing points never win unless the whole bucket is missing
+        area = np.where(np.isnan(area), -1.0, area)
+        kept = start + area.argmax(axis=0)
+        selected[i + 1] = kept
+    return selected
+
+
+def downsample(data, threshold=CHART_WIDTH):
+    """
+    Reduce a wide (date x series) frame to about `threshold` points per series
+    with LTTB, always keeping each series' minimum and maximum.
+
+    Args:
+        data (DataFrame): Values by date (rows) and series (columns)
+        threshold (int): Points to keep per series, e.g. the chart width in pixels
+
+    Returns:
+        DataFrame: Long frame with the index name (or 'Date'), 'Ticker' and 'Valor'
+        columns, one row per kept point
+    """
+    date_column = data.index.name or 'Date'
+    if data.empty:
+        return pd.DataFrame(columns=[date_column, 'Ticker', 'Valor'])
+
+    values = data.to_numpy(dtype=np.float64)
+    x = data.index.asi8.astype(np.float64) if isinstance(data.index, pd.DatetimeIndex) else np.arange(len(data), dtype=np.float64)
+    selected = lttb_indices(x, values, threshold)
+
+    # Extremes of each series, which the triangles may have skipped
+    missing = np.isnan(values)
+    extremes = np.vstack([np.where(missing, np.inf, values).argmin(axis=0),
+                          np.where(missing, -np.inf, values).argmax(axis=0)])
+    selected = np.sort(np.vstack([selected, extremes]), axis=0)
+
+    parts = []
+    for column, name in enumerate(data.columns):
+        rows = np.unique(selected[:, column])
+        rows = rows[~np.isnan(values[rows, column])]
+        parts.append(pd.DataFrame({
+            date_column: data.index[rows],
+            'Ticker': name,
+            'Valor': values[rows, column],
+        }))
+    return pd.concat(parts, ignore_index=True)
+
+
+def render_mode(num_points, webgl_points=WEBGL_POINTS):
+    """
+    Plotly render mode of a chart: WebGL above `webgl_points` points, SVG below.
+    """
+    return 'webgl' if num_points > webgl_points else 'svg'
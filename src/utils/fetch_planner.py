@@ -0,0 +1,96 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from utils.timing import frame_fields, span, submit
+
+# Longest window yfinance serves in a single request for each interval.
+# Intervals missing from this map (daily and above) have no span limit.
+PROVIDER_LIMITS = {
+    '1m': pd.Timedelta(days=7),
+    '2m': pd.Timedelta(days=60),
+    '5m': pd.Timedelta(days=60),
+    '15m': pd.Timedelta(days=60),
+    '30m': pd.Timedelta(days=60),
+    '90m': pd.Timedelta(days=60),
+    '60m': pd.Timedelta(days=730),
+    '1h': pd.Timedelta(days=730),
+}
+
+# Upper bound on concurrent requests for a single ticker
+MAX_WORKERS = 4
+
+
+def plan_chunks(start, end, interval, limits=PROVIDER_LIMITS):
+    """
+    Split [start, end) into the fewest requests the provider accepts for an interval.
+
+    Args:
+        start (Timestamp): Window start
+        end (Timestamp): Window end
+        interval (str): yfinance interval
+        limits (dict): Maximum span per request for each interval
+
+    Returns:
+        list: (chunk_start, chunk_end) tuples covering the window in order
+    """
+    if start >= end:
+        return []
+
+    max_span = limits.get(interval)
+    if max_span is None:
+        return [(start, end)]
+
+    chunks = []
+    chunk_start = start
+    while chunk_start < end:
+        chunk_end = min(chunk_start + max_span, end)
+        chunks.append((chunk_start, chunk_end))
+        chunk_start = chunk_end
+    return chunks
+
+
+def merge_chunks(chunks):
+    """
+    Merge downloaded chunks in one pass: a single concat, a sort and de-duplication
+    of the bars repeated at chunk boundaries.
+    """
+    chunks = [chunk for chunk in chunks if chunk is not None and not chunk.empty]
+    if not chunks:
+        return pd.DataFrame()
+
+    data = pd.concat(chunks).sort_index(kind='stable')
+    return data[~data.index.duplicated(keep='first')]
+
+
+def fetch_chunks(ticker, start, end, interval, download, max_workers=MAX_WORKERS):
+    """
+    Download a window for a ticker as planned chunks on a bounded thread pool.
+
+    Args:
+        ticker (str): Ticker symbol
+        start (Timestamp): Window start
+        end (Timestamp): Window end
+        interval (str): yfinance interval
+        download (callable): download(ticker, start, end, interval) for a single request
+        max_workers (int): Maximum number of concurrent requests
+
+    Returns:
+        DataFrame: Merged bars for the whole window
+    """
+    chunks = plan_chunks(start, end, interval)
+    if not chunks:
+        return pd.DataFrame()
+    if len(chunks) == 1:
+        return download(ticker, start, end, interval)
+
+    logging.info(f"Downloading {ticker} {interval} in {len(chunks)} chunks")
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+        # Chunks run in the caller's context, so their timing spans join its timeline
+        futures = [submit(executor, download, ticker, chunk_start, chunk_end, interval) for chunk_start, chunk_end in chunks]
+        results = [future.result() for future in futures]
+    with span('merge_chunks', ticker=ticker) as merge_span:
+        data = merge_chunks(results)
+        merge_span.set(**frame_fields(data))
+    return data
@@ -1,14 +1,186 @@
 import os
+import re
+import json
+import argparse
 import pandas as pd
-import yfinance as yf
-from yfinance import EquityQuery
 import time
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from utils.providers import get_provider
+from utils.rate_limit import TokenBucket, retry_with_backoff
 
-def fetch_all_tickers_with_sectors():
+# Default number of concurrent get_info workers
+ENRICH_CONCURRENCY = 8
+
+# Default get_info requests per second shared by all workers
+ENRICH_RATE = 5.0
+
+# Append-only journal of enriched tickers, used to resume interrupted runs
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+JOURNAL_PATH = os.path.join(CURRENT_DIR, '../../local_storage/universe/tickers_journal.jsonl')
+
+# Screener exchange code of B3
+EXCHANGE = 'SAO'
+
+# Fraction tickers (odd-lot market) end with 'F.SA'
+FRACTION_TICKER_PATTERN = re.compile(r'F\.SA$')
+
+# Columns of the tickers CSV files; 'enriched_at' is when the sector was fetched
+TICKER_COLUMNS = ['ticker', 'sector', 'enriched_at']
+
+def read_journal(journal_path=JOURNAL_PATH):
+    """
+    Reads the enrichment journal.
+
+    Args:
+        journal_path (str): Path of the journal file
+
+    Returns:
+        tuple: (rows, completed_offsets) where rows is the list of journaled
+        ticker entries and completed_offsets the set of finished screener offsets
+    """
+    rows = []
+    completed_offsets = set()
+    if not os.path.exists(journal_path):
+        return rows, completed_offsets
+
+    with open(journal_path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # A crash can leave a partial last line, ignore it
+                continue
+            if 'batch_offset' in entry:
+                completed_offsets.add(entry['batch_offset'])
+            else:
+                rows.append(entry)
+    return rows, completed_offsets
+
+def append_journal(rows, batch_offset=None, journal_path=JOURNAL_PATH):
+    """
+    Appends a batch of enriched tickers followed by a batch marker and fsyncs
+    the journal, so a completed batch survives a crash.
+
+    Args:
+        rows (list): Dicts with 'ticker' and 'sector'
+        batch_offset (int): Screener offset of the batch, no marker is written if None
+        journal_path (str): Path of the journal file
+
+    Returns:
+        str: The 'enriched_at' time written with the rows, in ISO format
+    """
+    enriched_at = datetime.now().isoformat(timespec='seconds')
+    with open(journal_path, 'a', encoding='utf-8') as f:
+        for row in rows:
+            f.write(json.dumps({**row, 'enriched_at': enriched_at}) + '\n')
+        if batch_offset is not None:
+            f.write(json.dumps({'batch_offset': batch_offset}) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+    return enriched_at
+
+def rewrite_journal(rows, journal_path=JOURNAL_PATH):
+    """
+    Replaces the journal with the given entries, keeping their 'enriched_at'.
+
+    Args:
+        rows (list): Dicts with 'ticker', 'sector' and 'enriched_at'
+        journal_path (str): Path of the journal file
+    """
+    with open(journal_path + '.tmp', 'w', encoding='utf-8') as f:
+        for row in rows:
+            f.write(json.dumps(row) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(journal_path + '.tmp', journal_path)
+
+def compact_journal(csv_path, journal_path=JOURNAL_PATH):
+    """
+    Compacts the journal into the tickers CSV, keeping the latest entry of each
+    ticker in the order tickers were first seen.
+
+    Args:
+        csv_path (str): Path of the CSV file to write
+        journal_path (str): Path of the journal file
+
+    Returns:
+        pd.DataFrame: DataFrame with the 'ticker', 'sector' and 'enriched_at' columns
+    """
+    rows, _ = read_journal(journal_path)
+    tickers_df = pd.DataFrame(rows, columns=TICKER_COLUMNS)
+    tickers_df = tickers_df.drop_duplicates('ticker', keep='last')
+
+    # Write next to the target and swap, so the CSV is never half written
+    tickers_df.to_csv(csv_path + '.tmp', index=False)
+    os.replace(csv_path + '.tmp', csv_path)
+    return tickers_df
+
+def fetch_sector(ticker_symbol, limiter, retries=3):
+    """
+    Fetches the sector of a single ticker, waiting on the shared rate limiter
+    before every attempt.
+
+    Args:
+        ticker_symbol (str): Ticker symbol
+        limiter (TokenBucket): Rate limiter shared by all workers
+        retries (int): Number of retries on errors
+
+    Returns:
+        str: The sector, or 'Unknown' if it is missing or could not be fetched
+    """
+    def get_info():
+        limiter.acquire()
+        return get_provider().get_info(ticker_symbol)
+
+    try:
+        ticker_info = retry_with_backoff(get_info, retries=retries)
+        if 'sector' in ticker_info and ticker_info['sector']:
+            return ticker_info['sector']
+    except Exception as e:
+        print(f"Error fetching sector for {ticker_symbol}: {str(e)}")
+    return "Unknown"
+
+def enrich_sectors(ticker_symbols, concurrency=ENRICH_CONCURRENCY, rate=ENRICH_RATE, limiter=None):
+    """
+    Fetches sectors for many tickers on a worker pool sharing one token-bucket
+    rate limiter.
+
+    Args:
+        ticker_symbols (list): Ticker symbols to enrich
+        concurrency (int): Number of worker threads
+        rate (float): Maximum get_info requests per second
+        limiter (TokenBucket): Existing limiter to share, created from `rate` if None
+
+    Returns:
+        list: Dicts with 'ticker' and 'sector', in the order of `ticker_symbols`
+    """
+    if not ticker_symbols:
+        return []
+    limiter = limiter or TokenBucket(rate)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        sectors = list(executor.map(lambda symbol: fetch_sector(symbol, limiter), ticker_symbols))
+    elapsed = time.perf_counter() - start
+
+    print(f"Enriched {len(ticker_symbols)} tickers in {elapsed:.1f}s ({len(ticker_symbols) / elapsed:.2f} tickers/sec)")
+    return [{'ticker': symbol, 'sector': sector} for symbol, sector in zip(ticker_symbols, sectors)]
+
+def fetch_all_tickers_with_sectors(concurrency=ENRICH_CONCURRENCY, rate=ENRICH_RATE, resume=False):
     """
     Fetches all tickers from the São Paulo exchange and their sectors,
     then saves them to a CSV file in the data directory.
+
+    Every batch is appended to a journal, and the CSV is produced from the
+    journal once all batches are done. A resumed run continues after the
+    journaled screener batches; pages are sorted by symbol, so a finished
+    batch holds the same tickers when the run is resumed.
+
+    Args:
+        concurrency (int): Number of concurrent get_info workers
+        rate (float): Maximum get_info requests per second across all workers
+        resume (bool): Continue an interrupted run from the journal instead of starting over
     """
     print("Starting to fetch all tickers from São Paulo exchange...")
     
@@ -20,8 +192,15 @@ def fetch_all_tickers_with_sectors():
     # Create data directory if it doesn't exist
     os.makedirs(data_dir, exist_ok=True)
     
-    # Initialize a list to store ticker data
-    all_tickers_data = []
+    # Start a new journal, or pick up the tickers and batches of an interrupted run
+    os.makedirs(os.path.dirname(JOURNAL_PATH), exist_ok=True)
+    if resume:
+        journaled_rows, completed_offsets = read_journal()
+        print(f"Resuming: {len(journaled_rows)} tickers and {len(completed_offsets)} batches already journaled.")
+    else:
+        journaled_rows, completed_offsets = [], set()
+        open(JOURNAL_PATH, 'w').close()
+    journaled_tickers = {row['ticker'] for row in journaled_rows}
     
     # Total number of tickers to fetch (as mentioned in the query)
     total_tickers = 2093
@@ -32,72 +211,156 @@ def fetch_all_tickers_with_sectors():
     # Calculate number of batches needed
     num_batches = (total_tickers + batch_size - 1) // batch_size
     
-    # Track progress
-    processed_tickers = 0
+    # One limiter for the whole run, so batches don't burst past the rate
+    limiter = TokenBucket(rate)
+    run_start = time.perf_counter()
+    run_processed = 0
     
     # Fetch tickers in batches
     for batch in range(num_batches):
         print(f"Processing batch {batch+1}/{num_batches}...")
         
-        # Create query for São Paulo exchange
-        q = EquityQuery('is-in', ['exchange', 'SAO'])
-        
         # Calculate offset for pagination
         offset = batch * batch_size
+        if offset in completed_offsets:
+            print(f"Batch {batch+1} already journaled, skipping.")
+            continue
         
         # Fetch batch of tickers
         try:
-            response = yf.screen(q, sortField='percentchange', sortAsc=True, size=batch_size, offset=offset)
+            response = retry_with_backoff(
+                lambda: get_provider().screen(EXCHANGE, size=batch_size, offset=offset)
+            )
             
             # Check if we got any quotes
             if 'quotes' not in response or not response['quotes']:
                 print(f"No quotes found in batch {batch+1}. Stopping.")
                 break
             
-            # Process each ticker in the batch
-            for quote in response['quotes']:
-                ticker_symbol = quote['symbol']
-                processed_tickers += 1
-                
-                print(f"Processing ticker {processed_tickers}/{total_tickers}: {ticker_symbol}")
-                
-                # Try to fetch sector information
-                sector = "Unknown"
-                try:
-                    ticker_info = yf.Ticker(ticker_symbol).get_info()
-                    if 'sector' in ticker_info and ticker_info['sector']:
-                        sector = ticker_info['sector']
-                except Exception as e:
-                    print(f"Error fetching sector for {ticker_symbol}: {str(e)}")
-                
-                # Add to our data list
-                all_tickers_data.append({
-                    'ticker': ticker_symbol,
-                    'sector': sector
-                })
-                
-                # Add a small delay to avoid rate limiting
-                time.sleep(0.2)
+            # Enrich the tickers of this batch that are not journaled yet
+            ticker_symbols = [quote['symbol'] for quote in response['quotes'] if quote['symbol'] not in journaled_tickers]
+            batch_rows = enrich_sectors(ticker_symbols, concurrency=concurrency, limiter=limiter)
+            
+            # Save progress after each batch
+            append_journal(batch_rows, offset)
+            journaled_tickers.update(row['ticker'] for row in batch_rows)
+            run_processed += len(batch_rows)
+            elapsed = time.perf_counter() - run_start
+            print(f"Progress saved: {len(journaled_tickers)}/{total_tickers} tickers processed so far "
+                  f"({run_processed / elapsed:.2f} tickers/sec).")
             
         except Exception as e:
             print(f"Error fetching batch {batch+1}: {str(e)}")
+    
+    # Compact the journal into the final CSV
+    tickers_df = compact_journal(csv_path)
+    
+    elapsed = time.perf_counter() - run_start
+    print(f"Completed! {len(tickers_df)} tickers saved to {csv_path} "
+          f"in {elapsed:.1f}s ({run_processed / elapsed:.2f} tickers/sec)")
+    return tickers_df
+
+def refresh_tickers_with_sectors(ttl_days=30, unknown_ttl_days=7, concurrency=ENRICH_CONCURRENCY, rate=ENRICH_RATE):
+    """
+    Refreshes the ticker universe incrementally. The screener is paged through
+    and compared with the existing all_tickers_sectors.csv; get_info is only
+    called for new tickers, 'Unknown' sectors and sectors older than the TTL.
+    Fraction tickers are filtered out in the same pass, so both CSV files are
+    written at the end.
+
+    Args:
+        ttl_days (int): Age in days after which a known sector is fetched again
+        unknown_ttl_days (int): Age in days after which an 'Unknown' sector is retried
+        concurrency (int): Number of concurrent get_info workers
+        rate (float): Maximum get_info requests per second across all workers
+
+    Returns:
+        tuple: (all_df, filtered_df) DataFrames with the 'ticker', 'sector' and 'enriched_at' columns
+    """
+    print("Starting incremental refresh of the São Paulo exchange tickers...")
+    
+    data_dir = os.path.join(CURRENT_DIR, '../data')
+    all_csv_path = os.path.join(data_dir, 'all_tickers_sectors.csv')
+    filtered_csv_path = os.path.join(data_dir, 'filtered_tickers_sectors.csv')
+    
+    # Known sectors, with the time each one was fetched. Reused rows keep their
+    # 'enriched_at', so a ticker expires by its own age whatever the runs in between.
+    known_sectors = {}
+    enriched_at = {}
+    if os.path.exists(all_csv_path):
+        existing_df = pd.read_csv(all_csv_path)
+        known_sectors = dict(zip(existing_df['ticker'], existing_df['sector']))
+        if 'enriched_at' in existing_df:
+            enriched_at = dict(existing_df[['ticker', 'enriched_at']].dropna().itertuples(index=False))
+    # Entries journaled after the CSV was written (e.g. by a run that crashed) are
+    # newer: their sector and time are taken together
+    journaled_rows, _ = read_journal()
+    for row in journaled_rows:
+        if row.get('enriched_at', '') > enriched_at.get(row['ticker'], ''):
+            known_sectors[row['ticker']] = row['sector']
+            enriched_at[row['ticker']] = row['enriched_at']
+    
+    now = datetime.now()
+    def needs_enrichment(symbol):
+        # Tickers without a recorded time (a CSV from before the column existed) are due
+        if symbol not in known_sectors or symbol not in enriched_at:
+            return True
+        ttl = unknown_ttl_days if known_sectors[symbol] == 'Unknown' else ttl_days
+        return now - datetime.fromisoformat(enriched_at[symbol]) > timedelta(days=ttl)
+    
+    os.makedirs(os.path.dirname(JOURNAL_PATH), exist_ok=True)
+    limiter = TokenBucket(rate)
+    batch_size = 250
+    offset = 0
+    all_rows = []
+    filtered_rows = []
+    seen = set()
+    enriched_count = 0
+    
+    # Stream the screener pages
+    while True:
+        response = retry_with_backoff(
+            lambda: get_provider().screen(EXCHANGE, size=batch_size, offset=offset)
+        )
+        quotes = response.get('quotes') or []
+        page_symbols = [quote['symbol'] for quote in quotes if quote['symbol'] not in seen]
+        seen.update(page_symbols)
         
-        # Save progress after each batch
-        temp_df = pd.DataFrame(all_tickers_data)
-        temp_df.to_csv(csv_path, index=False)
-        print(f"Progress saved: {len(all_tickers_data)} tickers processed so far.")
+        # Only new, unknown or expired tickers go to get_info
+        stale_symbols = [symbol for symbol in page_symbols if needs_enrichment(symbol)]
+        enriched_rows = enrich_sectors(stale_symbols, concurrency=concurrency, limiter=limiter)
+        if enriched_rows:
+            enriched_at.update(dict.fromkeys(stale_symbols, append_journal(enriched_rows)))
+            enriched_count += len(enriched_rows)
+        sectors = {row['ticker']: row['sector'] for row in enriched_rows}
         
-        # Add a delay between batches to avoid rate limiting
-        if batch < num_batches - 1:
-            print("Waiting before next batch...")
-            time.sleep(5)
+        for symbol in page_symbols:
+            row = {'ticker': symbol, 'sector': sectors.get(symbol, known_sectors.get(symbol)),
+                   'enriched_at': enriched_at.get(symbol)}
+            all_rows.append(row)
+            if not FRACTION_TICKER_PATTERN.search(symbol):
+                filtered_rows.append(row)
+        
+        if len(quotes) < batch_size:
+            break
+        offset += batch_size
     
-    # Create final DataFrame and save to CSV
-    tickers_df = pd.DataFrame(all_tickers_data)
-    tickers_df.to_csv(csv_path, index=False)
+    if not all_rows:
+        print("No quotes returned by the screener, keeping the existing files.")
+        return None, None
     
-    print(f"Completed! {len(all_tickers_data)} tickers saved to {csv_path}")
-    return tickers_df
+    # The journal is compacted to one entry per listed ticker, so it doesn't grow
+    # with every run, and the CSV is written from it
+    rewrite_journal(all_rows)
+    all_df = compact_journal(all_csv_path)
+    filtered_df = pd.DataFrame(filtered_rows, columns=TICKER_COLUMNS)
+    filtered_df.to_csv(filtered_csv_path + '.tmp', index=False)
+    os.replace(filtered_csv_path + '.tmp', filtered_csv_path)
+    
+    removed = len(set(known_sectors) - seen)
+    print(f"Refreshed {len(all_df)} tickers ({len(filtered_df)} after filtering fraction tickers): "
+          f"{enriched_count} enriched, {len(all_df) - enriched_count} reused, {removed} removed")
+    return all_df, filtered_df
 
 def filter_out_fraction_tickers():
     """
@@ -124,7 +387,7 @@ def filter_out_fraction_tickers():
         return None
     
     # Filter out fraction tickers (those with 'F.SA' at the end)
-    filtered_df = df[~df['ticker'].str.contains('F\.SA$')]
+    filtered_df = df[~df['ticker'].str.contains(FRACTION_TICKER_PATTERN)]
     
     # Count how many tickers were filtered out
     num_filtered_out = len(df) - len(filtered_df)
@@ -138,18 +401,28 @@ def filter_out_fraction_tickers():
     return filtered_df
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the São Paulo exchange ticker universe.")
+    parser.add_argument('--mode', choices=['filter', 'full', 'resume', 'diff'], default='filter',
+                        help="filter: only filter fraction tickers (default); full: fetch everything; "
+                             "resume: continue an interrupted full run; diff: re-enrich only new or changed tickers")
+    args = parser.parse_args()
+    
     # Record start time
     start_time = datetime.now()
     print(f"Script started at: {start_time}")
     
-    # Run the function
-    #fetch_all_tickers_with_sectors()
-    
-    # Filter out fraction tickers
-    filter_out_fraction_tickers()
+    if args.mode == 'diff':
+        # Fetches, enriches and filters in one pass
+        refresh_tickers_with_sectors()
+    else:
+        if args.mode in ('full', 'resume'):
+            fetch_all_tickers_with_sectors(resume=args.mode == 'resume')
+        
+        # Filter out fraction tickers
+        filter_out_fraction_tickers()
 
     # Record end time and calculate duration
     end_time = datetime.now()
     duration = end_time - start_time
     print(f"Script completed at: {end_time}")
-    print(f"Total duration: {duration}") 
\ No newline at end of file
+    print(f"Total duration: {duration}")
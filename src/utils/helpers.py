@@ -1,8 +1,13 @@
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
 import logging
 import os
 from datetime import date, datetime, timedelta
+from utils.b3_bulletin import read_bulletin
+from utils.b3_calendar import b3_calendar
+from utils.universe import FILTERED_TICKERS_PATH, TOP_15_PATH, get_universe_index
 
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
 
@@ -11,20 +16,18 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 
 
 def get_top_15_tickers():
-    data_frame_top_15_industry = pd.read_csv(os.path.join(CURRENT_DIR, '../data/df_top_15_com_industry.csv'), sep=';')
-    return data_frame_top_15_industry['TckrSymb'].tolist()
+    # Read through the memoized index, keeping the file's ranking order. The file is
+    # a B3 bulletin extract, parsed with its typed schema and mixed decimal marks
+    index = get_universe_index(TOP_15_PATH, reader=read_bulletin, ticker_column='TckrSymb', sector_column='Industry')
+    return index.ordered.tolist()
 
 def get_all_tickers_with_sectors(selected_sector_key):
-    # Read the CSV file
-    df = pd.read_csv(os.path.join(CURRENT_DIR, '../data/filtered_tickers_sectors.csv'), sep=',')
+    # The index is built once per process and rebuilt when the CSV file changes
+    index = get_universe_index(FILTERED_TICKERS_PATH)
     
-    # Filter the DataFrame based on the selected sector
+    # Look up the pre-sorted tickers of the selected sector
     key = selected_sector_key[0]
-    if key == 'all':
-        return df['ticker'].tolist()
-    else:
-        filtered_df = df[df['sector'] == key]
-        return filtered_df['ticker'].tolist()
+    return index.tickers(key).tolist()
 
 def format_number(number, decimal_places=2):
     """
@@ -41,7 +44,7 @@ def format_number(number, decimal_places=2):
         if pd.isna(number) or number is None:
             return "N/A"
             
-        if isinstance(number, (int, float)):
+        if isinstance(number, (int, float, np.number)):
             return f"{number:,.{decimal_places}f}"
         
         return str(number)
@@ -65,7 +68,7 @@ def format_percentage(number, decimal_places=2):
         if pd.isna(number) or number is None:
             return "N/A"
             
-        if isinstance(number, (int, float)):
+        if isinstance(number, (int, float, np.number)):
             return f"{number * 100:,.{decimal_places}f}%"
         
         return str(number + "%")
@@ -87,7 +90,7 @@ def format_currency(number):
         if pd.isna(number) or number is None:
             return "N/A"
             
-        if not isinstance(number, (int, float)):
+        if not isinstance(number, (int, float, np.number)):
             return str(number)
             
         abs_num = abs(number)
@@ -119,7 +122,7 @@ def format_large_number(number):
         if pd.isna(number) or number is None:
             return "N/A"
             
-        if not isinstance(number, (int, float)):
+        if not isinstance(number, (int, float, np.number)):
             return str(number)
             
         abs_num = abs(number)
@@ -144,17 +147,25 @@ def get_date_ranges():
     """
     Generate common date ranges for analysis.
     
+    Both ends are snapped to B3 sessions: ranges end at the latest session and
+    start at the first session on or after the calendar lookback.
+    
     Returns:
         dict: Dictionary with date range names as keys and (start_date, end_date) tuples as values
     """
     today = date.today()
+    last_session = b3_calendar.previous_session(today).item()
+    
+    def first_session(day):
+        return b3_calendar.next_session(day).item()
     
     # Calculate date ranges
-    one_month_ago = today - timedelta(days=30)
-    three_months_ago = today - timedelta(days=90)
-    six_months_ago = today - timedelta(days=180)
-    one_year_ago = today - timedelta(days=365)
-    ytd_start = date(today.year, 1, 1)
+    one_month_ago = first_session(today - timedelta(days=30))
+    three_months_ago = first_session(today - timedelta(days=90))
+    six_months_ago = first_session(today - timedelta(days=180))
+    one_year_ago = first_session(today - timedelta(days=365))
+    ytd_start = first_session(date(today.year, 1, 1))
+    today = last_session
     
     # Create dictionary of date ranges
     date_ranges = {
@@ -190,29 +201,25 @@ def ensure_dir(directory):
 
 def get_trading_days(start_date, end_date, include_holidays=False):
     """
-    Get a list of trading days (weekdays) between two dates.
+    Get a list of B3 trading days between two dates.
     
     Args:
         start_date (date): Start date
         end_date (date): End date
-        include_holidays (bool): Whether to include holidays (simplified)
+        include_holidays (bool): Whether to also include weekday holidays
         
     Returns:
         list: List of dates representing trading days
     """
-    # Create a range of all dates
-    all_dates = pd.date_range(start=start_date, end=end_date)
-    
-    # Filter to weekdays only (Monday=0, Sunday=6)
-    weekdays = all_dates[all_dates.dayofweek < 5]
+    # Binary search into the precomputed session calendar
+    if include_holidays:
+        days = np.arange(np.datetime64(start_date, 'D'), np.datetime64(end_date, 'D') + 1)
+        trading_days = days[(days.astype(np.int64) + 3) % 7 < 5]
+    else:
+        trading_days = b3_calendar.sessions_between(start_date, end_date)
     
     # Convert to list of date objects
-    trading_days = [date.fromordinal(d.toordinal()) for d in weekdays]
-    
-    # Note: This doesn't account for market holidays
-    # For a more accurate calendar, a specialized library or API should be used
-    
-    return trading_days
+    return trading_days.astype(object).tolist()
 
 
 def parse_date(date_str, default=None):
@@ -241,10 +248,67 @@ def parse_date(date_str, default=None):
         return default
 
 
+def _ticker_codes(symbols, unique_tickers, positions):
+    """
+    Position of every row's symbol in `unique_tickers`, -1 for other symbols.
+    Categorical columns map their categories, others are looked up by Arrow.
+    """
+    if isinstance(symbols.dtype, pd.CategoricalDtype):
+        lookup = np.array([positions.get(symbol, -1) for symbol in symbols.cat.categories] + [-1], dtype=np.intp)
+        return lookup[symbols.cat.codes.to_numpy()]
+    codes = pc.index_in(pa.array(symbols, type=pa.string()), value_set=pa.array(unique_tickers, type=pa.string()))
+    return codes.fill_null(-1).to_numpy().astype(np.intp)
+
+
+def _date_codes(dates):
+    """
+    Sorted position of every row's datetime among the distinct datetimes, and
+    their number. Rows already in datetime order are coded in one pass.
+    """
+    if pd.api.types.is_datetime64_any_dtype(dates.dtype) and not dates.hasnans:
+        keys = dates.array.asi8
+        if len(keys) and (keys[1:] >= keys[:-1]).all():
+            codes = np.zeros(len(keys), dtype=np.intp)
+            np.cumsum(keys[1:] != keys[:-1], out=codes[1:])
+            return codes, codes[-1] + 1
+    # Factorize the datetime column itself, to_numpy() would turn tz-aware values into objects
+    codes, uniques = pd.factorize(dates, sort=True)
+    return codes, len(uniques)
+
+
+def _latest_valid_positions(valid, rows, counts, first, nths):
+    """
+    Row of the n-th latest valid value of the given columns of a validity
+    matrix for every n in `nths`, or of the first valid value for shorter
+    series. Only a window at the end of each series is scanned; series with
+    fewer valid values than needed in the window fall back to a full scan.
+    """
+    last = len(valid) - 1 - valid[::-1].argmax(axis=0)[rows]
+    window = min(len(valid), 4 * max(nths))
+    positions = last - np.arange(window)[:, None]
+    seen = np.cumsum(valid[np.maximum(positions, 0), rows] & (positions >= 0), axis=0)
+
+    results = []
+    for n in nths:
+        reached = seen >= n
+        result = positions[reached.argmax(axis=0), np.arange(len(rows))]
+        result = np.where(counts >= n, result, first)
+        for i in np.flatnonzero(~reached[-1] & (counts >= n)):
+            result[i] = np.flatnonzero(valid[:, rows[i]])[-n]
+        results.append(result)
+    return results
+
+
 def get_performance_summary(price_data, tickers, column='close'):
     """
     Calculate performance summary for selected tickers.
     
+    All tickers are computed at once with NumPy on a (datetime x ticker)
+    matrix, with the same results as running the calculations on each
+    ticker's series after dropping missing values: lookbacks count valid
+    prices back from each ticker's last one, and returns are taken between
+    consecutive valid prices, across interior gaps.
+    
     Args:
         price_data (DataFrame): DataFrame containing stock price data
         tickers (list): List of ticker symbols
@@ -254,60 +318,101 @@ def get_performance_summary(price_data, tickers, column='close'):
         DataFrame: Performance summary DataFrame
     """
     try:
+        unique_tickers = list(dict.fromkeys(tickers))
+        positions = {ticker: i for i, ticker in enumerate(unique_tickers)}
+        ticker_codes = _ticker_codes(price_data['symbol'], unique_tickers, positions)
+        date_codes, num_dates = _date_codes(price_data['datetime'])
+        values = price_data[column].to_numpy(dtype=float)
+        
         # Filter data for selected tickers
-        filtered_data = price_data[price_data['symbol'].isin(tickers)]
+        selected = ticker_codes >= 0
+        if not selected.all():
+            ticker_codes, date_codes, values = ticker_codes[selected], date_codes[selected], values[selected]
         
-        # Pivot the DataFrame
-        pivot_df = filtered_data.pivot(index='datetime', columns='symbol', values=column).sort_index()
+        # Same rule as pivot: one value per (datetime, ticker), checked on the
+        # integer codes. Rows sorted by datetime, as a stacked frame is, are
+        # checked in one pass, others are sorted.
+        cells = date_codes * len(unique_tickers) + ticker_codes
+        in_order = (cells[1:] > cells[:-1]).all()
+        if not in_order and len(np.unique(cells)) != len(cells):
+            raise ValueError("Index contains duplicate entries, cannot reshape")
         
-        # Calculate performance metrics
-        performance = []
-        for ticker in tickers:
-            ticker_data = pivot_df[ticker].dropna()
-            
-            if len(ticker_data) < 2:
-                continue
-                
-            latest_price = ticker_data.iloc[-1]
-            first_price = ticker_data.iloc[0]
-            
-            # Calculate performance over various periods
-            daily_change = ticker_data.pct_change().iloc[-1] if len(ticker_data) > 1 else 0
+        # Pivot into a (datetime x ticker) matrix. A stacked frame with every cell
+        # in order is the matrix already; other rows are scattered with integer
+        # codes, much cheaper than DataFrame.pivot on long histories
+        if in_order and len(cells) == num_dates * len(unique_tickers):
+            matrix = values.reshape(num_dates, len(unique_tickers))
+        else:
+            matrix = np.full((num_dates, len(unique_tickers)), np.nan)
+            matrix[date_codes, ticker_codes] = values
+        valid = ~np.isnan(matrix)
+        counts = valid.sum(axis=0)
+        
+        # Keep the requested ticker order, skipping tickers with fewer than two prices
+        columns = [ticker for ticker in tickers if counts[positions[ticker]] >= 2]
+        if not columns:
+            return pd.DataFrame()
+        rows = np.array([positions[ticker] for ticker in columns], dtype=np.intp)
+        counts = counts[rows]
+        
+        # Positions of the latest price and of the 2nd, 6th and 22nd latest ones
+        first = valid.argmax(axis=0)[rows]
+        lookbacks = _latest_valid_positions(valid, rows, counts, first, (1, 2, 6, 22))
+        latest_price, previous_price, week_price, month_price = (matrix[lookback, rows] for lookback in lookbacks)
+        first_price = matrix[first, rows]
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            daily_change = latest_price / previous_price - 1
             
             # Weekly change (last 5 trading days)
-            week_ago_idx = max(0, len(ticker_data) - 6)
-            weekly_change = (latest_price / ticker_data.iloc[week_ago_idx] - 1) if week_ago_idx < len(ticker_data) - 1 else 0
+            weekly_change = latest_price / week_price - 1
             
             # Monthly change (last 21 trading days)
-            month_ago_idx = max(0, len(ticker_data) - 22)
-            monthly_change = (latest_price / ticker_data.iloc[month_ago_idx] - 1) if month_ago_idx < len(ticker_data) - 1 else 0
+            monthly_change = latest_price / month_price - 1
             
             # Overall change
-            overall_change = (latest_price / first_price - 1)
+            overall_change = latest_price / first_price - 1
             
-            # Calculate volatility (standard deviation of returns)
-            returns = ticker_data.pct_change().dropna()
+            # Returns between consecutive valid prices of each ticker, so interior
+            # gaps are skipped like after dropna
+            if len(rows) != valid.shape[1] or (rows != np.arange(len(rows))).any():
+                matrix, valid = matrix[:, rows], valid[:, rows]
+            returns = matrix[1:] / matrix[:-1] - 1
+            has_return = valid[1:] & valid[:-1]
             
-            # Get volatility (annualized)
-            if len(returns) > 1:
-                volatility = returns.std() * np.sqrt(252)
-            else:
-                volatility = 0
+            # Prices right after a gap are compared with the last price before it
+            gap_rows, gap_columns = np.nonzero(valid[1:] & ~valid[:-1])
+            after_first = gap_rows + 1 > first[gap_columns]
+            gap_rows, gap_columns = gap_rows[after_first], gap_columns[after_first]
+            before = gap_rows.copy()
+            searching = ~valid[before, gap_columns]
+            while searching.any():
+                before[searching] -= 1
+                searching[searching] = ~valid[before[searching], gap_columns[searching]]
+            returns[gap_rows, gap_columns] = matrix[gap_rows + 1, gap_columns] / matrix[before, gap_columns] - 1
+            has_return[gap_rows, gap_columns] = True
+            returns[~has_return] = 0.0
             
-            performance.append({
-                'ticker': ticker,
-                'latest_price': latest_price,
-                'daily_change': daily_change,
-                'weekly_change': weekly_change,
-                'monthly_change': monthly_change,
-                'overall_change': overall_change,
-                'volatility': volatility
-            })
+            # Get volatility (annualized) as the sample standard deviation of each ticker's returns
+            returns_count = counts - 1
+            mean = returns.sum(axis=0) / returns_count
+            returns -= mean
+            returns[~has_return] = 0.0
+            squared = np.einsum('ij,ij->j', returns, returns)
+            volatility = np.sqrt(squared / (returns_count - 1)) * np.sqrt(252)
         
-        if not performance:
-            return pd.DataFrame()
-            
-        return pd.DataFrame(performance)
+        # Volatility needs at least two returns
+        volatility = np.where(returns_count > 1, volatility, 0)
+        
+        return pd.DataFrame({
+            'ticker': columns,
+            'latest_price': latest_price,
+            'daily_change': daily_change,
+            'weekly_change': weekly_change,
+            'monthly_change': monthly_change,
+            'overall_change': overall_change,
+            'volatility': volatility
+        })
     except Exception as e:
         logging.error(f"Error calculating performance summary: {e}")
-        return pd.DataFrame() 
\ No newline at end of file
+        return pd.DataFrame()
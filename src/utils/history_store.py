@@ -0,0 +1,212 @@
+import fcntl
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from utils.helpers import ensure_dir
+from utils.price_data import range_metrics
+
+# Columns stored for every bar after its timestamp, all 8 bytes wide
+BAR_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+# Bytes of one stored bar: an int64 timestamp and the float64 columns
+ROW_BYTES = 8 * (1 + len(BAR_COLUMNS))
+
+EXTENSION = '.bars'
+
+# Mappings kept open for reuse. Each one holds a file descriptor, so whole
+# sectors (about 1,600 tickers) must not stay mapped at once
+MAX_OPEN_MAPPINGS = int(os.environ.get('STOCK_ANALYSIS_MAX_MAPPINGS', '128'))
+
+
+def _to_datetime64(timestamp):
+    """
+    Convert a Timestamp (tz-aware ones to UTC) to the datetime64[ns] stored on disk.
+    """
+    timestamp = pd.Timestamp(timestamp)
+    if timestamp.tz is not None:
+        timestamp = timestamp.tz_convert('UTC').tz_localize(None)
+    return timestamp.as_unit('ns').to_datetime64()
+
+
+class TickerHistory:
+    """
+    Bars of one (ticker, interval) as read-only column views over a memory-mapped file.
+
+    Slicing binary-searches the timestamps and returns views, so a range is only
+    paged in from disk (or the shared OS page cache) when its values are used.
+    """
+
+    def __init__(self, timestamps, columns):
+        self.timestamps = timestamps
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @property
+    def empty(self):
+        return len(self.timestamps) == 0
+
+    @property
+    def nbytes(self):
+        return len(self.timestamps) * ROW_BYTES
+
+    def slice(self, start=None, end=None):
+        """
+        Bars in [start, end), as views of this history.
+        """
+        left = 0 if start is None else np.searchsorted(self.timestamps, _to_datetime64(start), side='left')
+        right = len(self) if end is None else np.searchsorted(self.timestamps, _to_datetime64(end), side='left')
+        return TickerHistory(self.timestamps[left:right], {name: values[left:right] for name, values in self.columns.items()})
+
+    def to_frame(self, copy=False):
+        """
+        OHLCV frame with a UTC index. Unless `copy` is set, price columns stay
+        views of the mapped file and only the index is materialized.
+        """
+        index = pd.DatetimeIndex(self.timestamps, tz='UTC', copy=False)
+        return pd.DataFrame(self.columns, index=index, copy=copy)
+
+    def metrics(self):
+        """
+        The tuple of `calculate_metrics`, computed on the views without building a frame.
+        """
+        return range_metrics(self.columns['Close'], self.columns['High'], self.columns['Low'], self.columns['Volume'])
+
+
+def write_atomic(path, write):
+    """
+    Replace `path` with the file written by `write(file)`, through a unique
+    temporary file in the same directory.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            write(file)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _empty_history():
+    return TickerHistory(np.empty(0, dtype='datetime64[ns]'), {name: np.empty(0) for name in BAR_COLUMNS})
+
+
+class HistoryStore:
+    """
+    On-disk bar store with one fixed-width file per (ticker, interval).
+
+    A file holds N int64 timestamps (UTC nanoseconds) followed by N float64 values
+    of each of BAR_COLUMNS, column after column, so N is the file size divided by
+    ROW_BYTES. Files are opened with numpy.memmap and written whole to a unique
+    temporary file that replaces the old one, so every worker process maps the
+    same pages and readers keep a consistent view while a file is being rewritten.
+
+    Only the MAX_OPEN_MAPPINGS most recently opened files stay mapped; older
+    mappings are released once no view of them is left.
+    """
+
+    def __init__(self, store_dir, max_open=MAX_OPEN_MAPPINGS):
+        self.store_dir = store_dir
+        self.max_open = max_open
+        # Open mappings by path, least recently used first, reused while the file is unchanged
+        self._mapped = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _name(self, ticker, interval):
+        return f"{ticker.replace('/', '_')}_{interval}"
+
+    def path(self, ticker, interval):
+        return os.path.join(self.store_dir, self._name(ticker, interval) + EXTENSION)
+
+    @contextmanager
+    def lock(self, ticker, interval):
+        """
+        Exclusive lock of a (ticker, interval) shared by all processes using the
+        store, for updates that span several files (bars and their metadata).
+        """
+        ensure_dir(self.store_dir)
+        with open(os.path.join(self.store_dir, self._name(ticker, interval) + '.lock'), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def open(self, ticker, interval):
+        """
+        Map the stored bars of a (ticker, interval).
+
+        Returns:
+            TickerHistory: Views over the file, or None if nothing is stored
+        """
+        path = self.path(ticker, interval)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        version = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            mapped = self._mapped.get(path)
+            if mapped is not None and mapped[0] == version:
+                self._mapped.move_to_end(path)
+                return mapped[1]
+
+        rows = stat.st_size // ROW_BYTES
+        if rows == 0:
+            # An empty file can't be mapped
+            history = _empty_history()
+        else:
+            values = np.memmap(path, dtype=np.int64, mode='r', shape=(1 + len(BAR_COLUMNS), rows))
+            history = TickerHistory(values[0].view('datetime64[ns]'),
+                                    {name: values[i + 1].view(np.float64) for i, name in enumerate(BAR_COLUMNS)})
+        with self._lock:
+            self._mapped[path] = (version, history)
+            self._mapped.move_to_end(path)
+            # The file is unmapped, and its descriptor closed, when the last view goes away
+            while len(self._mapped) > self.max_open:
+                self._mapped.popitem(last=False)
+        return history
+
+    def write(self, ticker, interval, data):
+        """
+        Store the bars of a (ticker, interval), replacing what was stored.
+
+        Args:
+            ticker (str): Ticker symbol
+            interval (str): yfinance interval
+            data (DataFrame): Flat OHLCV bars sorted by a UTC index; other columns are dropped
+
+        Returns:
+            int: Bytes written
+        """
+        ensure_dir(self.store_dir)
+        path = self.path(ticker, interval)
+
+        values = np.empty((1 + len(BAR_COLUMNS), len(data)), dtype=np.int64)
+        if len(data):
+            values[0] = data.index.tz_convert('UTC').as_unit('ns').asi8
+            prices = data.reindex(columns=BAR_COLUMNS).to_numpy(dtype=np.float64, na_value=np.nan)
+            values[1:] = prices.T.view(np.int64)
+
+        # Write to a temporary file of this writer only, so readers never map a half
+        # written store and concurrent writers never replace each other's partial files
+        write_atomic(path, values.tofile)
+        return values.nbytes
+
+    def read(self, ticker, interval, start=None, end=None):
+        """
+        Stored bars in [start, end) as a frame over the mapped file, or None.
+        """
+        history = self.open(ticker, interval)
+        if history is None:
+            return None
+        return history.slice(start, end).to_frame()
@@ -0,0 +1,330 @@
+import numpy as np
+import pandas as pd
+
+# Largest power of 1 / (1 - alpha) a block of the EMA recurrence may reach before it is rescaled
+MAX_BLOCK_GROWTH = 1e150
+MAX_BLOCK_ROWS = 1024
+
+# Rows of the rolling windows summed from the same reference value, which keeps the variance exact
+ROLLING_BLOCK_ROWS = 512
+
+
+def _compact(values):
+    """
+    Stable partition of every column: its valid values first, in order, then NaN.
+
+    A missing bar is treated as absent, as if `ta` ran on that ticker's own
+    series, so the indicators of each column only see its valid values.
+
+    Returns:
+        tuple: (compacted values, row order to scatter results back, valid count per column)
+    """
+    missing = np.isnan(values)
+    order = np.argsort(missing, axis=0, kind='stable')
+    return np.take_along_axis(values, order, axis=0), order, len(values) - missing.sum(axis=0)
+
+
+def _scatter(compacted, order):
+    """
+    Put values computed on compacted columns back on the rows they came from.
+    """
+    result = np.empty_like(compacted)
+    np.put_along_axis(result, order, compacted, axis=0)
+    return result
+
+
+def _past_valid(shape, valid):
+    """
+    True for the rows of a compacted matrix after each column's valid values.
+    """
+    return np.arange(shape[0])[:, None] >= valid[None, :]
+
+
+def _last_valid(compacted, valid, previous):
+    """
+    Value at each column's last valid row, or `previous` for columns without one.
+    """
+    rows = np.maximum(valid - 1, 0)
+    return np.where(valid > 0, compacted[rows, np.arange(compacted.shape[1])], previous)
+
+
+def _ewm_compacted(compacted, valid, alpha, min_periods, state):
+    """
+    EMA of compacted columns, continuing from `state`.
+
+    y_t = (1 - alpha) * y_{t-1} + alpha * x_t, seeded with the first value like
+    pandas' ewm(adjust=False). Each block of rows uses the closed form
+
+        y_t = d^(t-s+1) * (y_{s-1} + sum_{i=s..t} alpha * x_i / d^(i-s+1)),  d = 1 - alpha
+
+    so a block is one cumulative sum over all tickers instead of a loop over
+    rows. Blocks are kept short enough for d^-(rows) to stay far from overflow.
+    """
+    decay = 1.0 - alpha
+    # A column without history starts from its first value
+    last = np.where(state['count'] > 0, state['last'], compacted[0])
+
+    if decay <= 0:
+        result = compacted.copy()
+    else:
+        block = int(min(MAX_BLOCK_ROWS, max(1, np.log(MAX_BLOCK_GROWTH) / -np.log(decay))))
+        result = np.empty_like(compacted)
+        for start in range(0, len(compacted), block):
+            rows = compacted[start:start + block]
+            powers = decay ** np.arange(1, len(rows) + 1, dtype=np.float64)[:, None]
+            out = result[start:start + block]
+            np.divide(rows, powers, out=out)
+            out *= alpha
+            np.cumsum(out, axis=0, out=out)
+            out += last
+            out *= powers
+            last = out[-1]
+
+    new_state = {'last': _last_valid(result, valid, state['last']), 'count': state['count'] + valid}
+    observations = state['count'][None, :] + np.arange(1, len(compacted) + 1)[:, None]
+    result[(observations < min_periods) | _past_valid(result.shape, valid)] = np.nan
+    return result, new_state
+
+
+def _rolling_compacted(compacted, valid, window, state):
+    """
+    Mean and population standard deviation of the last `window` values of
+    compacted columns, continuing from `state`.
+
+    Windows are differences of cumulative sums of the values and their squares,
+    taken relative to the first value of each block of rows so the variance
+    doesn't lose precision to the level of the prices.
+    """
+    num_rows = len(compacted)
+    extended = np.vstack([state['window'], compacted])
+    mean = np.empty_like(compacted)
+    std = np.empty_like(compacted)
+    for start in range(0, num_rows, ROLLING_BLOCK_ROWS):
+        stop = min(start + ROLLING_BLOCK_ROWS, num_rows)
+        # Extended rows [start, stop + window - 1) hold the windows ending at compacted rows [start, stop)
+        rows = extended[start:stop + window - 1]
+        reference = rows[window - 1]
+        centered = np.nan_to_num(rows - reference)
+        sums = np.cumsum(np.vstack([np.zeros_like(reference), centered]), axis=0)
+        squares = np.cumsum(np.vstack([np.zeros_like(reference), centered * centered]), axis=0)
+        block_mean = (sums[window:] - sums[:-window]) / window
+        variance = (squares[window:] - squares[:-window]) / window - block_mean * block_mean
+        mean[start:stop] = block_mean + reference
+        std[start:stop] = np.sqrt(np.maximum(variance, 0.0))
+
+    observations = state['count'][None, :] + np.arange(1, num_rows + 1)[:, None]
+    incomplete = (observations < window) | _past_valid(compacted.shape, valid)
+    mean[incomplete] = np.nan
+    std[incomplete] = np.nan
+
+    # The last window - 1 values of each column, NaN padded while the history is shorter
+    rows = valid[None, :] + np.arange(window - 1)[:, None]
+    new_state = {'window': np.take_along_axis(extended, rows, axis=0), 'count': state['count'] + valid}
+    return mean, std, new_state
+
+
+def _ewm_state(num_series):
+    return {'last': np.full(num_series, np.nan), 'count': np.zeros(num_series, dtype=np.int64)}
+
+
+def _rolling_state(num_series, window):
+    return {'window': np.full((window - 1, num_series), np.nan), 'count': np.zeros(num_series, dtype=np.int64)}
+
+
+def ewm(values, alpha, min_periods, state=None):
+    """
+    Exponentially weighted mean (adjust=False) of every column, skipping missing values.
+
+    Args:
+        values (ndarray): (rows x tickers) values, NaN for missing bars
+        alpha (float): Smoothing factor, 2 / (span + 1) for an EMA, 1 / window for Wilder's smoothing
+        min_periods (int): Values needed before a result is returned
+        state (dict): State returned by the previous call, to continue the series
+
+    Returns:
+        tuple: (ndarray shaped like `values`, state for the next call)
+    """
+    state = state or _ewm_state(values.shape[1])
+    if len(values) == 0:
+        return values.copy(), state
+    compacted, order, valid = _compact(values)
+    result, state = _ewm_compacted(compacted, valid, alpha, min_periods, state)
+    return _scatter(result, order), state
+
+
+def rolling_mean_std(values, window, state=None):
+    """
+    Rolling mean and population standard deviation of every column over its
+    last `window` valid values.
+
+    Args:
+        values (ndarray): (rows x tickers) values, NaN for missing bars
+        window (int): Number of values in a window
+        state (dict): State returned by the previous call, to continue the series
+
+    Returns:
+        tuple: (mean, std, state for the next call)
+    """
+    state = state or _rolling_state(values.shape[1], window)
+    if len(values) == 0:
+        return values.copy(), values.copy(), state
+    compacted, order, valid = _compact(values)
+    mean, std, state = _rolling_compacted(compacted, valid, window, state)
+    return _scatter(mean, order), _scatter(std, order), state
+
+
+class IndicatorEngine:
+    """
+    SMA, EMA, RSI, MACD, Bollinger bands and ATR of every column of a wide
+    (date x ticker) price matrix, with the same definitions as the `ta` package.
+
+    The first `update` takes the whole history; later calls take only the bars
+    appended since, and continue from the state kept at the end of the previous
+    call (last EMA values, last window of closes, last close and true range sum),
+    so an update costs O(new bars) instead of a recompute of the full history.
+
+    Missing bars (NaN closes) are skipped, as if each ticker's series had no
+    row for them. Unlike `ta`, the ATR is NaN until its first window is
+    complete instead of 0.
+    """
+
+    def __init__(self, sma_window=20, ema_window=20, rsi_window=14, macd_windows=(12, 26, 9),
+                 bollinger_window=20, bollinger_dev=2, atr_window=14):
+        self.sma_window = sma_window
+        self.ema_window = ema_window
+        self.rsi_window = rsi_window
+        self.macd_windows = macd_windows
+        self.bollinger_window = bollinger_window
+        self.bollinger_dev = bollinger_dev
+        self.atr_window = atr_window
+        self.columns = None
+        self.state = None
+
+    def _initial_state(self, num_series):
+        fast, slow, signal = self.macd_windows
+        return {
+            'sma': _rolling_state(num_series, self.sma_window),
+            'ema': _ewm_state(num_series),
+            'rsi_close': np.full(num_series, np.nan),
+            'rsi_up': _ewm_state(num_series),
+            'rsi_down': _ewm_state(num_series),
+            'macd_fast': _ewm_state(num_series),
+            'macd_slow': _ewm_state(num_series),
+            'macd_signal': _ewm_state(num_series),
+            'bollinger': _rolling_state(num_series, self.bollinger_window),
+            'atr_close': np.full(num_series, np.nan),
+            'atr_count': np.zeros(num_series, dtype=np.int64),
+            'atr_sum': np.zeros(num_series),
+            'atr': _ewm_state(num_series),
+        }
+
+    def _rsi(self, close, valid):
+        previous = np.vstack([self.state['rsi_close'][None, :], close[:-1]])
+        change = close - previous
+        # The first close of a ticker has no change, like the 0 `ta` puts in place of the NaN diff
+        change[np.isnan(previous)] = 0.0
+        up = np.where(change > 0, change, 0.0)
+        down = np.where(change < 0, -change, 0.0)
+        past_valid = _past_valid(close.shape, valid)
+        up[past_valid] = np.nan
+        down[past_valid] = np.nan
+
+        alpha = 1 / self.rsi_window
+        up, self.state['rsi_up'] = _ewm_compacted(up, valid, alpha, self.rsi_window, self.state['rsi_up'])
+        down, self.state['rsi_down'] = _ewm_compacted(down, valid, alpha, self.rsi_window, self.state['rsi_down'])
+        self.state['rsi_close'] = _last_valid(close, valid, self.state['rsi_close'])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(down == 0, 100.0, 100 - 100 / (1 + up / down))
+
+    def _macd(self, close, valid):
+        fast, slow, signal = self.macd_windows
+        fast_ema, self.state['macd_fast'] = _ewm_compacted(close, valid, 2 / (fast + 1), fast, self.state['macd_fast'])
+        slow_ema, self.state['macd_slow'] = _ewm_compacted(close, valid, 2 / (slow + 1), slow, self.state['macd_slow'])
+        macd = fast_ema - slow_ema
+        # The signal line starts at the first MACD value, not at the first close
+        signal_line, self.state['macd_signal'] = ewm(macd, 2 / (signal + 1), signal, self.state['macd_signal'])
+        return macd, signal_line, macd - signal_line
+
+    def _atr(self, close, high, low, valid):
+        window = self.atr_window
+        previous = np.vstack([self.state['atr_close'][None, :], close[:-1]])
+        true_range = np.fmax(high, previous) - np.fmin(low, previous)
+        past_valid = _past_valid(close.shape, valid)
+        true_range[past_valid] = np.nan
+
+        # The first ATR is the mean of the first `window` true ranges, then Wilder's smoothing
+        position = self.state['atr_count'][None, :] + np.arange(len(close))[:, None]
+        sums = self.state['atr_sum'] + np.cumsum(np.nan_to_num(true_range), axis=0)
+        seeded = np.where(position < window - 1, np.nan, np.where(position == window - 1, sums / window, true_range))
+        seeded[past_valid] = np.nan
+        atr, self.state['atr'] = ewm(seeded, 1 / window, 1, self.state['atr'])
+
+        self.state['atr_sum'] = _last_valid(sums, valid, self.state['atr_sum'])
+        self.state['atr_count'] = self.state['atr_count'] + valid
+        self.state['atr_close'] = _last_valid(close, valid, self.state['atr_close'])
+        return atr
+
+    def update(self, close, high=None, low=None):
+        """
+        Indicators of the given bars, continuing from the bars of the previous calls.
+
+        Args:
+            close (DataFrame): Closes by date (rows) and ticker (columns); NaN for missing bars
+            high (DataFrame): Highs shaped like `close`, needed for the ATR
+            low (DataFrame): Lows shaped like `close`, needed for the ATR
+
+        Returns:
+            dict: Indicator name -> DataFrame shaped like `close`
+        """
+        if self.columns is None:
+            self.columns = close.columns
+            self.state = self._initial_state(len(self.columns))
+        close = close.reindex(columns=self.columns)
+        index = close.index
+        values = close.to_numpy(dtype=np.float64)
+        if len(values) == 0:
+            return {}
+
+        compacted, order, valid = _compact(values)
+        sma, _, self.state['sma'] = _rolling_compacted(compacted, valid, self.sma_window, self.state['sma'])
+        ema, self.state['ema'] = _ewm_compacted(compacted, valid, 2 / (self.ema_window + 1), self.ema_window, self.state['ema'])
+        rsi = self._rsi(compacted, valid)
+        macd, macd_signal, macd_diff = self._macd(compacted, valid)
+        bollinger_mean, bollinger_std, self.state['bollinger'] = _rolling_compacted(
+            compacted, valid, self.bollinger_window, self.state['bollinger'])
+
+        indicators = {
+            f'SMA_{self.sma_window}': sma,
+            f'EMA_{self.ema_window}': ema,
+            f'RSI_{self.rsi_window}': rsi,
+            'MACD': macd,
+            'MACD_signal': macd_signal,
+            'MACD_diff': macd_diff,
+            'BB_mavg': bollinger_mean,
+            'BB_high': bollinger_mean + self.bollinger_dev * bollinger_std,
+            'BB_low': bollinger_mean - self.bollinger_dev * bollinger_std,
+        }
+        if high is not None and low is not None:
+            # High and low follow the row order of the closes
+            high = np.take_along_axis(high.reindex(columns=self.columns).to_numpy(dtype=np.float64), order, axis=0)
+            low = np.take_along_axis(low.reindex(columns=self.columns).to_numpy(dtype=np.float64), order, axis=0)
+            indicators[f'ATR_{self.atr_window}'] = self._atr(compacted, high, low, valid)
+
+        return {name: pd.DataFrame(_scatter(result, order), index=index, columns=self.columns)
+                for name, result in indicators.items()}
+
+
+def technical_indicators(close, high=None, low=None, **windows):
+    """
+    Indicators of a whole wide price history, see `IndicatorEngine`.
+
+    Args:
+        close (DataFrame): Closes by date (rows) and ticker (columns)
+        high (DataFrame): Highs shaped like `close`, needed for the ATR
+        low (DataFrame): Lows shaped like `close`, needed for the ATR
+        **windows: Window arguments of `IndicatorEngine`
+
+    Returns:
+        dict: Indicator name -> DataFrame shaped like `close`
+    """
+    return IndicatorEngine(**windows).update(close, high, low)
@@ -0,0 +1,377 @@
+import json
+import logging
+import os
+import threading
+from datetime import timedelta
+
+import pandas as pd
+
+from utils.b3_calendar import MARKET_TZ, b3_calendar
+from utils.helpers import ensure_dir
+from utils.history_store import HistoryStore, write_atomic
+from utils.timing import frame_fields, span
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(CURRENT_DIR, '../../local_storage/ohlcv')
+
+INTRADAY_INTERVALS = {'1m', '2m', '5m', '15m', '30m', '60m', '90m', '1h'}
+
+# Intervals with at least one bar in every session, so a session without bars is a gap
+SESSION_INTERVALS = INTRADAY_INTERVALS | {'1d'}
+
+# How long a bar that is still forming may be served from disk while the market is open
+STALENESS_RULES = {
+    '1m': timedelta(minutes=1),
+    '2m': timedelta(minutes=1),
+    '5m': timedelta(minutes=2),
+    '15m': timedelta(minutes=5),
+    '30m': timedelta(minutes=5),
+    '60m': timedelta(minutes=10),
+    '90m': timedelta(minutes=10),
+    '1h': timedelta(minutes=10),
+    '1d': timedelta(minutes=15),
+    '5d': timedelta(minutes=30),
+    '1wk': timedelta(minutes=30),
+    '1mo': timedelta(hours=1),
+    '3mo': timedelta(hours=1),
+}
+
+# Calendar lookback used to turn a yfinance period into a start date
+PERIOD_DAYS = {
+    '1d': 1,
+    '5d': 5,
+    '1mo': 30,
+    '3mo': 90,
+    '6mo': 180,
+    '1y': 365,
+    '5y': 365 * 5,
+    # Using a reasonably long period - adjust if needed
+    'max': 365 * 20,
+}
+
+# Periods that yfinance counts in trading sessions rather than calendar days
+SESSION_PERIODS = {'1d': 1, '5d': 5}
+
+
+def is_stale(interval, fetched_until, now=None):
+    """
+    Check whether data fetched up to `fetched_until` needs its tail refreshed.
+
+    While the market is open the latest bar is still forming, so the tail expires
+    after the interval's entry in STALENESS_RULES. Outside trading hours (including
+    B3 holidays) the data is final once it was fetched after the last session close.
+
+    Args:
+        interval (str): yfinance interval, e.g. '5m' or '1d'
+        fetched_until (Timestamp): Time the cached data was last extended to
+        now (Timestamp): Current time, defaults to now in the market timezone
+
+    Returns:
+        bool: True if the tail must be downloaded again
+    """
+    now = pd.Timestamp.now(tz=MARKET_TZ) if now is None else now.tz_convert(MARKET_TZ)
+    fetched_until = fetched_until.tz_convert(MARKET_TZ)
+
+    if b3_calendar.is_open(now):
+        ttl = STALENESS_RULES.get(interval, timedelta(minutes=15))
+        return now - fetched_until > ttl
+    return fetched_until < b3_calendar.last_close(now)
+
+
+def period_window(period, now=None):
+    """
+    Convert a yfinance period into an explicit (start, end) window in UTC.
+
+    Session based periods ('1d', '5d') start at the midnight before the Nth most
+    recent B3 session, so weekends and holidays are skipped exactly.
+
+    Args:
+        period (str): yfinance period, e.g. '5d' or '1y'
+        now (Timestamp): End of the window, defaults to now
+
+    Returns:
+        tuple: (start, end) timestamps
+    """
+    end = pd.Timestamp.now(tz='UTC') if now is None else now.tz_convert('UTC')
+    if period in SESSION_PERIODS:
+        first_session = b3_calendar.recent_sessions(end, SESSION_PERIODS[period])[0]
+        return pd.Timestamp(first_session).tz_localize(MARKET_TZ).tz_convert('UTC'), end
+    return end - pd.Timedelta(days=PERIOD_DAYS[period]), end
+
+
+def trim_to_period(data, period):
+    """
+    Keep only the last N trading sessions for session based periods.
+    """
+    sessions = SESSION_PERIODS.get(period)
+    if sessions is None or data.empty:
+        return data
+    session_dates = data.index.tz_convert(MARKET_TZ).normalize()
+    keep = session_dates.unique().sort_values()[-sessions:]
+    return data[session_dates.isin(keep)]
+
+
+def to_multi_level(frames, interval):
+    """
+    Assemble per-ticker OHLCV frames into the (Price, Ticker) column layout
+    returned by `yf.download(..., multi_level_index=True)`.
+
+    Args:
+        frames (dict): Mapping of ticker to OHLCV DataFrame
+        interval (str): Interval of the bars, used to name the index
+
+    Returns:
+        DataFrame: Multi-level OHLCV data, empty if no ticker has data
+    """
+    frames = {ticker: frame for ticker, frame in frames.items() if not frame.empty}
+    if not frames:
+        return pd.DataFrame()
+
+    data = pd.concat(frames, axis=1).swaplevel(0, 1, axis=1).sort_index(axis=1, level=0)
+    data.columns.names = ['Price', 'Ticker']
+    data.index.name = 'Datetime' if interval in INTRADAY_INTERVALS else 'Date'
+    return data
+
+
+class OHLCVCache:
+    """
+    Persistent per-(ticker, interval) OHLCV store backed by memory-mapped bar files
+    (see `HistoryStore`) plus a small JSON file with the fetched window.
+
+    Reads are served from disk first; only the missing head or a stale tail of the
+    requested window is downloaded and appended to the stored bars. The requested
+    window is cut out of the mapped file by binary search, so a 'max' history is
+    never loaded whole just to serve a short range. Sessions after the last stored
+    bar that came back without bars (unlike weekends and holidays) are retried.
+
+    Reads of the same (ticker, interval) are serialized, so concurrent requests
+    with identical or overlapping windows share one download: later callers wait
+    for it, then find those bars on disk and only download what is still missing.
+    Across processes, the bars and metadata are loaded and updated under the
+    store's file lock, so the metadata never claims a window the bars don't hold.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.store = HistoryStore(cache_dir)
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self._stats = {
+                'hits': 0,
+                'partial_hits': 0,
+                'misses': 0,
+                'coalesced': 0,
+                'closed_gaps': 0,
+                'session_gaps': 0,
+                'bytes_read': 0,
+                'bytes_written': 0,
+            }
+
+    def stats(self):
+        """
+        Return a copy of the hit/miss and I/O counters.
+        """
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def _count(self, key, amount=1):
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    def _lock_for(self, key):
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _meta_path(self, ticker, interval):
+        name = f"{ticker.replace('/', '_')}_{interval}"
+        return os.path.join(self.cache_dir, f'{name}.json')
+
+    def _load(self, ticker, interval):
+        meta_path = self._meta_path(ticker, interval)
+        if not os.path.exists(meta_path):
+            return None, None
+        try:
+            history = self.store.open(ticker, interval)
+            with open(meta_path) as f:
+                meta = json.load(f)
+        except Exception as e:
+            logging.warning(f"Discarding unreadable cache for {ticker} {interval}: {e}")
+            return None, None
+        if history is None:
+            return None, None
+
+        meta = {key: pd.Timestamp(value) for key, value in meta.items()}
+        return history, meta
+
+    def _save(self, ticker, interval, data, meta):
+        ensure_dir(self.cache_dir)
+        meta_path = self._meta_path(ticker, interval)
+
+        # Bars first: a window in the metadata is only ever claimed once its bars are stored
+        self._count('bytes_written', self.store.write(ticker, interval, data))
+        payload = json.dumps({key: value.isoformat() for key, value in meta.items()}).encode()
+        write_atomic(meta_path, lambda f: f.write(payload))
+
+    def history(self, ticker, interval, start=None, end=None):
+        """
+        Stored bars of a (ticker, interval) in [start, end) as memory-mapped views,
+        without downloading anything.
+
+        Returns:
+            TickerHistory: The stored range, or None if nothing is stored
+        """
+        history = self.store.open(ticker, interval)
+        if history is None:
+            return None
+        history = history.slice(start, end)
+        self._count('bytes_read', history.nbytes)
+        return history
+
+    def _tail_gap(self, cached, interval, until, age):
+        """
+        Check whether sessions after the last stored bar, up to `until`, have no bars.
+
+        Weekends and holidays are not gaps. A fetch that came back short (e.g. the
+        day's bar was not published yet at the close) is retried once the tail is
+        older than the interval's staleness rule, so a ticker that really did not
+        trade is not downloaded again on every read.
+        """
+        if interval not in SESSION_INTERVALS or cached.empty or age <= STALENESS_RULES[interval]:
+            return False
+        last_bar = pd.DatetimeIndex(cached.timestamps[-1:], tz='UTC')
+        last_session = b3_calendar.recent_sessions(until, 1)
+        return len(last_session) > 0 and len(b3_calendar.missing_sessions(last_bar, last_bar[0], last_session[-1])) > 0
+
+    def read(self, ticker, interval, start, end, download):
+        """
+        Return OHLCV bars for a ticker in [start, end), downloading only what is missing.
+
+        Args:
+            ticker (str): Ticker symbol
+            interval (str): yfinance interval
+            start (Timestamp): Window start (tz-aware)
+            end (Timestamp): Window end (tz-aware)
+            download (callable): download(ticker, start, end, interval) -> DataFrame
+
+        Returns:
+            DataFrame: OHLCV bars indexed by UTC timestamps. The price columns are
+            views of the stored file, see `read_view`
+        """
+        window = self.read_view(ticker, interval, start, end, download)
+        return pd.DataFrame() if window.empty else window.to_frame()
+
+    def read_view(self, ticker, interval, start, end, download):
+        """
+        Return OHLCV bars for a ticker in [start, end) as memory-mapped views,
+        downloading only what is missing.
+
+        Nothing is copied: the bars are paged in from the stored file when used.
+        The store keeps at most MAX_OPEN_MAPPINGS files mapped, but a file stays
+        mapped (and its descriptor open) while a view of it is alive, so callers
+        reading many tickers should reduce or copy each one before the next.
+
+        Args:
+            ticker (str): Ticker symbol
+            interval (str): yfinance interval
+            start (Timestamp): Window start (tz-aware)
+            end (Timestamp): Window end (tz-aware)
+            download (callable): download(ticker, start, end, interval) -> DataFrame
+
+        Returns:
+            TickerHistory: The stored bars of the window
+        """
+        start, end = start.tz_convert('UTC'), end.tz_convert('UTC')
+        now = pd.Timestamp.now(tz='UTC')
+
+        with span('ohlcv_read', ticker=ticker, interval=interval) as read_span:
+            lock = self._lock_for((ticker, interval))
+            if not lock.acquire(blocking=False):
+                # Another request for this ticker is in flight, wait for its bars
+                self._count('coalesced')
+                lock.acquire()
+            try:
+                # Other processes sharing the cache directory load and update a
+                # ticker's bars and metadata under its file lock
+                with self.store.lock(ticker, interval):
+                    cached, meta = self._load(ticker, interval)
+
+                    missing = []
+                    if cached is None:
+                        missing.append((start, end))
+                    else:
+                        if start < meta['start']:
+                            # A head without any session (weekend, holiday) has no bars to download
+                            if b3_calendar.session_count(start, meta['start'] - pd.Timedelta(1, 'ns')):
+                                missing.append((start, meta['start']))
+                            else:
+                                self._count('closed_gaps')
+                        tail_start = pd.Timestamp(cached.timestamps[-1], tz='UTC') if not cached.empty else meta['end']
+                        if end > meta['end'] and is_stale(interval, meta['end']):
+                            # Refetch from the last stored bar, it may still have been forming
+                            missing.append((tail_start, end))
+                        elif self._tail_gap(cached, interval, min(end, meta['end']), now - meta['end']):
+                            # The provider had not published these sessions yet, retry them
+                            self._count('session_gaps')
+                            missing.append((tail_start, end))
+
+                    if not missing:
+                        self._count('hits')
+                        read_span.set(cache='hit')
+                    else:
+                        self._count('misses' if cached is None else 'partial_hits')
+                        read_span.set(cache='miss' if cached is None else 'partial')
+                        chunks = [cached.to_frame()] if cached is not None else []
+                        for chunk_start, chunk_end in missing:
+                            with span('download', ticker=ticker, interval=interval) as download_span:
+                                chunk = _normalize(download(ticker, chunk_start, chunk_end, interval))
+                                download_span.set(**frame_fields(chunk))
+                            chunks.append(chunk)
+
+                        chunks = [chunk for chunk in chunks if not chunk.empty]
+                        if chunks:
+                            merged = pd.concat(chunks).sort_index()
+                            # Newer downloads win, they replace bars that were still forming
+                            merged = merged[~merged.index.duplicated(keep='last')]
+                        else:
+                            merged = pd.DataFrame()
+
+                        meta = {
+                            'start': min(start, meta['start']) if meta else start,
+                            'end': max(min(end, now), meta['end']) if meta else min(end, now),
+                        }
+                        self._save(ticker, interval, merged, meta)
+                        cached = self.store.open(ticker, interval)
+            finally:
+                lock.release()
+
+            window = cached.slice(start, end)
+            self._count('bytes_read', window.nbytes)
+            read_span.set(rows=len(window), bytes=window.nbytes)
+        return window
+
+
+def _normalize(data):
+    """
+    Bring a single ticker yfinance download to flat OHLCV columns and a UTC index.
+    """
+    if data is None or data.empty:
+        return pd.DataFrame()
+    if isinstance(data.columns, pd.MultiIndex):
+        data = data.droplevel(1, axis=1)
+    data = data.copy()
+    data.index = pd.DatetimeIndex(data.index)
+    if data.index.tz is None:
+        data.index = data.index.tz_localize('UTC')
+    else:
+        data.index = data.index.tz_convert('UTC')
+    data.index.name = None
+    return data
+
+
+# Process-wide cache shared by all pages
+ohlcv_cache = OHLCVCache()
@@ -0,0 +1,249 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Opt-in compact in-memory representation of price frames, see compact_price_frame
+COMPACT_MODE = os.environ.get('STOCK_ANALYSIS_COMPACT', '0') == '1'
+
+PRICE_COLUMNS = ['Abertura', 'Máxima', 'Mínima', 'Fechamento', 'Open', 'High', 'Low', 'Close']
+
+DISPLAY_DATE_FORMAT = '%d/%m/%Y %H:%M'
+
+# Rows per page of the history table
+HISTORY_PAGE_SIZE = 500
+
+HISTORY_COLUMNS = ['Ticker', 'Abertura', 'Máxima', 'Mínima', 'Fechamento', 'Volume']
+
+
+def to_returns(prices):
+    """
+    Simple returns of a wide (date x ticker) price frame, each taken against the
+    ticker's previous valid price, so tickers with missing days behave like their
+    own series.
+    """
+    return prices / prices.ffill().shift(1) - 1
+
+
+# Flatten the data to a single DataFrame
+def flatten_data(data, tickers=None):
+    """
+    Reshape (Price, Ticker) columns into a long frame with one row per
+    (ticker, timestamp), in a single reshape instead of one copy per ticker.
+
+    Rows are grouped by ticker in the order of the column levels. Columns shared
+    by all tickers (an empty ticker level, like the 'Datetime' column added by
+    process_data) are repeated on every ticker's rows.
+
+    Args:
+        data (DataFrame): Downloaded or processed price data
+        tickers (list): Selected tickers, used to label single ticker data
+
+    Returns:
+        DataFrame: Long format data with a categorical 'Ticker' column
+    """
+    # If not a multi-index, assume it's a single ticker
+    if not isinstance(data.columns, pd.MultiIndex):
+        if 'Ticker' not in data.columns and tickers and len(tickers) > 0:
+            data['Ticker'] = pd.Categorical([tickers[0]] * len(data))
+        return data
+
+    ticker_level = data.columns.get_level_values(1)
+    shared_columns = data.columns[ticker_level == '']
+    price_columns = data.columns[ticker_level != '']
+
+    # If there's only one ticker, it might not have a multi-level structure
+    if len(price_columns) == 0:
+        if tickers and len(tickers) > 0:
+            data['Ticker'] = tickers[0]
+        return data
+
+    # Fields and tickers in the order of the column levels
+    used = price_columns.remove_unused_levels()
+    fields = list(dict.fromkeys(used.get_level_values(0)))
+    ticker_names = [ticker for ticker in used.levels[1]]
+
+    index = data.index
+    # Ensure the index is timezone-aware
+    if isinstance(index, pd.DatetimeIndex) and index.tz is None:
+        index = index.tz_localize('UTC')
+
+    num_rows, num_tickers = len(data), len(ticker_names)
+    positions = np.tile(np.arange(num_rows), num_tickers)
+    columns = {}
+    for column in shared_columns:
+        # take() on the array keeps extension dtypes such as tz-aware datetimes
+        columns[column[0]] = data[column].array.take(positions)
+
+    # One (rows x tickers) block per field, read column by column gives ticker-major order
+    full_grid = pd.MultiIndex.from_product([fields, ticker_names])
+    prices = data[price_columns]
+    if not price_columns.equals(full_grid):
+        prices = prices.reindex(columns=full_grid)
+    for field in fields:
+        columns[field] = prices[field].to_numpy().ravel(order='F')
+
+    columns['Ticker'] = pd.Categorical.from_codes(
+        np.repeat(np.arange(num_tickers), num_rows), categories=ticker_names
+    )
+    flattened = pd.DataFrame(columns, index=index[positions])
+    flattened.columns.name = data.columns.names[0]
+    return flattened
+
+
+# Column names shown on the pages
+COLUMN_LABELS = {
+    'Open': 'Abertura',
+    'High': 'Máxima',
+    'Low': 'Mínima',
+    'Close': 'Fechamento',
+    'Volume': 'Volume',
+}
+
+
+# Process data to ensure it is timezone-aware and has the correct format
+def process_data(data):
+    """
+    Convert downloaded data to Sao Paulo time, move the index into a
+    'Datetime'/'Date' column and label the price fields in Portuguese.
+
+    The input is left untouched, and no display strings are built here: dates
+    are formatted at render time with `display_dates`, only for the rows shown.
+
+    Args:
+        data (DataFrame): Downloaded price data
+
+    Returns:
+        DataFrame: Processed copy of the data
+    """
+    index = data.index
+    # Check if the index is timezone-naive and localize if needed
+    if index.tz is None:
+        index = index.tz_localize('UTC')
+
+    # Now convert to Sao Paulo timezone
+    processed = data.set_axis(index.tz_convert('America/Sao_Paulo'), axis=0)
+    processed = processed.reset_index()
+    return processed.rename(columns=COLUMN_LABELS, level=0 if isinstance(processed.columns, pd.MultiIndex) else None)
+
+
+# Calculate basic metrics from the stock data
+def calculate_metrics(data, ticker=None):
+    # Memory-mapped history views (see OHLCVCache.read_view) are reduced without building a frame
+    if not isinstance(data, pd.DataFrame):
+        return data.metrics()
+
+    # If a ticker is specified, filter the data for that ticker
+    if ticker and 'Ticker' in data.columns:
+        data = data[data['Ticker'] == ticker]
+
+    # Reduce the column arrays directly, the same way as over memory-mapped history views
+    return range_metrics(data['Fechamento'].to_numpy(), data['Máxima'].to_numpy(),
+                         data['Mínima'].to_numpy(), data['Volume'].to_numpy())
+
+
+def range_metrics(close, high, low, volume):
+    """
+    Last close, change, percentage change, high, low and volume of a range of
+    bars, from plain arrays or memory-mapped views (see `TickerHistory.metrics`).
+    """
+    last_close = close[-1]
+    prev_close = close[0]
+    change = last_close - prev_close
+    pct_change = (change / prev_close) * 100
+    return last_close, change, pct_change, np.nanmax(high), np.nanmin(low), np.nansum(volume)
+
+
+def concat_flattened(frames, tickers):
+    """
+    Concatenate per-ticker flattened frames in the order of `tickers`, keeping
+    'Ticker' categorical across frames with different categories.
+
+    Args:
+        frames (dict): Ticker -> output of flatten_data
+        tickers (list): Ticker order of the result
+
+    Returns:
+        DataFrame: Long format data of every ticker with data
+    """
+    parts = [frames[ticker] for ticker in tickers if ticker in frames and not frames[ticker].empty]
+    if not parts:
+        return pd.DataFrame()
+    data = pd.concat(parts)
+    data['Ticker'] = pd.Categorical(np.asarray(data['Ticker']), categories=[ticker for ticker in tickers if ticker in frames])
+    return data
+
+
+def compact_price_frame(data):
+    """
+    Shrink a flattened price frame: prices as float32, volume downcast to the
+    smallest integer type and a categorical 'Ticker'. Display dates are derived
+    when rendering with `display_dates`.
+
+    Args:
+        data (DataFrame): Output of flatten_data
+
+    Returns:
+        DataFrame: Compact copy of the data
+    """
+    # Columns are replaced, never written in place, so the data is not copied up front
+    compact = data.copy(deep=False)
+    for column in PRICE_COLUMNS:
+        if column in compact.columns:
+            compact[column] = compact[column].astype(np.float32)
+
+    # Volumes with missing values can't be stored as integers, keep them as they are
+    if 'Volume' in compact.columns and not compact['Volume'].isna().any():
+        compact['Volume'] = pd.to_numeric(compact['Volume'], downcast='unsigned' if (compact['Volume'] >= 0).all() else 'integer')
+
+    if 'Ticker' in compact.columns and not isinstance(compact['Ticker'].dtype, pd.CategoricalDtype):
+        compact['Ticker'] = compact['Ticker'].astype('category')
+    return compact
+
+
+def display_dates(data, date_format=DISPLAY_DATE_FORMAT):
+    """
+    Format the timestamps of a price frame for display, from its 'Datetime' or
+    'Date' column or from its index.
+
+    Args:
+        data (DataFrame): Price data, usually only the rows being shown
+        date_format (str): strftime format
+
+    Returns:
+        Index: Formatted date strings, aligned with the rows of `data`
+    """
+    for column in ('Datetime', 'Date'):
+        if column in data.columns:
+            return pd.DatetimeIndex(data[column]).strftime(date_format)
+    return pd.DatetimeIndex(data.index).strftime(date_format)
+
+
+def history_page_count(num_rows, page_size=HISTORY_PAGE_SIZE):
+    """
+    Number of pages of the history table, at least one.
+    """
+    return max(1, -(-num_rows // page_size))
+
+
+def history_page(data, page, page_size=HISTORY_PAGE_SIZE, date_format=DISPLAY_DATE_FORMAT):
+    """
+    One page of the history table, in the row order of the data. Only the rows of the page
+    are sliced and get their dates formatted, so long intraday or 'max'
+    histories are never formatted or sent to the browser in full.
+
+    Args:
+        data (DataFrame): Flattened price data
+        page (int): Page number, starting at 1
+        page_size (int): Rows per page
+        date_format (str): strftime format of the 'Data' column
+
+    Returns:
+        DataFrame: 'Data' followed by the available history columns
+    """
+    page = min(max(int(page), 1), history_page_count(len(data), page_size))
+    rows = data.iloc[(page - 1) * page_size:page * page_size]
+
+    history = rows[[column for column in HISTORY_COLUMNS if column in rows.columns]].reset_index(drop=True)
+    history.insert(0, 'Data', np.asarray(display_dates(rows)))
+    return history
@@ -0,0 +1,276 @@
+import os
+import threading
+import time
+import zlib
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from utils.fetch_planner import PROVIDER_LIMITS
+from utils.history_store import HistoryStore
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+# Screener and sector responses replayed by the local provider by default
+UNIVERSE_PATH = os.path.join(CURRENT_DIR, '../data/all_tickers_sectors.csv')
+
+# Market-data backend used by the pages and scripts: 'yfinance' or 'local'
+PROVIDER_NAME = os.environ.get('STOCK_ANALYSIS_PROVIDER', 'yfinance')
+
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+MARKET_TZ = 'America/Sao_Paulo'
+
+# Bar frequencies of the synthetic history, intraday bars fall in B3 trading hours
+FREQUENCIES = {
+    '1m': '1min', '2m': '2min', '5m': '5min', '15m': '15min', '30m': '30min',
+    '60m': '60min', '90m': '90min', '1h': '60min',
+    '1d': 'B', '5d': '5B', '1wk': 'W-MON', '1mo': 'MS', '3mo': 'QS',
+}
+
+
+class ProviderError(Exception):
+    """
+    A failed provider request, raised by the local provider's error injection.
+    """
+
+
+class MarketDataProvider:
+    """
+    Interface of a market-data backend: OHLCV history, the exchange screener
+    and per-ticker info.
+    """
+
+    def history(self, ticker, start, end, interval):
+        """
+        Return OHLCV bars of a ticker in [start, end).
+
+        Args:
+            ticker (str): Ticker symbol
+            start (Timestamp): Window start
+            end (Timestamp): Window end
+            interval (str): yfinance interval, e.g. '5m' or '1d'
+
+        Returns:
+            DataFrame: 'Open', 'High', 'Low', 'Close' and 'Volume' on a tz-aware index
+        """
+        raise NotImplementedError
+
+    def screen(self, exchange, size, offset):
+        """
+        Return one page of the exchange's tickers.
+
+        Args:
+            exchange (str): Exchange code, e.g. 'SAO'
+            size (int): Page size
+            offset (int): Position of the first ticker of the page
+
+        Returns:
+            dict: Screener response with a 'quotes' list of {'symbol': ...} dicts
+        """
+        raise NotImplementedError
+
+    def get_info(self, ticker):
+        """
+        Return the info dict of a ticker, including its 'sector' when known.
+        """
+        raise NotImplementedError
+
+
+class YFinanceProvider(MarketDataProvider):
+    """
+    Yahoo Finance through yfinance.
+    """
+
+    def __init__(self):
+        # Imported here so the local provider works without yfinance installed
+        import yfinance as yf
+        self.yf = yf
+
+    def history(self, ticker, start, end, interval):
+        # Ticker.history is used instead of yf.download, which shares global state between threads
+        data = self.yf.Ticker(ticker).history(start=start, end=end, interval=interval)
+        return data[OHLCV_COLUMNS] if not data.empty else data
+
+    def screen(self, exchange, size, offset):
+        query = self.yf.EquityQuery('is-in', ['exchange', exchange])
+        # Sorted by symbol so pages are stable between calls, a ticker can't move
+        # to a page already read the way it can with a sort on price change
+        return self.yf.screen(query, sortField='ticker', sortAsc=True, size=size, offset=offset)
+
+    def get_info(self, ticker):
+        return self.yf.Ticker(ticker).get_info()
+
+
+def _uniform(seed, keys):
+    """
+    Deterministic uniform [0, 1) values for integer keys (splitmix64), so the
+    same bar gets the same price whichever window it is requested in.
+    """
+    with np.errstate(over='ignore'):
+        z = keys.astype(np.uint64) + np.uint64(seed) * np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        z = z ^ (z >> np.uint64(31))
+    return (z >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+
+
+class LocalProvider(MarketDataProvider):
+    """
+    Deterministic offline backend for load tests and benchmarks.
+
+    History is replayed from `{ticker}_{interval}.parquet` recordings or from
+    the memory-mapped files of the OHLCV cache (see `HistoryStore`) in
+    `replay_dir`, so a copy of the cache can be used as a recording, and is
+    synthesized otherwise. Screener pages and sectors are replayed from a
+    ticker/sector CSV. Every call can be slowed down by a fixed latency and made
+    to fail with `error_rate`; failures depend only on the call and how many
+    times it was made, so retries behave the same on every run.
+    """
+
+    def __init__(self, replay_dir=None, universe_path=UNIVERSE_PATH, latency=0.0, error_rate=0.0,
+                 seed=0, limits=PROVIDER_LIMITS):
+        self.replay_dir = replay_dir
+        self.universe_path = universe_path
+        self.latency = latency
+        self.error_rate = error_rate
+        self.seed = seed
+        self.limits = limits
+        self.calls = Counter()
+        self._attempts = Counter()
+        self._lock = threading.Lock()
+        self._universe = None
+        self._replay_store = HistoryStore(replay_dir) if replay_dir else None
+
+    def _call(self, method, *args):
+        """
+        Count a call, wait for the latency and raise an injected error if it is due.
+        """
+        key = (method,) + tuple(str(arg) for arg in args)
+        with self._lock:
+            self.calls[method] += 1
+            attempt = self._attempts[key]
+            self._attempts[key] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.error_rate:
+            draw = zlib.crc32(f'{self.seed}:{key}:{attempt}'.encode()) / 2**32
+            if draw < self.error_rate:
+                raise ProviderError(f"Injected error in {method}{args}")
+
+    def universe(self):
+        """
+        Tickers and sectors replayed by screen and get_info, loaded once.
+        """
+        if self._universe is None:
+            self._universe = pd.read_csv(self.universe_path, usecols=['ticker', 'sector'])
+        return self._universe
+
+    def history(self, ticker, start, end, interval):
+        self._call('history', ticker, start, end, interval)
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        start = start.tz_localize('UTC') if start.tz is None else start.tz_convert('UTC')
+        end = end.tz_localize('UTC') if end.tz is None else end.tz_convert('UTC')
+
+        # Like Yahoo, intraday requests longer than the interval's limit are rejected
+        limit = self.limits.get(interval)
+        if limit is not None and end - start > limit + pd.Timedelta(days=1):
+            raise ProviderError(f"{interval} data is limited to {limit.days} days per request")
+
+        if self.replay_dir:
+            path = os.path.join(self.replay_dir, f"{ticker.replace('/', '_')}_{interval}.parquet")
+            if os.path.exists(path):
+                data = pd.read_parquet(path)
+                return data[(data.index >= start) & (data.index < end)]
+            recorded = self._replay_store.read(ticker, interval, start, end)
+            if recorded is not None:
+                return recorded
+        return self._synthetic_history(ticker, start, end, interval)
+
+    def _synthetic_history(self, ticker, start, end, interval):
+        freq = FREQUENCIES[interval]
+        intraday = freq.endswith('min')
+        if intraday:
+            index = pd.date_range(start.floor('D'), end, freq=freq, tz='UTC')
+            local = index.tz_convert(MARKET_TZ)
+            minutes = local.hour * 60 + local.minute
+            index = index[(local.dayofweek < 5) & (minutes >= 10 * 60) & (minutes < 17 * 60)]
+        else:
+            index = pd.date_range(start.tz_convert(MARKET_TZ).normalize(), end.tz_convert(MARKET_TZ), freq=freq)
+            index = index.tz_convert('UTC')
+        index = index[(index >= start) & (index < end)]
+        if len(index) == 0:
+            return pd.DataFrame(columns=OHLCV_COLUMNS, index=pd.DatetimeIndex([], tz='UTC'))
+
+        # Price is a smooth function of time plus per-bar noise, both keyed on the ticker
+        ticker_seed = zlib.crc32(ticker.encode()) ^ self.seed
+        seconds = index.asi8 // 10**9
+        days = seconds / 86400.0
+        base = 10 + (ticker_seed % 9000) / 100
+        phase = (ticker_seed % 628) / 100
+        noise = _uniform(ticker_seed, seconds)
+        close = base * (1 + 0.25 * np.sin(days / 180 + phase) + 0.02 * (noise - 0.5))
+        spread = close * 0.01 * _uniform(ticker_seed + 1, seconds)
+        open_ = close * (1 + 0.005 * (_uniform(ticker_seed + 2, seconds) - 0.5))
+        return pd.DataFrame({
+            'Open': open_,
+            'High': np.maximum(open_, close) + spread,
+            'Low': np.minimum(open_, close) - spread,
+            'Close': close,
+            'Volume': (_uniform(ticker_seed + 3, seconds) * 1_000_000).astype(np.int64),
+        }, index=index)
+
+    def screen(self, exchange, size, offset):
+        self._call('screen', exchange, size, offset)
+        page = self.universe().iloc[offset:offset + size]
+        return {'quotes': [{'symbol': symbol, 'exchange': exchange} for symbol in page['ticker']]}
+
+    def get_info(self, ticker):
+        self._call('get_info', ticker)
+        universe = self.universe()
+        sectors = universe.loc[universe['ticker'] == ticker, 'sector']
+        if sectors.empty or pd.isna(sectors.iloc[0]) or sectors.iloc[0] == 'Unknown':
+            return {'symbol': ticker}
+        return {'symbol': ticker, 'sector': sectors.iloc[0]}
+
+
+def make_provider(name=PROVIDER_NAME):
+    """
+    Build a provider by name. The local provider reads its options from
+    STOCK_ANALYSIS_PROVIDER_LATENCY (seconds), STOCK_ANALYSIS_PROVIDER_ERROR_RATE
+    and STOCK_ANALYSIS_PROVIDER_REPLAY_DIR.
+    """
+    if name == 'yfinance':
+        return YFinanceProvider()
+    if name == 'local':
+        return LocalProvider(
+            replay_dir=os.environ.get('STOCK_ANALYSIS_PROVIDER_REPLAY_DIR'),
+            latency=float(os.environ.get('STOCK_ANALYSIS_PROVIDER_LATENCY', '0')),
+            error_rate=float(os.environ.get('STOCK_ANALYSIS_PROVIDER_ERROR_RATE', '0')),
+        )
+    raise ValueError(f"Unknown market-data provider: {name}")
+
+
+# Process-wide provider shared by all pages and scripts
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_provider():
+    """
+    Return the process-wide provider, built on first use from STOCK_ANALYSIS_PROVIDER.
+    """
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            _provider = make_provider()
+        return _provider
+
+
+def set_provider(provider):
+    """
+    Replace the process-wide provider, e.g. with a LocalProvider in benchmarks.
+    """
+    global _provider
+    with _provider_lock:
+        _provider = provider
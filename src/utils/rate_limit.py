@@ -0,0 +1,59 @@
+import logging
+import random
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket shared by all workers hitting the same provider.
+
+    Tokens refill continuously at `rate` per second up to `capacity`; each request
+    takes one token and waits when the bucket is empty.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """
+        Block until `tokens` are available and take them.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def retry_with_backoff(func, retries=3, base_delay=1.0, max_delay=30.0):
+    """
+    Call `func` and retry on any exception with exponential backoff and jitter.
+
+    Args:
+        func (callable): Function without arguments to call
+        retries (int): Number of retries after the first attempt
+        base_delay (float): Delay before the first retry, in seconds
+        max_delay (float): Upper bound for a single delay, in seconds
+
+    Returns:
+        The return value of `func`; the last exception is raised when all attempts fail
+    """
+    for attempt in range(retries + 1):
+        try:
+            return func()
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = min(max_delay, base_delay * 2 ** attempt) * random.uniform(0.5, 1.0)
+            logging.warning(f"Attempt {attempt + 1} failed ({e}), retrying in {delay:.1f}s")
+            time.sleep(delay)
@@ -0,0 +1,169 @@
+import numpy as np
+import pandas as pd
+
+from utils.b3_calendar import MARKET_TZ, b3_calendar
+from utils.ohlcv_cache import INTRADAY_INTERVALS, ohlcv_cache
+from utils.timing import frame_fields, span
+
+# Finer cached interval each coarse interval is built from
+RESAMPLE_SOURCES = {
+    '30m': '5m',
+    '60m': '5m',
+    '1h': '5m',
+    '1wk': '1d',
+    '1mo': '1d',
+    '3mo': '1d',
+}
+
+# How far back Yahoo serves a source interval; older ranges are downloaded at the coarse interval
+SOURCE_LOOKBACK = {'5m': pd.Timedelta(days=60)}
+
+# Bucket of each coarse interval: a floor in market time for intraday bars, a calendar period for daily ones
+BUCKETS = {
+    '30m': '30min',
+    '60m': '60min',
+    '1h': '60min',
+    '1wk': 'W-SUN',
+    '1mo': 'M',
+    '3mo': 'Q',
+}
+
+# How each column of a bucket is aggregated; other columns keep their last value
+AGGREGATIONS = {
+    'Open': 'first',
+    'High': 'max',
+    'Low': 'min',
+    'Close': 'last',
+    'Adj Close': 'last',
+    'Volume': 'sum',
+    'Dividends': 'sum',
+    'Stock Splits': 'max',
+}
+
+
+def _bucket_keys(index, interval):
+    """
+    Integer bucket of each bar, and the label of each bucket start.
+    """
+    local = index.tz_convert(MARKET_TZ)
+    if interval in INTRADAY_INTERVALS:
+        # Sessions open on the hour, so wall-clock buckets never straddle two sessions
+        floored = local.floor(BUCKETS[interval])
+        return floored.asi8, floored.tz_convert('UTC')
+    # Weekly and longer bars are labelled with their first session
+    return local.tz_localize(None).to_period(BUCKETS[interval]).asi8, index
+
+
+def resample_bars(data, interval):
+    """
+    Aggregate sorted OHLCV bars into a coarser interval in one vectorized pass.
+
+    Intraday buckets are aligned to the session open in market time, so a bar
+    never mixes two sessions. Weekly, monthly and quarterly buckets follow the
+    calendar and are labelled with the first B3 session they contain.
+
+    Args:
+        data (DataFrame): Flat OHLCV bars of one ticker, sorted by a UTC index
+        interval (str): Target interval, a key of BUCKETS
+
+    Returns:
+        DataFrame: One row per bucket, with the same columns
+    """
+    if data.empty:
+        return data
+    data = data.dropna(how='all', subset=[column for column in ('Open', 'High', 'Low', 'Close') if column in data.columns])
+    if data.empty:
+        return data
+
+    keys, labels = _bucket_keys(data.index, interval)
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    ends = np.r_[starts[1:], len(keys)] - 1
+
+    columns = {}
+    for column in data.columns:
+        values = data[column].to_numpy()
+        how = AGGREGATIONS.get(column, 'last')
+        if how == 'first':
+            columns[column] = values[starts]
+        elif how == 'last':
+            columns[column] = values[ends]
+        elif how == 'max':
+            columns[column] = np.fmax.reduceat(values, starts)
+        elif how == 'min':
+            columns[column] = np.fmin.reduceat(values, starts)
+        else:
+            columns[column] = np.add.reduceat(np.nan_to_num(values), starts)
+    return pd.DataFrame(columns, index=labels[starts])
+
+
+def bucket_start(timestamp, interval):
+    """
+    Start of the bucket of an interval containing `timestamp`, in UTC.
+    """
+    local = timestamp.tz_convert(MARKET_TZ)
+    if interval in INTRADAY_INTERVALS:
+        return local.floor(BUCKETS[interval]).tz_convert('UTC')
+    period = pd.Period(local.tz_localize(None), BUCKETS[interval])
+    return period.start_time.tz_localize(MARKET_TZ).tz_convert('UTC')
+
+
+def source_coverage(source, now=None):
+    """
+    First session open from which the provider still serves a source interval,
+    or None when its history is not limited.
+    """
+    lookback = SOURCE_LOOKBACK.get(source)
+    if lookback is None:
+        return None
+    now = pd.Timestamp.now(tz='UTC') if now is None else now
+    # One day of margin, Yahoo counts the limit back from the moment of the request
+    first_session = b3_calendar.next_session(now - lookback + pd.Timedelta(days=1))
+    return b3_calendar.session_open(first_session).tz_convert('UTC')
+
+
+def read_bars(ticker, interval, start, end, download, cache=ohlcv_cache, now=None):
+    """
+    Read bars through the OHLCV cache, building coarse intervals from finer cached bars.
+
+    30m and 1h bars are resampled from 5m bars, and 1wk, 1mo and 3mo bars from daily
+    bars, so switching periods reuses what is already on disk. Only the part of the
+    window older than the finer interval's history is downloaded at the coarse interval.
+
+    Args:
+        ticker (str): Ticker symbol
+        interval (str): yfinance interval
+        start (Timestamp): Window start (tz-aware)
+        end (Timestamp): Window end (tz-aware)
+        download (callable): download(ticker, start, end, interval) -> DataFrame
+        cache (OHLCVCache): Cache the bars are read through
+        now (Timestamp): Current time, defaults to now
+
+    Returns:
+        DataFrame: OHLCV bars indexed by UTC timestamps; the first bar is the
+        whole bucket containing `start`
+    """
+    source = RESAMPLE_SOURCES.get(interval)
+    if source is None:
+        return cache.read(ticker, interval, start, end, download)
+
+    start, end = start.tz_convert('UTC'), end.tz_convert('UTC')
+    source_start = bucket_start(start, interval)
+    frames = []
+
+    covered_from = source_coverage(source, now)
+    if covered_from is not None and source_start < covered_from:
+        # The finer bars don't reach that far back, fall back to the coarse interval
+        frames.append(cache.read(ticker, interval, start, min(covered_from, end), download))
+        source_start = covered_from
+
+    if source_start < end:
+        bars = cache.read(ticker, source, source_start, end, download)
+        with span('resample', ticker=ticker, interval=interval, source=source) as resample_span:
+            frames.append(resample_bars(bars, interval))
+            resample_span.set(**frame_fields(frames[-1]))
+
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return pd.DataFrame()
+    data = pd.concat(frames).sort_index() if len(frames) > 1 else frames[0]
+    return data[~data.index.duplicated(keep='last')]
@@ -0,0 +1,200 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+import pandas as pd
+
+from utils.ohlcv_cache import STALENESS_RULES
+from utils.single_flight import SingleFlight
+
+# Memory budget of the cache, shared by every Streamlit session of the process
+MAX_CACHE_BYTES = int(os.environ.get('STOCK_ANALYSIS_CACHE_MB', '512')) * 2**20
+
+# Results of intervals missing from STALENESS_RULES expire after this long
+DEFAULT_TTL = timedelta(minutes=15)
+
+
+def result_key(namespace, tickers, *params):
+    """
+    Normalize a request so the same selection in any order shares one entry.
+
+    Args:
+        namespace (str): Name of the cached function, e.g. 'page_one'
+        tickers (str or list): Selected tickers
+        *params: Period/interval or start/end of the request
+
+    Returns:
+        tuple: Hashable cache key
+    """
+    tickers = [tickers] if isinstance(tickers, str) else tickers
+    return (namespace, tuple(sorted(set(tickers)))) + tuple(str(param) for param in params)
+
+
+def size_of(value):
+    """
+    Approximate in-memory size of a cached value in bytes.
+    """
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, (tuple, list)):
+        return sum(size_of(item) for item in value)
+    return 0
+
+
+class ResultCache:
+    """
+    Process-wide cache of processed page data, shared across Streamlit sessions.
+
+    Entries expire after the TTL of their interval and the least recently used
+    ones are evicted once the total size exceeds the memory budget. Concurrent
+    misses on the same key are computed once. Cached values are shared between
+    sessions and must not be modified by callers.
+    """
+
+    def __init__(self, max_bytes=MAX_CACHE_BYTES, ttls=STALENESS_RULES):
+        self.max_bytes = max_bytes
+        self.ttls = ttls
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self._flight.reset_stats()
+        with self._lock:
+            self._stats = {
+                'hits': 0,
+                'misses': 0,
+                'expired': 0,
+                'evicted': 0,
+            }
+
+    def stats(self):
+        """
+        Return a copy of the counters, with the hit ratio and current usage.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['bytes'] = self._bytes
+            stats['max_bytes'] = self.max_bytes
+        # Misses that waited on another session's computation instead of starting their own
+        stats['coalesced'] = self._flight.stats()['shared']
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+    def entries(self):
+        """
+        Describe the cached entries, most recently used last.
+
+        Returns:
+            DataFrame: One row per entry with its key, size, age and remaining TTL
+        """
+        now = time.monotonic()
+        with self._lock:
+            rows = [{
+                'namespace': key[0],
+                'tickers': ', '.join(key[1]),
+                'params': ' '.join(key[2:]),
+                'bytes': entry['bytes'],
+                'hits': entry['hits'],
+                'age_s': round(now - entry['created'], 1),
+                'ttl_s': round(entry['expires'] - now, 1),
+            } for key, entry in self._entries.items()]
+        return pd.DataFrame(rows, columns=['namespace', 'tickers', 'params', 'bytes', 'hits', 'age_s', 'ttl_s'])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _ttl(self, interval):
+        return self.ttls.get(interval, DEFAULT_TTL).total_seconds()
+
+    def _drop(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry['bytes']
+
+    def get(self, key, count=True):
+        """
+        Return the cached value of `key`, or None if it is missing or expired.
+        Lookups with count=False don't change the hit/miss counters.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry['expires'] <= time.monotonic():
+                self._drop(key)
+                self._stats['expired'] += 1
+                entry = None
+            if entry is None:
+                if count:
+                    self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            if count:
+                entry['hits'] += 1
+                self._stats['hits'] += 1
+            return entry['value']
+
+    def put(self, key, value, interval):
+        """
+        Store a value, evicting least recently used entries to stay in budget.
+        Values larger than the whole budget are not kept.
+        """
+        size = size_of(value)
+        if size > self.max_bytes:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = {
+                'value': value,
+                'bytes': size,
+                'hits': 0,
+                'created': now,
+                'expires': now + self._ttl(interval),
+            }
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self._stats['evicted'] += 1
+
+    def get_or_compute(self, key, interval, compute):
+        """
+        Return the cached value of `key`, computing and storing it on a miss.
+
+        Args:
+            key (tuple): Key built with result_key
+            interval (str): Interval of the data, selects the TTL
+            compute (callable): compute() -> value
+
+        Returns:
+            The cached or freshly computed value
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        def compute_and_store():
+            # Another session may have stored the value between the miss and this call
+            value = self.get(key, count=False)
+            if value is not None:
+                return value
+            value = compute()
+            # Empty results are not kept, a later rerun retries the download
+            if not (isinstance(value, pd.DataFrame) and value.empty):
+                self.put(key, value, interval)
+            return value
+
+        return self._flight.do(key, compute_and_store)
+
+
+# Process-wide cache shared by all pages
+result_cache = ResultCache()
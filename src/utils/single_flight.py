@@ -0,0 +1,76 @@
+import threading
+
+
+class _Call:
+    """
+    An in-flight call and the result it fans out to its waiters.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical calls: while a call for a key is running,
+    later callers with the same key wait for it and share its result (or its
+    exception) instead of starting their own.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats = {
+                'calls': 0,
+                'shared': 0,
+            }
+
+    def stats(self):
+        """
+        Return a copy of the counters: calls that ran and calls that waited on another.
+        """
+        with self._lock:
+            return dict(self._stats)
+
+    def do(self, key, func):
+        """
+        Run func() once for all concurrent callers of `key`.
+
+        Args:
+            key (hashable): Identity of the call
+            func (callable): func() -> result
+
+        Returns:
+            The result of the single call
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._stats['calls'] += 1
+            else:
+                self._stats['shared'] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
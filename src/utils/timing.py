@@ -0,0 +1,139 @@
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+# Timeline of the current page rerun, if one was started
+_current_timeline = contextvars.ContextVar('timeline', default=None)
+
+
+class Timeline:
+    """
+    Timing spans recorded during one rerun of a page, from any thread that
+    runs in its context (see `submit`).
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.perf_counter()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, record):
+        with self._lock:
+            self.spans.append(record)
+
+    def to_frame(self):
+        """
+        Spans in start order, with their offsets from the start of the rerun.
+
+        Returns:
+            DataFrame: 'stage', 'start_ms', 'duration_ms', 'thread' and one
+            column per recorded field (rows, bytes, cache, ticker, ...)
+        """
+        with self._lock:
+            rows = [{
+                'stage': record.stage,
+                'start_ms': (record.start - self.started) * 1000,
+                'duration_ms': (record.end - record.start) * 1000,
+                'thread': record.thread,
+                **record.fields,
+            } for record in self.spans]
+        frame = pd.DataFrame(rows, columns=['stage', 'start_ms', 'duration_ms', 'thread'] if not rows else None)
+        return frame.sort_values('start_ms', kind='stable').reset_index(drop=True)
+
+
+class Span:
+    """
+    A timed pipeline stage. Fields such as rows, bytes or cache status can be
+    added while it runs with `set`.
+    """
+
+    def __init__(self, stage, fields):
+        self.stage = stage
+        self.fields = fields
+        self.thread = threading.current_thread().name
+        self.start = self.end = None
+
+    def set(self, **fields):
+        self.fields.update(fields)
+
+
+def start_timeline(name):
+    """
+    Start recording the spans of a page rerun in the current context.
+    """
+    timeline = Timeline(name)
+    _current_timeline.set(timeline)
+    return timeline
+
+
+def submit(executor, func, *args):
+    """
+    Submit func(*args) to an executor in a copy of the current context, so its
+    spans are recorded on the rerun's timeline.
+    """
+    return executor.submit(contextvars.copy_context().run, func, *args)
+
+
+def frame_fields(data):
+    """
+    Rows and shallow in-memory bytes of a DataFrame, as span fields.
+    """
+    if data is None:
+        return {'rows': 0, 'bytes': 0}
+    return {'rows': len(data), 'bytes': int(data.memory_usage(index=True, deep=False).sum())}
+
+
+@contextmanager
+def span(stage, **fields):
+    """
+    Time a pipeline stage and log it as a structured line, e.g.
+
+        span stage=process_data duration_ms=12.4 rows=5040 bytes=241920
+
+    The span is also added to the current rerun's timeline, if any.
+
+    Args:
+        stage (str): Name of the stage
+        **fields: Initial fields, e.g. ticker or interval
+    """
+    record = Span(stage, fields)
+    record.start = time.perf_counter()
+    try:
+        yield record
+    except Exception as e:
+        record.set(error=type(e).__name__)
+        raise
+    finally:
+        record.end = time.perf_counter()
+        timeline = _current_timeline.get()
+        if timeline is not None:
+            timeline.add(record)
+        details = ' '.join(f'{key}={value}' for key, value in record.fields.items())
+        logging.info(f"span stage={stage} duration_ms={(record.end - record.start) * 1000:.1f} {details}".rstrip())
+
+
+def timeline_figure(timeline):
+    """
+    Waterfall chart of a timeline: one bar per span, from its start offset.
+    """
+    import plotly.express as px
+
+    frame = timeline.to_frame()
+    if frame.empty:
+        return None
+    label = frame['stage']
+    if 'ticker' in frame.columns:
+        label = label + frame['ticker'].map(lambda ticker: f' {ticker}' if isinstance(ticker, str) else '')
+    frame['label'] = label
+
+    fig = px.bar(frame, x='duration_ms', base='start_ms', y=frame.index, orientation='h', color='stage',
+                 hover_name='label', hover_data=[column for column in ('rows', 'bytes', 'cache') if column in frame.columns])
+    fig.update_yaxes(tickvals=frame.index, ticktext=frame['label'], autorange='reversed', title=None)
+    fig.update_layout(xaxis_title='ms', showlegend=False, height=max(200, 24 * len(frame) + 80),
+                      margin=dict(l=0, r=0, t=10, b=0))
+    return fig
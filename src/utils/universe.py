@@ -0,0 +1,71 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+FILTERED_TICKERS_PATH = os.path.join(CURRENT_DIR, '../data/filtered_tickers_sectors.csv')
+TOP_15_PATH = os.path.join(CURRENT_DIR, '../data/df_top_15_com_industry.csv')
+
+
+class UniverseIndex:
+    """
+    In-memory index of a ticker/sector CSV file.
+
+    Built once per file version: every sector maps to a pre-sorted array of its
+    tickers, so lookups don't touch the disk or filter a DataFrame. Files in
+    another format are read with `reader(path, columns)`, e.g. `read_bulletin`.
+    """
+
+    def __init__(self, path, sep=',', ticker_column='ticker', sector_column='sector', reader=None):
+        self.path = path
+        self.mtime = os.stat(path).st_mtime_ns
+
+        if reader is not None:
+            df = reader(path, [ticker_column, sector_column])
+        else:
+            df = pd.read_csv(path, sep=sep, usecols=[ticker_column, sector_column])
+        tickers = df[ticker_column].to_numpy(dtype=str)
+        sectors = df[sector_column].fillna('Unknown').to_numpy(dtype=str)
+
+        # Tickers in file order, without duplicates
+        _, first_rows = np.unique(tickers, return_index=True)
+        self.ordered = tickers[np.sort(first_rows)]
+
+        self.sectors = {'all': np.unique(tickers)}
+        for sector in np.unique(sectors):
+            self.sectors[sector] = np.unique(tickers[sectors == sector])
+
+    def tickers(self, sector_key):
+        """
+        Return the sorted tickers of a sector, or of every sector for 'all'.
+        """
+        return self.sectors.get(sector_key, np.array([], dtype=str))
+
+
+# Process-wide indexes shared by all Streamlit sessions, keyed by file path
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_universe_index(path=FILTERED_TICKERS_PATH, **kwargs):
+    """
+    Return the index of a ticker/sector file, rebuilding it only when the
+    file's modification time changes.
+
+    Args:
+        path (str): CSV file to index
+        **kwargs: Passed to UniverseIndex (sep, ticker_column, sector_column, reader)
+
+    Returns:
+        UniverseIndex: The current index of the file
+    """
+    path = os.path.abspath(path)
+    mtime = os.stat(path).st_mtime_ns
+    with _indexes_lock:
+        index = _indexes.get(path)
+        if index is None or index.mtime != mtime:
+            index = UniverseIndex(path, **kwargs)
+            _indexes[path] = index
+        return index